@@ -0,0 +1,261 @@
+"""
+A headless server for the async chat Agent of chat-async.py: many concurrent conversations on one event loop.
+
+All sessions share one Agent, and with it the OpenAI client (and its connection pool), the tools,
+the MCP session pools and the tool catalog. A session is only a `Conversation`, its
+`last_response_id` and a few counters, so an idle session takes well under a kilobyte.
+Sessions idle for longer than `idle_timeout` are dropped.
+
+Endpoints:
+    POST   /sessions                                   201 {"id": ...}
+    POST   /sessions/{id}/turns   {"input": "..."}     the turn as server-sent events (below); 409 while a turn runs
+    GET    /sessions/{id}                              {"id", "last_response_id", "turns", "running", "idle_seconds", "calls_in_flight"}
+    DELETE /sessions/{id}                              204
+    GET    /stats                                      {"sessions", "active_turns", "turns", "calls_in_flight", "mcp_errors"}
+
+Each Responses API stream event of the turn, the continuations answering its function calls included, is sent as
+`event: <event.type>` with the event's JSON as data. The turn ends with `event: turn.done`, data
+{"last_response_id", "ended"} (`ended` when the model called `bye`), or `event: turn.error`, data {"error"}.
+
+Usage:
+    python mcp/agent_server.py [--host 127.0.0.1] [--port 8282] [--max-sessions 10000] [--idle-timeout 1800]
+    curl -s -X POST localhost:8282/sessions
+    curl -N -X POST localhost:8282/sessions/<id>/turns -d '{"input": "Hi!"}'
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from mcp_client_agent import McpSessionPool
+
+log = logging.getLogger(__name__)
+
+MCP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def load_chat_async() -> Any:
+    """Imports chat-async.py, whose file name is not a valid module name."""
+    spec = importlib.util.spec_from_file_location("chat_async", os.path.join(MCP_DIR, "chat-async.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+chat_async = load_chat_async()
+
+class Session:
+    """A conversation served over HTTP."""
+    __slots__ = ("id", "conversation", "turns", "running", "last_active")
+
+    def __init__(self, id: str):
+        self.id = id
+        self.conversation = chat_async.Conversation(running=True, console=False)
+        self.turns = 0
+        self.running = False # a turn is in progress
+        self.last_active = time.monotonic()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "last_response_id": self.conversation.last_response_id,
+            "turns": self.turns,
+            "running": self.running,
+            "idle_seconds": round(time.monotonic() - self.last_active, 3),
+            "calls_in_flight": self.calls_in_flight,
+        }
+
+    @property
+    def calls_in_flight(self) -> int:
+        """Function calls of the running turn, running or waiting for a slot."""
+        scheduler = self.conversation.scheduler
+        return 0 if scheduler is None else scheduler.in_flight + scheduler.waiting
+
+class SessionLimitError(RuntimeError):
+    """The server holds `max_sessions` sessions already."""
+
+def sse(event: str, data: str) -> bytes:
+    return f"event: {event}\ndata: {data}\n\n".encode()
+
+class AgentServer:
+    """
+    Serves the conversations of one shared Agent. `start` discovers the MCP tools once,
+    on the serving loop, and `app` is the ASGI application.
+    """
+    def __init__(self, agent: Optional[Any] = None, max_sessions: int = 10000, idle_timeout: float = 30 * 60):
+        self.agent = agent or chat_async.Agent()
+        self.agent.default_conversation.console = False # no stdout for conversations outside a session either
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions: Dict[str, Session] = {}
+        self.active_turns = 0
+        self.turns = 0
+        self._reaper: Optional[asyncio.Task] = None
+        self.app = Starlette(
+            routes=[
+                Route("/sessions", self._create_session, methods=["POST"]),
+                Route("/sessions/{id}", self._get_session, methods=["GET"]),
+                Route("/sessions/{id}", self._delete_session, methods=["DELETE"]),
+                Route("/sessions/{id}/turns", self._turn, methods=["POST"]),
+                Route("/stats", self._stats, methods=["GET"]),
+            ],
+            lifespan=self._lifespan,
+        )
+
+    async def start(self) -> None:
+        await self.agent._discover_tools()
+        for server, error in self.agent.mcp_errors.items():
+            log.warning(f"MCP server '{server}' left out: {error}")
+        self._reaper = asyncio.create_task(self._reap())
+
+    async def close(self) -> None:
+        if self._reaper:
+            self._reaper.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._reaper
+        await McpSessionPool.close_all()
+        await self.agent.client.close()
+
+    @contextlib.asynccontextmanager
+    async def _lifespan(self, app: Starlette) -> AsyncIterator[None]:
+        await self.start()
+        try:
+            yield
+        finally:
+            await self.close()
+
+    async def _reap(self) -> None:
+        """Drops sessions idle for longer than the idle timeout."""
+        while True:
+            await asyncio.sleep(max(1.0, min(60.0, self.idle_timeout / 4)))
+            self.expire()
+
+    def expire(self) -> int:
+        deadline = time.monotonic() - self.idle_timeout
+        expired = [id for id, session in self.sessions.items() if not session.running and session.last_active < deadline]
+        for id in expired:
+            del self.sessions[id]
+        return len(expired)
+
+    def create_session(self) -> Session:
+        if len(self.sessions) >= self.max_sessions:
+            self.expire()
+            if len(self.sessions) >= self.max_sessions:
+                raise SessionLimitError(f"The server holds {self.max_sessions} sessions already.")
+        session = Session(uuid.uuid4().hex)
+        self.sessions[session.id] = session
+        return session
+
+    async def run_turn(self, session: Session, user_input: str) -> AsyncIterator[bytes]:
+        """
+        Runs one turn of the session and yields its events as SSE. The turn runs in its own task, with the
+        session's conversation current, so its function calls and continuations see the same conversation.
+        If the client goes away, the turn is cancelled, and with it the calls in flight.
+        The session counts as running from the first iteration: a response that is never streamed
+        (the client left first) never runs this, so there is nothing to reset.
+        """
+        if session.running: # another request started a turn since `_turn` checked
+            yield sse("turn.error", json.dumps({"error": "A turn of this session is in progress."}))
+            return
+        session.running = True
+        queue: asyncio.Queue[Optional[Any]] = asyncio.Queue()
+        conversation = session.conversation
+
+        async def turn() -> None:
+            self.agent.use_conversation(conversation)
+            await self.agent._execute_turn(user_input)
+
+        conversation.on_event = queue.put_nowait
+        self.active_turns += 1
+        task = asyncio.create_task(turn())
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while (event := await queue.get()) is not None:
+                yield sse(event.type, event.model_dump_json(exclude_none=True))
+            if task.cancelled() or task.exception() is None:
+                yield sse("turn.done", json.dumps({"last_response_id": conversation.last_response_id, "ended": not conversation.running}))
+            else:
+                log.warning(f"Turn of session '{session.id}' failed: {task.exception()!r}")
+                yield sse("turn.error", json.dumps({"error": str(task.exception())}))
+        finally:
+            if not task.done():
+                task.cancel()
+            conversation.on_event = None
+            self.active_turns -= 1
+            self.turns += 1
+            session.turns += 1
+            session.running = False
+            session.last_active = time.monotonic()
+
+    # --- HTTP endpoints ---
+
+    async def _create_session(self, request: Request) -> Response:
+        try:
+            session = self.create_session()
+        except SessionLimitError as e:
+            return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": "60"})
+        return JSONResponse(session.to_dict(), status_code=201)
+
+    def _session(self, request: Request) -> Optional[Session]:
+        return self.sessions.get(request.path_params["id"])
+
+    async def _get_session(self, request: Request) -> Response:
+        session = self._session(request)
+        if session is None:
+            return JSONResponse({"error": "Unknown session."}, status_code=404)
+        return JSONResponse(session.to_dict())
+
+    async def _delete_session(self, request: Request) -> Response:
+        session = self.sessions.pop(request.path_params["id"], None)
+        if session is None:
+            return JSONResponse({"error": "Unknown session."}, status_code=404)
+        return Response(status_code=204)
+
+    async def _turn(self, request: Request) -> Response:
+        session = self._session(request)
+        if session is None:
+            return JSONResponse({"error": "Unknown session."}, status_code=404)
+        try:
+            user_input = (await request.json())["input"]
+        except (ValueError, KeyError, TypeError):
+            return JSONResponse({"error": 'Expected a JSON body with "input".'}, status_code=400)
+        if session.running:
+            return JSONResponse({"error": "A turn of this session is in progress."}, status_code=409)
+        if not session.conversation.running:
+            return JSONResponse({"error": "The conversation has ended."}, status_code=410)
+        return StreamingResponse(self.run_turn(session, user_input), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    async def _stats(self, request: Request) -> Response:
+        return JSONResponse({
+            "sessions": len(self.sessions),
+            "active_turns": self.active_turns,
+            "turns": self.turns,
+            "calls_in_flight": sum(session.calls_in_flight for session in self.sessions.values() if session.running),
+            "mcp_errors": {server: str(error) for server, error in self.agent.mcp_errors.items()},
+        })
+
+def main() -> None:
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Serve the async chat Agent to many concurrent sessions over HTTP and SSE.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8282)
+    parser.add_argument("--max-sessions", type=int, default=10000, help="Sessions held at once (default: 10000).")
+    parser.add_argument("--idle-timeout", type=float, default=30 * 60, help="Seconds after which an idle session is dropped (default: 1800).")
+    parser.add_argument("--log-level", choices=["debug", "info", "warning", "error"], default="info")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s - %(levelname)s - [AGENT] - %(message)s")
+    server = AgentServer(max_sessions=args.max_sessions, idle_timeout=args.idle_timeout)
+    uvicorn.run(server.app, host=args.host, port=args.port, log_level=args.log_level, access_log=args.log_level == "debug")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,444 @@
+"""
+Benchmark of the agent loops against recorded streams, with no network access.
+
+Each client variant runs the same turn, a tool call and an answer, against `fake_openai.py` (replaying
+the recorded Responses / Chat Completions streams) and a local MCP server, and reports:
+    turn_p50_ms, turn_p95_ms   wall time of a user turn, both model requests and the tool call included
+    tool_round_trip_ms         median time of a tool call as seen by the client, MCP session included
+    events_per_second          streamed events consumed per second of turn time (streaming variants only)
+    peak_memory_kib            Python allocations at the peak of a turn, above the level before it (tracemalloc)
+    retained_kib_per_turn      allocations still held after the memory turns, per turn (informational)
+
+Variants:
+    chat        mcp/chat.py, sync Responses API streaming, tools of adk-mcp/mcp_profile.py via McpRouter (stdio)
+    chat-async  mcp/chat-async.py, async Responses API streaming, tools of mcp/server.py via McpClientAgent (stdio)
+    client      mcp/client.py, Chat Completions, mcp/server.py over a stdio ClientSession
+    mcp_client  mcp/mcp_client.py, LangChain AgentExecutor, mcp/server.py over streamable HTTP (needs langchain)
+
+With `--check`, the results are compared with the baseline file and the run fails when a metric
+is worse than the baseline by more than its tolerance; `--update-baseline` records the results.
+Baselines are machine-specific: record one on the machine that runs the checks.
+
+Usage:
+    python mcp/bench/bench_agents.py [--variants chat client] [--turns 20] [--check | --update-baseline]
+"""
+import abc
+import argparse
+import asyncio
+import contextlib
+import gc
+import importlib
+import io
+import json
+import logging
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+MCP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, MCP_DIR)
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+from bench_event_dispatch import load_chat_async
+from fake_openai import FakeOpenAI
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+PROMPT = "Based on the profile of Alan Turing, what could be his profession currently?"
+PROFILE_SERVER = StdioServerParameters(
+    command=sys.executable,
+    args=["-c", "from server import mcp; mcp.run(transport='stdio')"],
+    cwd=MCP_DIR,
+)
+TURN_TIMEOUT = 30 # seconds
+
+# metric -> whether lower is better; metrics missing here are reported, not checked
+CHECKED_METRICS = {
+    "turn_p50_ms": True,
+    "turn_p95_ms": True,
+    "tool_round_trip_ms": True,
+    "events_per_second": False,
+    "peak_memory_kib": True,
+}
+DEFAULT_TOLERANCE = 1.5 # a metric may be 1.5x worse than its baseline before the check fails
+
+class BenchmarkError(RuntimeError):
+    """A variant did not run the recorded turn as expected."""
+
+class SkipVariant(Exception):
+    """A variant cannot run here, e.g. its optional dependencies are missing."""
+
+class _Discard(io.TextIOBase):
+    """Swallows the agents' console output without keeping it in memory."""
+    def write(self, text: str) -> int:
+        return len(text)
+
+@contextlib.contextmanager
+def quiet(verbose: bool = False):
+    """
+    Discards stdout and, at the file descriptor level, stderr: the MCP server subprocesses inherit
+    it and log every request.
+    """
+    if verbose:
+        yield
+        return
+    sys.stderr.flush()
+    saved = os.dup(2)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 2)
+    try:
+        with contextlib.redirect_stdout(_Discard()):
+            yield
+    finally:
+        sys.stderr.flush()
+        os.dup2(saved, 2)
+        os.close(saved)
+        os.close(devnull)
+
+def timed(function: Callable[..., Any], samples: List[float]) -> Callable[..., Any]:
+    """Wraps a sync or async tool function to record how long each call takes."""
+    def call(*args, **kwargs):
+        started = time.perf_counter()
+        result = function(*args, **kwargs)
+        if not asyncio.iscoroutine(result):
+            samples.append(time.perf_counter() - started)
+            return result
+        async def finish():
+            try:
+                return await result
+            finally:
+                samples.append(time.perf_counter() - started)
+        return finish()
+    return call
+
+@contextlib.contextmanager
+def openai_env(base_url: str):
+    """Points clients created from the environment at the fake server."""
+    saved = {key: os.environ.get(key) for key in ("OPENAI_BASE_URL", "OPENAI_API_KEY")}
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = "benchmark"
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+class Variant(abc.ABC):
+    """One client under test: `setup` once, then `turn` many times, then `close`, all on one event loop."""
+    name: str = ""
+    function_call: Tuple[str, str] = ("get_profile", '{"name":"Alan Turing"}')
+
+    def __init__(self):
+        self.tool_seconds: List[float] = []
+
+    @abc.abstractmethod
+    async def setup(self, base_url: str) -> None: ...
+
+    @abc.abstractmethod
+    async def turn(self) -> None: ...
+
+    async def close(self) -> None:
+        pass
+
+class ChatVariant(Variant):
+    name = "chat"
+    function_call = ("get_user_token", '{"user":"Alan Turing"}')
+
+    async def setup(self, base_url: str) -> None:
+        chat = importlib.import_module("chat")
+        with openai_env(base_url):
+            self.agent = await asyncio.to_thread(chat.Agent) # starts its MCP servers in the background, on the sync API's loop thread
+        await asyncio.to_thread(self.agent._wait_for_tools) # as the first turn would, so the MCP tools are there to time
+        self.agent.FUNCTIONS = {name: timed(function, self.tool_seconds) for name, function in self.agent.FUNCTIONS.items()}
+
+    async def turn(self) -> None:
+        turn = await asyncio.to_thread(self.agent._run_turn, PROMPT)
+        if turn.stop_reason != "completed":
+            raise BenchmarkError(f"chat: the turn stopped with '{turn.stop_reason}'")
+
+    async def close(self) -> None:
+        from mcp_client_agent import McpEventLoopThread, McpSessionPool
+        self.agent.executor.shutdown()
+        await asyncio.to_thread(McpEventLoopThread.get().run, McpSessionPool.close_all())
+
+class ChatAsyncVariant(Variant):
+    """chat-async.py runs the function calls of a response concurrently and answers them in one continuation."""
+    name = "chat-async"
+
+    async def setup(self, base_url: str) -> None:
+        from mcp_client_agent import McpClientAgent
+        with openai_env(base_url):
+            self.agent = load_chat_async().Agent()
+        self.agent.MCP_AGENTS = {"profile": McpClientAgent(PROFILE_SERVER)}
+        await self.agent._discover_tools()
+        self.agent.FUNCTIONS = {name: timed(function, self.tool_seconds) for name, function in self.agent.FUNCTIONS.items()}
+
+    async def turn(self) -> None:
+        await asyncio.wait_for(self.agent._execute_turn(PROMPT), TURN_TIMEOUT) # returns once the continuation is consumed
+        if self.agent.conversation.pending_outputs:
+            raise BenchmarkError("chat-async: the turn stopped before answering its function calls")
+
+    async def close(self) -> None:
+        from mcp_client_agent import McpSessionPool
+        await McpSessionPool.close_all()
+
+class ClientVariant(Variant):
+    name = "client"
+
+    async def setup(self, base_url: str) -> None:
+        from openai import AsyncOpenAI
+        with openai_env(base_url):
+            self.client = importlib.import_module("client")
+        logging.getLogger().setLevel(logging.WARNING) # client.py logs every step at INFO
+        self.client.openai_client = AsyncOpenAI(base_url=base_url, api_key="benchmark")
+        self.call_mcp_tool = self.client.call_mcp_tool
+        self.client.call_mcp_tool = timed(self.call_mcp_tool, self.tool_seconds)
+        self.stack = contextlib.AsyncExitStack()
+        read, write = await self.stack.enter_async_context(stdio_client(PROFILE_SERVER))
+        self.session = await self.stack.enter_async_context(ClientSession(read, write))
+        await self.session.initialize()
+
+    async def turn(self) -> None:
+        await self.client.run_conversation(self.session, PROMPT)
+
+    async def close(self) -> None:
+        self.client.call_mcp_tool = self.call_mcp_tool
+        await self.stack.aclose()
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class McpClientVariant(Variant):
+    name = "mcp_client"
+
+    async def setup(self, base_url: str) -> None:
+        try:
+            from langchain.agents import AgentExecutor, create_openai_tools_agent
+            from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+            from langchain_openai import ChatOpenAI
+            from mcp_tool import MCPTool
+            from mcp_toolkit import MCPToolkit
+        except ImportError as e:
+            raise SkipVariant(f"needs the LangChain packages of mcp/requirements.txt ({e.name} is missing)") from None
+        from tool_catalog import ToolCatalogCache
+
+        port = free_port()
+        self.server = subprocess.Popen(
+            [sys.executable, "-c", f"from server import mcp; mcp.settings.port = {port}; mcp.run(transport='streamable-http')"],
+            cwd=MCP_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        await self._wait_for_port(port)
+        self.toolkit = MCPToolkit(url=f"http://127.0.0.1:{port}/mcp/", catalog_cache=ToolCatalogCache())
+        await self.toolkit.__aenter__()
+        tools = await self.toolkit.get_tools_async()
+        llm = ChatOpenAI(model="gpt-4o", temperature=0, base_url=base_url, api_key="benchmark")
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", "You are a helpful assistant."),
+            ("user", "{input}"),
+            MessagesPlaceholder(variable_name="agent_scratchpad"),
+        ])
+        self.executor = AgentExecutor(agent=create_openai_tools_agent(llm, tools, prompt), tools=tools, verbose=False)
+        self.MCPTool = MCPTool
+        self._arun = MCPTool._arun
+        samples = self.tool_seconds
+        arun = self._arun
+        async def timed_arun(tool, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await arun(tool, *args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - started)
+        MCPTool._arun = timed_arun
+
+    async def _wait_for_port(self, port: int) -> None:
+        deadline = time.monotonic() + TURN_TIMEOUT
+        while time.monotonic() < deadline:
+            with contextlib.suppress(OSError):
+                with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                    return
+            if self.server.poll() is not None:
+                raise BenchmarkError("mcp_client: server.py exited during startup")
+            await asyncio.sleep(0.1)
+        raise BenchmarkError("mcp_client: server.py did not start listening")
+
+    async def turn(self) -> None:
+        await self.executor.ainvoke({"input": PROMPT})
+
+    async def close(self) -> None:
+        if hasattr(self, "_arun"):
+            self.MCPTool._arun = self._arun
+        if hasattr(self, "toolkit"):
+            await self.toolkit.__aexit__(None, None, None)
+        if hasattr(self, "server"):
+            self.server.terminate()
+            self.server.wait(timeout=10)
+
+VARIANTS: Dict[str, Callable[[], Variant]] = {
+    "chat": ChatVariant,
+    "chat-async": ChatAsyncVariant,
+    "client": ClientVariant,
+    "mcp_client": McpClientVariant,
+}
+
+async def _measured_turn(variant: Variant, fake: FakeOpenAI) -> float:
+    """Runs one turn and checks it made the recorded exchange: two model requests and one tool call."""
+    requests, calls = fake.requests, len(variant.tool_seconds)
+    started = time.perf_counter()
+    await asyncio.wait_for(variant.turn(), TURN_TIMEOUT)
+    seconds = time.perf_counter() - started
+    requests, calls = fake.requests - requests, len(variant.tool_seconds) - calls
+    if (requests, calls) != (2, 1):
+        raise BenchmarkError(f"{variant.name}: a turn made {requests} model requests and {calls} tool calls, expected 2 and 1")
+    return seconds
+
+async def run_variant(variant: Variant, fake: FakeOpenAI, turns: int, warmup: int, memory_turns: int) -> Dict[str, Optional[float]]:
+    """Times `turns` turns after `warmup` ones, then traces the allocations of `memory_turns` more."""
+    fake.set_function_call(*variant.function_call)
+    try:
+        await variant.setup(fake.base_url)
+        for _ in range(warmup):
+            await _measured_turn(variant, fake)
+        variant.tool_seconds.clear()
+        events = fake.events
+        latencies = [await _measured_turn(variant, fake) for _ in range(turns)]
+        events = fake.events - events
+        tool_seconds = list(variant.tool_seconds)
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            for _ in range(memory_turns):
+                await _measured_turn(variant, fake)
+            gc.collect()
+            after, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    finally:
+        await variant.close()
+
+    quantiles = statistics.quantiles(latencies, n=20, method="inclusive") if len(latencies) > 1 else latencies * 19
+    return {
+        "turns": turns,
+        "turn_p50_ms": statistics.median(latencies) * 1000,
+        "turn_p95_ms": quantiles[18] * 1000,
+        "tool_round_trip_ms": statistics.median(tool_seconds) * 1000,
+        "events_per_second": events / sum(latencies) if events else None,
+        "peak_memory_kib": (peak - before) / 1024,
+        "retained_kib_per_turn": (after - before) / 1024 / memory_turns if memory_turns else None,
+    }
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any]) -> List[str]:
+    """Returns a line per metric that is worse than its baseline by more than the tolerance."""
+    tolerance = baseline.get("tolerance", DEFAULT_TOLERANCE)
+    regressions = []
+    for name, metrics in results.items():
+        recorded = baseline.get("variants", {}).get(name)
+        if not recorded or "skipped" in metrics:
+            continue
+        for metric, lower_is_better in CHECKED_METRICS.items():
+            value, reference = metrics.get(metric), recorded.get(metric)
+            if value is None or not reference:
+                continue
+            ratio = value / reference if lower_is_better else reference / value if value else float("inf")
+            if ratio > tolerance:
+                regressions.append(f"{name} {metric}: {value:,.2f} against a baseline of {reference:,.2f} ({ratio:.2f}x worse)")
+    return regressions
+
+def load_baseline(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def write_baseline(path: str, results: Dict[str, Dict[str, Any]], tolerance: float) -> None:
+    baseline = {
+        "recorded_on": f"{platform.system()} {platform.machine()}, Python {platform.python_version()}",
+        "tolerance": tolerance,
+        "variants": {
+            name: {metric: round(value, 2) if isinstance(value, float) else value for metric, value in metrics.items()}
+            for name, metrics in results.items() if "skipped" not in metrics
+        },
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2)
+        f.write("\n")
+
+def print_results(results: Dict[str, Dict[str, Any]], baseline: Optional[Dict[str, Any]] = None) -> None:
+    columns = ["turn_p50_ms", "turn_p95_ms", "tool_round_trip_ms", "events_per_second", "peak_memory_kib", "retained_kib_per_turn"]
+    print(f"{'variant':<12}" + "".join(f"{column:>24}" for column in columns))
+    for name, metrics in results.items():
+        if "skipped" in metrics:
+            print(f"{name:<12}  skipped: {metrics['skipped']}")
+            continue
+        recorded = (baseline or {}).get("variants", {}).get(name, {})
+        cells = []
+        for column in columns:
+            value = metrics.get(column)
+            cell = "-" if value is None else f"{value:,.1f}"
+            if value is not None and recorded.get(column):
+                cell += f" ({value / recorded[column]:.2f}x)"
+            cells.append(f"{cell:>24}")
+        print(f"{name:<12}" + "".join(cells))
+
+async def run(names: List[str], turns: int, warmup: int, memory_turns: int, event_delay: float, verbose: bool) -> Dict[str, Dict[str, Any]]:
+    fake = FakeOpenAI(event_delay=event_delay)
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        for name in names:
+            variant = VARIANTS[name]()
+            try:
+                with quiet(verbose):
+                    results[name] = await run_variant(variant, fake, turns, warmup, memory_turns)
+            except SkipVariant as e:
+                results[name] = {"skipped": str(e)}
+    finally:
+        fake.stop()
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the agent loops against recorded model streams and local MCP servers.")
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS), help="Client variants to run (default: all).")
+    parser.add_argument("--turns", type=int, default=20, help="Timed turns per variant (default: 20).")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed turns first, to open sessions and fill caches (default: 2).")
+    parser.add_argument("--memory-turns", type=int, default=5, help="Turns traced for memory after the timed ones (default: 5).")
+    parser.add_argument("--event-delay", type=float, default=0, help="Seconds between streamed events, to emulate model speed (default: 0, overhead only).")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline file (default: mcp/bench/baseline.json).")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 when a metric regressed beyond the baseline's tolerance.")
+    parser.add_argument("--update-baseline", action="store_true", help="Record the results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Tolerance stored with --update-baseline (default: 1.5).")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the output of the agents and MCP servers.")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.variants, args.turns, args.warmup, args.memory_turns, args.event_delay, args.verbose))
+    baseline = load_baseline(args.baseline) if os.path.exists(args.baseline) and not args.update_baseline else None
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results, baseline)
+
+    if args.update_baseline:
+        write_baseline(args.baseline, results, args.tolerance)
+        print(f"Baseline written to {args.baseline}")
+    elif args.check:
+        if baseline is None:
+            sys.exit(f"No baseline at {args.baseline}, record one with --update-baseline.")
+        regressions = compare(results, baseline)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
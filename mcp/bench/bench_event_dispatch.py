@@ -0,0 +1,89 @@
+"""
+Micro-benchmark of the streaming event dispatch in chat-async.py.
+
+Replays a recorded Responses API event stream through the `event.type` dispatch table
+of `Agent._handle_event` and through the previous chain of isinstance checks,
+and prints events/sec for both. No network access is needed.
+
+Usage:
+    python mcp/bench/bench_event_dispatch.py [--stream FILE] [--repeat N]
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple, get_args
+
+from pydantic import TypeAdapter
+
+MCP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_STREAM = os.path.join(MCP_DIR, "bench", "fixtures", "response_text_stream.jsonl")
+
+def load_chat_async() -> Any:
+    """Imports mcp/chat-async.py, whose file name is not a valid module name."""
+    sys.path.insert(0, MCP_DIR)
+    spec = importlib.util.spec_from_file_location("chat_async", os.path.join(MCP_DIR, "chat-async.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def load_events(path: str) -> List[Any]:
+    """Parses the recorded stream into typed events once, so only dispatch is measured."""
+    from openai.types.responses import ResponseStreamEvent
+    adapter = TypeAdapter(ResponseStreamEvent)
+    with open(path, "r", encoding="utf-8") as f:
+        return [adapter.validate_python(json.loads(line)) for line in f if line.strip()]
+
+def isinstance_chain(agent: Any) -> Callable[[Any], None]:
+    """Rebuilds the previous dispatcher: isinstance checks in registration order, ValueError when none matches."""
+    from openai.types.responses import ResponseStreamEvent
+    classes: Dict[str, type] = {
+        get_args(event_class.model_fields["type"].annotation)[0]: event_class
+        for event_class in get_args(get_args(ResponseStreamEvent)[0])
+    }
+    chain: List[Tuple[type, Callable[[Any], Any]]] = [
+        (classes[event_type], handler) for event_type, handler in agent._event_handlers.items() if event_type in classes
+    ]
+    def handle_event(event: Any) -> None:
+        for event_class, handler in chain:
+            if isinstance(event, event_class):
+                handler(event)
+                return
+        raise ValueError(f"Unexpected stream event {event.type}: {event}")
+    return handle_event
+
+def measure(dispatch: Callable[[Any], None], events: List[Any], repeat: int) -> float:
+    """Returns events/sec; handler output (text deltas) is discarded."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for event in events:
+                dispatch(event)
+        elapsed = time.perf_counter() - started
+    return len(events) * repeat / elapsed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the event dispatchers of chat-async.py on a recorded stream.")
+    parser.add_argument("--stream", default=DEFAULT_STREAM, help="JSONL file with one Responses API stream event per line.")
+    parser.add_argument("--repeat", type=int, default=500, help="How many times the stream is replayed.")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark") # the client is created but never used
+    agent = load_chat_async().Agent()
+    events = load_events(args.stream)
+
+    results = {
+        "isinstance chain": measure(isinstance_chain(agent), events, args.repeat),
+        "dispatch table": measure(agent._handle_event, events, args.repeat),
+    }
+    print(f"{len(events)} events x {args.repeat} replays")
+    for name, events_per_second in results.items():
+        print(f"{name:>16}: {events_per_second:>12,.0f} events/sec")
+    print(f"{'speedup':>16}: {results['dispatch table'] / results['isinstance chain']:>12.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Load test of the streamable HTTP MCP profile server (mcp/server.py).
+
+Opens `--sessions` concurrent `streamablehttp_client` sessions, each calling `get_profile`
+`--calls` times back to back, and reports requests/sec and call latency percentiles.
+Calls rejected by the server's concurrency limit ("server busy") are counted apart from errors.
+By default a server is started on a free port with `--workers`, `--max-concurrency` and
+`--max-queue`; use `--url` to load an already running one.
+
+Usage:
+    python mcp/bench/bench_server_load.py [--sessions 100] [--calls 20] [--workers 4] [--progress]
+    python mcp/bench/bench_server_load.py --url http://localhost:8181/mcp
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from mcp import ClientSession, McpError
+from mcp.client.streamable_http import streamablehttp_client
+
+MCP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_BUSY = -32000 # the error code of server.ConcurrencyLimit rejections; importing server.py would configure logging here
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+@contextlib.contextmanager
+def spawn_server(workers: int, max_concurrency: int, max_queue: int, log_level: str = "warning", startup_timeout: float = 30) -> Iterator[str]:
+    """Runs server.py on a free port and yields its MCP endpoint."""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "server.py", "--port", str(port), "--workers", str(workers), "--max-concurrency", str(max_concurrency),
+         "--max-queue", str(max_queue), "--log-level", log_level],
+        cwd=MCP_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            with contextlib.suppress(OSError):
+                with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                    break
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("server.py did not start listening")
+            time.sleep(0.1)
+        yield f"http://127.0.0.1:{port}/mcp"
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+class LoadResult:
+    """Latencies and failures of all sessions; `started` is set once every session is open (or failed to open)."""
+    def __init__(self, sessions: int):
+        self.latencies: List[float] = []
+        self.rejected = 0
+        self.progress = 0 # notifications received
+        self.errors: Dict[str, int] = {}
+        self.pending = sessions
+        self.started = asyncio.Event()
+
+    def arrive(self) -> None:
+        self.pending -= 1
+        if self.pending == 0:
+            self.started.set()
+
+    def error(self, e: BaseException) -> None:
+        key = f"{type(e).__name__}: {e}"[:120]
+        self.errors[key] = self.errors.get(key, 0) + 1
+
+async def run_session(url: str, calls: int, progress: bool, result: LoadResult) -> None:
+    async def on_progress(*_):
+        result.progress += 1
+    arrived = False
+    try:
+        async with streamablehttp_client(url) as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                arrived = True
+                result.arrive()
+                await result.started.wait() # all sessions open before the clock starts
+                for index in range(calls):
+                    started = time.perf_counter()
+                    try:
+                        await session.call_tool("get_profile", {"name": f"user-{index}"}, progress_callback=on_progress if progress else None)
+                    except McpError as e:
+                        if e.error.code == SERVER_BUSY:
+                            result.rejected += 1
+                        else:
+                            result.error(e)
+                        continue
+                    result.latencies.append(time.perf_counter() - started)
+    except Exception as e:
+        result.error(e)
+    finally:
+        if not arrived:
+            result.arrive()
+
+def percentile(values: List[float], q: int) -> Optional[float]:
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+async def load(url: str, sessions: int, calls: int, progress: bool = False) -> Dict[str, Any]:
+    """Runs the load and returns its summary; latencies are of successful calls."""
+    result = LoadResult(sessions)
+    tasks = [asyncio.create_task(run_session(url, calls, progress, result)) for _ in range(sessions)]
+    await result.started.wait()
+    started = time.perf_counter()
+    await asyncio.gather(*tasks)
+    seconds = time.perf_counter() - started
+    ms = lambda value: None if value is None else value * 1000
+    return {
+        "sessions": sessions,
+        "calls": len(result.latencies),
+        "rejected": result.rejected,
+        "progress": result.progress,
+        "errors": sum(result.errors.values()),
+        "error_types": result.errors,
+        "seconds": seconds,
+        "requests_per_second": len(result.latencies) / seconds if seconds else 0,
+        "p50_ms": ms(percentile(result.latencies, 50)),
+        "p95_ms": ms(percentile(result.latencies, 95)),
+        "p99_ms": ms(percentile(result.latencies, 99)),
+        "max_ms": ms(max(result.latencies, default=None)),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the streamable HTTP MCP profile server.")
+    parser.add_argument("--url", help="MCP endpoint of a running server; by default one is started.")
+    parser.add_argument("--sessions", type=int, default=100, help="Concurrent client sessions (default: 100).")
+    parser.add_argument("--calls", type=int, default=20, help="get_profile calls per session (default: 20).")
+    parser.add_argument("--progress", action="store_true", help="Ask for the streamed progress notifications of each call.")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes of the started server (default: 1).")
+    parser.add_argument("--max-concurrency", type=int, default=64, help="Per-worker request limit of the started server (default: 64).")
+    parser.add_argument("--max-queue", type=int, default=256, help="Per-worker queue of the started server (default: 256).")
+    parser.add_argument("--log-level", default="warning", help="Log level of the started server (default: warning).")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as stack:
+        url = args.url or stack.enter_context(spawn_server(args.workers, args.max_concurrency, args.max_queue, args.log_level))
+        summary = asyncio.run(load(url, args.sessions, args.calls, args.progress))
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{summary['sessions']} sessions, {summary['calls']} calls in {summary['seconds']:.2f}s: {summary['requests_per_second']:,.0f} requests/sec")
+    if summary["calls"]:
+        print(f"latency p50 {summary['p50_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms, p99 {summary['p99_ms']:.1f} ms, max {summary['max_ms']:.1f} ms")
+    print(f"rejected (server busy): {summary['rejected']}, errors: {summary['errors']}")
+    for error, count in summary["error_types"].items():
+        print(f"  {count} x {error}")
+
+if __name__ == "__main__":
+    main()
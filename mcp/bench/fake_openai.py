@@ -0,0 +1,172 @@
+"""
+A local stand-in for the OpenAI Responses and Chat Completions APIs that replays recorded streams.
+
+Point a client at `FakeOpenAI().base_url` (e.g. `OpenAI(base_url=..., api_key="benchmark")`).
+A request that carries a tool result gets the recorded answer; any other request gets the
+recorded function call, renamed to the tool of the client under test (`function_call`).
+Streams are rendered to SSE bytes once, so serving them costs next to nothing and the
+benchmarks measure the clients. `event_delay` spaces the events out to emulate a model.
+
+Recordings (see fixtures/):
+    response_function_call_stream.jsonl  Responses API events of a function call
+    response_text_stream.jsonl           Responses API events of a text answer
+    chat_completions.json                a Chat Completions tool call and answer; streams are derived from them
+"""
+import copy
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def load_jsonl(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def sse(payloads: List[Any]) -> List[bytes]:
+    """Server-sent events with JSON (or literal `[DONE]`) data lines, as the OpenAI SDK parses them."""
+    return [f"data: {payload if isinstance(payload, str) else json.dumps(payload, separators=(',', ':'))}\n\n".encode() for payload in payloads]
+
+def retarget_response_events(events: List[Dict[str, Any]], name: str, arguments: str) -> List[Dict[str, Any]]:
+    """Renames the recorded function call to `name` with `arguments`, in every event that carries it."""
+    events = copy.deepcopy(events)
+    def patch(item: Dict[str, Any]) -> None:
+        if item.get("type") == "function_call":
+            item["name"] = name
+            if item.get("arguments"):
+                item["arguments"] = arguments
+    for event in events:
+        if "item" in event:
+            patch(event["item"])
+        for item in event.get("response", {}).get("output", []):
+            patch(item)
+        if event["type"] == "response.function_call_arguments.delta":
+            event["delta"] = "" # replaced by a single delta below
+        if event["type"] == "response.function_call_arguments.done":
+            event["arguments"] = arguments
+    first_delta = next((event for event in events if event["type"] == "response.function_call_arguments.delta"), None)
+    if first_delta is not None:
+        first_delta["delta"] = arguments
+    return events
+
+def completion_chunks(completion: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The `chat.completion.chunk` stream of a recorded completion: role, content or tool calls, finish reason, usage."""
+    choice = completion["choices"][0]
+    message = choice["message"]
+    base = {key: completion[key] for key in ("id", "created", "model", "system_fingerprint") if key in completion}
+    base["object"] = "chat.completion.chunk"
+    def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+        return {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}]}
+    chunks = [chunk({"role": "assistant", "content": "" if message.get("content") is not None else None})]
+    for word in (message.get("content") or "").split(" "):
+        chunks.append(chunk({"content": word + " "}))
+    for index, call in enumerate(message.get("tool_calls") or []):
+        chunks.append(chunk({"tool_calls": [{"index": index, "id": call["id"], "type": "function", "function": {"name": call["function"]["name"], "arguments": ""}}]}))
+        chunks.append(chunk({"tool_calls": [{"index": index, "function": {"arguments": call["function"]["arguments"]}}]}))
+    chunks.append(chunk({}, choice["finish_reason"]))
+    return chunks
+
+class FakeOpenAI(ThreadingHTTPServer):
+    """
+    Serves POST /v1/responses (streamed or not) and POST /v1/chat/completions (streamed or not) on a free local port.
+    Counts requests and streamed events; `set_function_call` renames the recorded call for the next requests.
+    With `record`, keeps the parsed request bodies in `bodies`.
+    """
+    daemon_threads = True
+
+    def __init__(self, function_call: Tuple[str, str] = ("get_profile", '{"name":"Alan Turing"}'), event_delay: float = 0, fixtures_dir: str = FIXTURES_DIR, record: bool = False):
+        super().__init__(("127.0.0.1", 0), FakeOpenAIHandler)
+        self.event_delay = event_delay
+        self._call_events = load_jsonl(os.path.join(fixtures_dir, "response_function_call_stream.jsonl"))
+        self._text_events = load_jsonl(os.path.join(fixtures_dir, "response_text_stream.jsonl"))
+        with open(os.path.join(fixtures_dir, "chat_completions.json"), "r", encoding="utf-8") as f:
+            self._completions = json.load(f)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.events = 0
+        self.bodies: Optional[List[Dict[str, Any]]] = [] if record else None
+        self.set_function_call(*function_call)
+        self._thread = threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}/v1"
+
+    def set_function_call(self, name: str, arguments: str) -> None:
+        """Renders the replies once: (status body, SSE events) for each API and case."""
+        call_events = retarget_response_events(self._call_events, name, arguments)
+        tool_call = copy.deepcopy(self._completions["tool_call"])
+        for call in tool_call["choices"][0]["message"]["tool_calls"]:
+            call["function"].update(name=name, arguments=arguments)
+        answer = self._completions["answer"]
+        self.replies = {
+            ("responses", "call"): (call_events[-1]["response"], sse(call_events)),
+            ("responses", "answer"): (self._text_events[-1]["response"], sse(self._text_events)),
+            ("chat", "call"): (tool_call, sse(completion_chunks(tool_call) + ["[DONE]"])),
+            ("chat", "answer"): (answer, sse(completion_chunks(answer) + ["[DONE]"])),
+        }
+
+    def count(self, events: int) -> None:
+        with self.lock:
+            self.requests += 1
+            self.events += events
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # keep-alive, as with the real API
+    disable_nagle_algorithm = True # headers and body are separate writes, delayed ACKs would add ~40ms to each
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, api: str, case: str, stream: bool) -> None:
+        body, events = self.server.replies[(api, case)]
+        self.server.count(len(events) if stream else 0) # before replying, the client may be done before this thread resumes
+        if not stream:
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        if self.server.event_delay:
+            for event in events:
+                time.sleep(self.server.event_delay)
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+                self.wfile.flush()
+        else:
+            data = b"".join(events)
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.server.bodies is not None:
+            with self.server.lock:
+                self.server.bodies.append(request)
+        if self.path.endswith("/responses"):
+            items = request.get("input") if isinstance(request.get("input"), list) else []
+            answered = any(isinstance(item, dict) and item.get("type") == "function_call_output" for item in items)
+            self._reply("responses", "answer" if answered else "call", bool(request.get("stream")))
+        elif self.path.endswith("/chat/completions"):
+            answered = any(message.get("role") == "tool" for message in request.get("messages", []))
+            self._reply("chat", "answer" if answered else "call", bool(request.get("stream")))
+        else:
+            data = b'{"error": {"message": "not recorded"}}'
+            self.send_response(404)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
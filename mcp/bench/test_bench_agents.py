@@ -0,0 +1,68 @@
+import asyncio
+import unittest
+
+from openai import OpenAI
+
+from bench_agents import ClientVariant, compare, run_variant
+from fake_openai import FakeOpenAI
+
+class TestFakeOpenAI(unittest.TestCase):
+    """Tests that the recorded streams replay through the OpenAI SDK."""
+
+    def setUp(self):
+        self.fake = FakeOpenAI(function_call=("get_user_token", '{"user":"Ada"}'))
+        self.client = OpenAI(base_url=self.fake.base_url, api_key="test", max_retries=0)
+
+    def tearDown(self):
+        self.client.close()
+        self.fake.stop()
+
+    def test_responses_stream(self):
+        events = list(self.client.responses.create(model="gpt-4.1", input="Hi", stream=True))
+        call = events[-1].response.output[0]
+        self.assertEqual((call.type, call.name, call.arguments), ("function_call", "get_user_token", '{"user":"Ada"}'))
+
+        answer = self.client.responses.create(model="gpt-4.1", stream=False, input=[
+            {"type": "function_call_output", "call_id": call.call_id, "output": "ADA01234"},
+        ])
+        self.assertTrue(answer.output_text)
+        self.assertEqual((self.fake.requests, self.fake.events), (2, len(events)))
+
+    def test_chat_completions_stream(self):
+        chunks = list(self.client.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "Hi"}], stream=True))
+        calls = [call for chunk in chunks for call in chunk.choices[0].delta.tool_calls or []]
+        self.assertEqual(calls[0].function.name, "get_user_token")
+        self.assertEqual("".join(call.function.arguments for call in calls), '{"user":"Ada"}')
+        self.assertEqual(chunks[-1].choices[0].finish_reason, "tool_calls")
+
+        answer = self.client.chat.completions.create(model="gpt-4o", messages=[
+            {"role": "user", "content": "Hi"},
+            {"role": "tool", "tool_call_id": calls[0].id, "content": "ADA01234"},
+        ])
+        self.assertEqual(answer.choices[0].finish_reason, "stop")
+
+class TestBenchAgents(unittest.TestCase):
+    """Tests a short benchmark run and the baseline check."""
+
+    def test_client_variant(self):
+        fake = FakeOpenAI()
+        try:
+            metrics = asyncio.run(run_variant(ClientVariant(), fake, turns=2, warmup=1, memory_turns=1))
+        finally:
+            fake.stop()
+        self.assertEqual(fake.requests, 8) # two per turn
+        self.assertGreater(metrics["turn_p95_ms"], metrics["tool_round_trip_ms"])
+        self.assertGreater(metrics["peak_memory_kib"], 0)
+
+    def test_compare_flags_regressions_beyond_the_tolerance(self):
+        baseline = {"tolerance": 1.5, "variants": {"chat": {"turn_p50_ms": 100, "events_per_second": 2000, "peak_memory_kib": 400}}}
+        results = {
+            "chat": {"turn_p50_ms": 140, "events_per_second": 1000, "peak_memory_kib": 900, "retained_kib_per_turn": 50},
+            "client": {"turn_p50_ms": 1000}, # no baseline yet
+        }
+        regressions = compare(results, baseline)
+        self.assertEqual([line.split(":")[0] for line in regressions], ["chat events_per_second", "chat peak_memory_kib"])
+        self.assertEqual(compare({"chat": {"skipped": "langchain is missing"}}, baseline), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+import asyncio
+import unittest
+
+from bench_server_load import load, spawn_server
+
+class TestServerLoad(unittest.TestCase):
+    """Runs a short load test against server.py in its serving modes."""
+
+    def test_stateless_workers_stream_progress(self):
+        with spawn_server(workers=2, max_concurrency=8, max_queue=32) as url:
+            summary = asyncio.run(load(url, sessions=8, calls=3, progress=True))
+        self.assertEqual((summary["calls"], summary["rejected"], summary["errors"]), (24, 0, 0))
+        self.assertEqual(summary["progress"], 24 * 16) # a word per notification, on the response stream of each call
+        self.assertGreater(summary["requests_per_second"], 0)
+        self.assertGreaterEqual(summary["p99_ms"], summary["p50_ms"])
+
+    def test_overload_is_rejected_not_queued(self):
+        with spawn_server(workers=1, max_concurrency=1, max_queue=1) as url:
+            summary = asyncio.run(load(url, sessions=12, calls=3))
+        self.assertEqual(summary["errors"], 0) # rejected calls leave the sessions usable
+        self.assertGreater(summary["rejected"], 0)
+        self.assertEqual(summary["calls"] + summary["rejected"], 36)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,11 +12,16 @@ Requirements:
 """
 import asyncio
 import base64
+import contextvars
+import inspect
 import json
 import os
 import sys
 import traceback
-from typing import Any, Dict, List, Optional, Union
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Union
 
 from mcp import types
 import openai
@@ -94,7 +99,72 @@ from openai.types.responses.response_mcp_list_tools_failed_event import Response
 from openai.types.responses.response_mcp_list_tools_in_progress_event import ResponseMcpListToolsInProgressEvent
 from openai.types.responses.response_output_text_annotation_added_event import ResponseOutputTextAnnotationAddedEvent
 
-from mcp_client_agent import ToolFunctionCall, ToolFunctionResult
+from mcp_client_agent import AsyncToolFunctionCall, HttpServerParameters, McpClientAgent, ToolFunctionCall, ToolFunctionResult
+from startup import StartupTimer
+from tool_catalog import ToolCatalogCache
+from tool_index import ToolHistory, ToolIndex
+from tool_output import OutputBudget, ToolOutputEncoder
+
+class TurnScheduler:
+    """
+    Runs the function calls of one turn. A call starts as soon as the stream finalizes it, up to
+    `max_parallel` at once, as a task of the turn's task group: cancelling the turn cancels its calls,
+    and none outlives the turn. `collect` waits for the calls submitted since the last `collect` and
+    returns their outputs in call order, for one continuation request.
+    """
+    def __init__(self, agent: "Agent", group: asyncio.TaskGroup, max_parallel: int, timeout: float):
+        self.agent = agent
+        self.group = group
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_parallel)
+        self._pending: List[asyncio.Task[FunctionCallOutput]] = []
+        self.waiting = 0 # submitted, waiting for a slot
+        self.in_flight = 0 # running
+        self.completed = 0
+        self.round_trips = 0 # responses of the turn that made calls
+
+    def submit(self, call: ResponseFunctionToolCall) -> None:
+        self.waiting += 1
+        self._pending.append(self.group.create_task(self._run(call)))
+
+    async def _run(self, call: ResponseFunctionToolCall) -> FunctionCallOutput:
+        """Runs the call in a slot; a failure or timeout becomes an error output for the model."""
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            output = await asyncio.wait_for(self.agent._handle_function_call(call), self.timeout)
+        except TimeoutError:
+            output = self.agent._handle_function_error(call, f"Function '{call.name}' timed out after {self.timeout}s.")
+        except Exception as e:
+            output = self.agent._handle_function_error(call, f"Function '{call.name}' failed: {e}")
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+        self.completed += 1
+        return output
+
+    async def collect(self) -> List[FunctionCallOutput]:
+        pending, self._pending = self._pending, []
+        return [await task for task in pending]
+
+@dataclass(slots=True)
+class Conversation:
+    """
+    The state of one conversation. Everything else of the Agent (client, tools, MCP session pools,
+    event handlers) is shared, so an Agent can hold many conversations; see `Agent.use_conversation`.
+    """
+    last_response_id: Optional[str] = None
+    sequence_number: int = 0
+    running: bool = False
+    console: bool = True # print text and [system] lines; off for conversations served elsewhere
+    on_event: Optional[Callable[[ResponseStreamEvent], Any]] = None # sees every stream event of the conversation, follow-ups included
+    scheduler: Optional[TurnScheduler] = None # the function calls of the running turn
+    pending_outputs: List[FunctionCallOutput] = field(default_factory=list) # outputs of a stopped turn, sent with the next user input
+    tools: Optional[List[ToolParam]] = None # selected by the Agent's tool_index for the running turn
+    tool_history: ToolHistory = field(default_factory=ToolHistory) # recent inputs and called tools, so follow-ups keep their tools
 
 class Agent: # todo debug log only
     """
@@ -105,13 +175,30 @@ class Agent: # todo debug log only
     type ResponseInput = str | ResponseInputParam | ResponseInputItemParam
 
     def __init__(self) -> None:
+        self.startup = StartupTimer()
         # --- Configuration ---
         self.MODEL: str = "gpt-4.1" 
         self.INSTRUCTIONS: str = "You are an agent of delight. Use the tools provided."
         self.TOOLS: List[ToolParam] = []
-        self.FUNCTIONS: dict[str, ToolFunctionCall] = {}
+        self.FUNCTIONS: dict[str, ToolFunctionCall | AsyncToolFunctionCall] = {}
+        self.MAX_PARALLEL_CALLS: int = 8 # function calls of a turn run concurrently up to this limit
+        self.FUNCTION_TIMEOUT: float = 60 # seconds per function call
+        self.MAX_ROUND_TRIPS: int = 10 # function call round-trips per user turn
+        self.TOOLS_WAIT: float = 30 # seconds the first turn waits for MCP tool discovery; servers up later join then
 
         # --- Tool Definitions ---
+
+        # Local Mcp Tool(s) (stdio, sse, streamable-http), discovered concurrently in the background of run()
+        # on the agent's own loop, from the on-disk catalog cache when possible
+        # MCP_TRANSPORT=http PORT=9999 npx -y @professional-wiki/mediawiki-mcp-server@latest
+        tool_catalog_cache = ToolCatalogCache()
+        # Labelled like McpRouter's servers in chat.py; the label names a server in the startup report and errors
+        self.MCP_AGENTS: Dict[str, McpClientAgent] = {
+            "mediawiki": McpClientAgent(HttpServerParameters(url="http://localhost:9999/mcp"), catalog_cache=tool_catalog_cache), # http
+        }
+        self.mcp_errors: Dict[str, Exception] = {} # server label -> error, for servers left out by _discover_tools
+        # Results go back to the model as their structured content or text, within per-tool budgets.
+        self.output_encoder = ToolOutputEncoder(budgets={"get-page": OutputBudget(max_tokens=8192), "get-page-history": OutputBudget(max_tokens=1024)})
         
         # Conversation ending function :)
         TERMINATOR_FUNCTION_NAME: str = "bye"
@@ -141,14 +228,115 @@ class Agent: # todo debug log only
         )
         self.TOOLS.append(image_generation)
 
+        # Each turn sends the function tools most relevant to the user input (BM25 over names and descriptions),
+        # `bye` and the hosted tools; see tool_index.ToolIndex.
+        self.tool_index = ToolIndex(top_k=8, pinned={TERMINATOR_FUNCTION_NAME})
+
         # --- Event Handler Lookup Dict ---
-        # self._event_handlers = { ... }  # Remove this dictionary entirely
+        # keyed by event.type, one dict lookup per streamed event; see register_event_handler()
+        self._event_handlers: Dict[str, Callable[[Any], Any]] = {
+            'response.created': self._on_response_created,
+            'response.queued': self._on_response_queued,
+            'response.in_progress': self._on_response_in_progress,
+            'response.output_item.added': self._on_response_output_item_added,
+            'response.content_part.added': self._on_response_content_part_added,
+            'response.output_text.delta': self._on_response_output_text_delta,
+            'response.output_text.done': self._on_response_output_text_done,
+            'response.content_part.done': self._on_response_content_part_done,
+            'response.function_call_arguments.delta': self._on_response_function_call_arguments_delta,
+            'response.function_call_arguments.done': self._on_response_function_call_arguments_done,
+            'response.output_item.done': self._on_response_output_item_done,
+            'response.completed': self._on_response_completed,
+            'response.failed': self._on_response_failed,
+            'response.image_generation_call.completed': self._on_response_image_generation_call_completed,
+            'response.web_search_call.in_progress': self._on_response_web_search_call_in_progress,
+            'response.web_search_call.completed': self._on_response_web_search_call_completed,
+            'response.web_search_call.searching': self._on_response_web_search_call_searching,
+            'response.audio.delta': self._on_response_audio_delta,
+            'response.audio.done': self._on_response_audio_done,
+            'response.audio.transcript.delta': self._on_response_audio_transcript_delta,
+            'response.audio.transcript.done': self._on_response_audio_transcript_done,
+            'response.code_interpreter_call_code.delta': self._on_response_code_interpreter_call_code_delta,
+            'response.code_interpreter_call_code.done': self._on_response_code_interpreter_call_code_done,
+            'response.code_interpreter_call.completed': self._on_response_code_interpreter_call_completed,
+            'response.code_interpreter_call.in_progress': self._on_response_code_interpreter_call_in_progress,
+            'response.code_interpreter_call.interpreting': self._on_response_code_interpreter_call_interpreting,
+            'error': self._on_response_error,
+            'response.incomplete': self._on_response_incomplete,
+            'response.refusal.delta': self._on_response_refusal_delta,
+            'response.refusal.done': self._on_response_refusal_done,
+            'response.reasoning.delta': self._on_response_reasoning_delta,
+            'response.reasoning.done': self._on_response_reasoning_done,
+            'response.reasoning_summary.delta': self._on_response_reasoning_summary_delta,
+            'response.reasoning_summary.done': self._on_response_reasoning_summary_done,
+            'response.reasoning_summary_part.added': self._on_response_reasoning_summary_part_added,
+            'response.reasoning_summary_part.done': self._on_response_reasoning_summary_part_done,
+            'response.reasoning_summary_text.delta': self._on_response_reasoning_summary_text_delta,
+            'response.reasoning_summary_text.done': self._on_response_reasoning_summary_text_done,
+            'response.file_search_call.completed': self._on_response_file_search_call_completed,
+            'response.file_search_call.in_progress': self._on_response_file_search_call_in_progress,
+            'response.file_search_call.searching': self._on_response_file_search_call_searching,
+            'response.image_generation_call.generating': self._on_response_image_gen_call_generating,
+            'response.image_generation_call.partial_image': self._on_response_image_gen_call_partial_image,
+            'response.image_generation_call.in_progress': self._on_response_image_gen_call_in_progress,
+            'response.mcp_call_arguments.delta': self._on_response_mcp_call_arguments_delta,
+            'response.mcp_call_arguments.done': self._on_response_mcp_call_arguments_done,
+            'response.mcp_call.completed': self._on_response_mcp_call_completed,
+            'response.mcp_call.failed': self._on_response_mcp_call_failed,
+            'response.mcp_call.in_progress': self._on_response_mcp_call_in_progress,
+            'response.mcp_list_tools.completed': self._on_response_mcp_list_tools_completed,
+            'response.mcp_list_tools.failed': self._on_response_mcp_list_tools_failed,
+            'response.mcp_list_tools.in_progress': self._on_response_mcp_list_tools_in_progress,
+            'response.output_text.annotation.added': self._on_response_output_text_annotation_added,
+        }
+        self.unhandled_events: Counter[str] = Counter() # event.type -> count of events without a handler
 
         # --- State ---
-        self.RUNNING: bool = False
-        self.client: AsyncOpenAI = self._initialize_client()
-        self.last_response_id: Optional[str] = None
-        self.sequence_number: int = 0
+        with self.startup.phase("openai_client"):
+            self.client: AsyncOpenAI = self._initialize_client()
+        # The conversation of the current task: the Agent's own one (the CLI) unless use_conversation() set another.
+        self.default_conversation = Conversation()
+        self._conversation: contextvars.ContextVar[Conversation] = contextvars.ContextVar("conversation")
+
+    @property
+    def conversation(self) -> Conversation:
+        return self._conversation.get(self.default_conversation)
+
+    def use_conversation(self, conversation: Conversation) -> contextvars.Token:
+        """
+        Makes `conversation` current for the calling task and the tasks it creates from now on,
+        so concurrent turns of different conversations can share this Agent.
+        """
+        return self._conversation.set(conversation)
+
+    @property
+    def last_response_id(self) -> Optional[str]:
+        return self.conversation.last_response_id
+
+    @last_response_id.setter
+    def last_response_id(self, value: Optional[str]) -> None:
+        self.conversation.last_response_id = value
+
+    @property
+    def sequence_number(self) -> int:
+        return self.conversation.sequence_number
+
+    @sequence_number.setter
+    def sequence_number(self, value: int) -> None:
+        self.conversation.sequence_number = value
+
+    @property
+    def RUNNING(self) -> bool:
+        return self.conversation.running
+
+    @RUNNING.setter
+    def RUNNING(self, value: bool) -> None:
+        self.conversation.running = value
+
+    def console(self, *args: Any, **kwargs: Any) -> None:
+        """Prints for the current conversation, unless it is served without a console."""
+        if self.conversation.console:
+            print(*args, **kwargs)
 
     def _initialize_client(self) -> AsyncOpenAI: # TODO raise Exception instead of sys.exit and logging
         """Checks for API key and initializes the OpenAI client."""
@@ -171,29 +359,81 @@ class Agent: # todo debug log only
             stream=True,
             store=True,
             model=self.MODEL,
-            tools=self.TOOLS,
+            tools=self.TOOLS if self.conversation.tools is None else self.conversation.tools,
             input=input,
             instructions=self.INSTRUCTIONS,
             previous_response_id=self.last_response_id,
         )
 
     def _handle_function_result(self, functionCall: ResponseFunctionToolCall, result: ToolFunctionResult) -> FunctionCallOutput:
-        """Handles a function result from the model's response."""
+        """Handles a function result from the model's response: the output is the result's compact encoding."""
+        encoded = self.output_encoder.encode(functionCall.name, result)
+        self.console(f"[system] function_output='{functionCall.call_id}' tokens={encoded.tokens} saved={encoded.tokens_saved} truncated={encoded.truncated}", flush=True)
         return FunctionCallOutput(
             type="function_call_output",
             call_id=functionCall.call_id,
-            output=str(result)
+            output=encoded.text
         )
 
-    def _handle_function_call(self, functionCall: ResponseFunctionToolCall) -> FunctionCallOutput:
+    async def _discover_tools(self) -> None:
+        """
+        Discovers the local MCP tools of all servers concurrently, sharing this loop's session pools.
+        Each server's tools are added as soon as it is up. A server that fails is left out,
+        with its error in `mcp_errors`.
+        """
+        await asyncio.gather(*(self._discover_server(label, mcp_agent) for label, mcp_agent in self.MCP_AGENTS.items()))
+
+    async def _discover_server(self, label: str, mcp_agent: McpClientAgent) -> None:
+        with self.startup.phase(f"mcp:{label}"):
+            try:
+                tools = await mcp_agent.aget_tools()
+            except Exception as e:
+                self.mcp_errors[label] = e
+                self.console(f"[system] mcp server='{label}' error='{e}'", flush=True)
+                return
+        self.TOOLS.extend(tools)
+        self.FUNCTIONS.update(await mcp_agent.aget_functions())
+        mcp_agent.add_tools_listener(partial(self._on_tools_changed, mcp_agent))
+
+    async def _wait_for_tools(self, discovery: "asyncio.Task[None]") -> None:
+        """
+        Before the first turn: waits for the background tool discovery, at most TOOLS_WAIT seconds.
+        Servers with a cached catalog of their version are up once connected; the others join when they are up. Then prints the startup report.
+        """
+        with self.startup.phase("tools_wait"):
+            await asyncio.wait({discovery}, timeout=self.TOOLS_WAIT)
+        if not discovery.done():
+            print(f"[system] mcp discovery still running, its tools join when servers are up", flush=True)
+        print(f"[system] startup {self.startup.report()}", flush=True)
+
+    def _on_tools_changed(self, mcp_agent: McpClientAgent, old_tools: List[FunctionToolParam], new_tools: List[FunctionToolParam]) -> None:
+        """Swaps in the tools of a refreshed catalog; the next request sends the new list."""
+        for tool in old_tools:
+            self.FUNCTIONS.pop(tool["name"], None)
+        self.TOOLS = [tool for tool in self.TOOLS if tool not in old_tools] + list(new_tools)
+        self.FUNCTIONS.update({tool["name"]: mcp_agent.aget_function(tool["name"]) for tool in new_tools})
+
+    def _handle_function_error(self, functionCall: ResponseFunctionToolCall, error: str) -> FunctionCallOutput:
+        """Reports a failed function call to the model instead of aborting the turn."""
+        self.console(f"[system] function='{functionCall}' error='{error}'", flush=True)
+        return self._handle_function_result(functionCall, ToolFunctionResult(
+            content=[types.TextContent(type="text", text=error)],
+            structuredContent=None,
+            isError=True
+        ))
+
+    async def _handle_function_call(self, functionCall: ResponseFunctionToolCall) -> FunctionCallOutput:
         """Handles a function call from the model's response."""
-        function: ToolFunctionCall = self.FUNCTIONS[functionCall.name]
+        function = self.FUNCTIONS[functionCall.name]
+        self.conversation.tool_history.called(functionCall.name)
         result = function(json.loads(functionCall.arguments))
-        print(f"[system] function='{functionCall}' result='{result}'", flush=True)
+        if inspect.isawaitable(result):
+            result = await result
+        self.console(f"[system] function='{functionCall}' result='{result}'", flush=True)
         return self._handle_function_result(functionCall, result)
 
     def _handle_image_generation(self, id:str, image: str) -> None:
-        print(f"[system] image='{id}.png'", flush=True)
+        self.console(f"[system] image='{id}.png'", flush=True)
         with open(f"{id}.png", "wb") as f:
             f.write(base64.b64decode(image))
     
@@ -226,7 +466,7 @@ class Agent: # todo debug log only
 
     def _on_response_output_text_delta(self, event: ResponseTextDeltaEvent):
         """Streaming text output (token/partial text) from the model."""
-        print(event.delta, end="", flush=True)
+        self.console(event.delta, end="", flush=True)
         pass # part receiving delta: event.item_id 
 
     def _on_response_output_text_done(self, event: ResponseTextDoneEvent):
@@ -257,25 +497,23 @@ class Agent: # todo debug log only
         elif isinstance(item, ResponseFileSearchToolCall):
             raise ValueError(f"Unexpected response item {item.type}: {item}")
         elif isinstance(item, ResponseFunctionToolCall):
-            print(f"[system] function_call='{item.call_id}' arguments='{item.arguments}'", flush=True)
-            itemResult = self._handle_function_call(item)
-            
-            # functionStream is an AsyncStream, not a coroutine; we should iterate it asynchronously.
-            # Since we're in a sync context, use asyncio.run with an async helper.
-            async def handle_events(itemResult):
-                stream = await self._create_response(itemResult)  # todo async ?
-                async for event in stream:
-                    print(f"[system] functionEvent='{event}'", flush=True)
-                    #self._handle_event(event)
-            asyncio.create_task(handle_events(itemResult))
+            self.console(f"[system] function_call='{item.call_id}' arguments='{item.arguments}'", flush=True)
+
+            # The handler is sync: the call starts in the turn's scheduler, and its output goes back
+            # with the other outputs of this response in one continuation once the stream ends.
+            scheduler = self.conversation.scheduler
+            if scheduler is None:
+                self.console(f"[system] function_call='{item.call_id}' ignored, no turn is running", flush=True)
+            else:
+                scheduler.submit(item)
         elif isinstance(item, ResponseFunctionWebSearch):
             action = item.action
             if isinstance(action, ActionSearch):
-                print(f"[web_search] Searching for: '{action.query}'", flush=True)
+                self.console(f"[web_search] Searching for: '{action.query}'", flush=True)
             elif isinstance(action, ActionOpenPage):
-                print(f"[web_search] Opened page: {action.url}", flush=True)
+                self.console(f"[web_search] Opened page: {action.url}", flush=True)
             elif isinstance(action, ActionFind):
-                print(f"[web_search] Searched for pattern '{action.pattern}' in page: {action.url}", flush=True)
+                self.console(f"[web_search] Searched for pattern '{action.pattern}' in page: {action.url}", flush=True)
             else:
                 raise ValueError(f"Unexpected response item action for {item.type}: {action}")
         elif isinstance(item, ResponseComputerToolCall):
@@ -470,133 +708,69 @@ class Agent: # todo debug log only
         """Output text annotation added event."""
         raise ValueError(f"Unexpected stream event {event.type}: {event}")
 
+    def register_event_handler(self, event_type: str, handler: Callable[[Any], Any]) -> None:
+        """Registers (or replaces) the handler of a stream event type, e.g. 'response.output_text.delta'."""
+        self._event_handlers[event_type] = handler
+
     def _handle_event(self, event: ResponseStreamEvent) -> None:
         """
-        Dispatches the event to the correct handler using explicit type checks.
-        Raises ValueError if the event type is not recognized.
+        Dispatches the event to its handler with a single lookup on event.type.
+        Events without a handler are counted in unhandled_events.
         """
-        if isinstance(event, ResponseCreatedEvent):
-            self._on_response_created(event)
-        elif isinstance(event, ResponseQueuedEvent):
-            self._on_response_queued(event)
-        elif isinstance(event, ResponseInProgressEvent):
-            self._on_response_in_progress(event)
-        elif isinstance(event, ResponseOutputItemAddedEvent):
-            self._on_response_output_item_added(event)
-        elif isinstance(event, ResponseContentPartAddedEvent):
-            self._on_response_content_part_added(event)
-        elif isinstance(event, ResponseTextDeltaEvent):
-            self._on_response_output_text_delta(event)
-        elif isinstance(event, ResponseTextDoneEvent):
-            self._on_response_output_text_done(event)
-        elif isinstance(event, ResponseContentPartDoneEvent):
-            self._on_response_content_part_done(event)
-        elif isinstance(event, ResponseFunctionCallArgumentsDeltaEvent):
-            self._on_response_function_call_arguments_delta(event)
-        elif isinstance(event, ResponseFunctionCallArgumentsDoneEvent):
-            self._on_response_function_call_arguments_done(event)
-        elif isinstance(event, ResponseOutputItemDoneEvent):
-            self._on_response_output_item_done(event)
-        elif isinstance(event, ResponseCompletedEvent):
-            self._on_response_completed(event)
-        elif isinstance(event, ResponseFailedEvent):
-            self._on_response_failed(event)
-        elif isinstance(event, ResponseImageGenCallCompletedEvent):
-            self._on_response_image_generation_call_completed(event)
-        elif isinstance(event, ResponseWebSearchCallInProgressEvent):
-            self._on_response_web_search_call_in_progress(event)
-        elif isinstance(event, ResponseWebSearchCallCompletedEvent):
-            self._on_response_web_search_call_completed(event)
-        elif isinstance(event, ResponseWebSearchCallSearchingEvent):
-            self._on_response_web_search_call_searching(event)
-        elif isinstance(event, ResponseAudioDeltaEvent):
-            self._on_response_audio_delta(event)
-        elif isinstance(event, ResponseAudioDoneEvent):
-            self._on_response_audio_done(event)
-        elif isinstance(event, ResponseAudioTranscriptDeltaEvent):
-            self._on_response_audio_transcript_delta(event)
-        elif isinstance(event, ResponseAudioTranscriptDoneEvent):
-            self._on_response_audio_transcript_done(event)
-        elif isinstance(event, ResponseCodeInterpreterCallCodeDeltaEvent):
-            self._on_response_code_interpreter_call_code_delta(event)
-        elif isinstance(event, ResponseCodeInterpreterCallCodeDoneEvent):
-            self._on_response_code_interpreter_call_code_done(event)
-        elif isinstance(event, ResponseCodeInterpreterCallCompletedEvent):
-            self._on_response_code_interpreter_call_completed(event)
-        elif isinstance(event, ResponseCodeInterpreterCallInProgressEvent):
-            self._on_response_code_interpreter_call_in_progress(event)
-        elif isinstance(event, ResponseCodeInterpreterCallInterpretingEvent):
-            self._on_response_code_interpreter_call_interpreting(event)
-        elif isinstance(event, ResponseErrorEvent):
-            self._on_response_error(event)
-        elif isinstance(event, ResponseIncompleteEvent):
-            self._on_response_incomplete(event)
-        elif isinstance(event, ResponseRefusalDeltaEvent):
-            self._on_response_refusal_delta(event)
-        elif isinstance(event, ResponseRefusalDoneEvent):
-            self._on_response_refusal_done(event)
-        elif isinstance(event, ResponseReasoningDeltaEvent):
-            self._on_response_reasoning_delta(event)
-        elif isinstance(event, ResponseReasoningDoneEvent):
-            self._on_response_reasoning_done(event)
-        elif isinstance(event, ResponseReasoningSummaryDeltaEvent):
-            self._on_response_reasoning_summary_delta(event)
-        elif isinstance(event, ResponseReasoningSummaryDoneEvent):
-            self._on_response_reasoning_summary_done(event)
-        elif isinstance(event, ResponseReasoningSummaryPartAddedEvent):
-            self._on_response_reasoning_summary_part_added(event)
-        elif isinstance(event, ResponseReasoningSummaryPartDoneEvent):
-            self._on_response_reasoning_summary_part_done(event)
-        elif isinstance(event, ResponseReasoningSummaryTextDeltaEvent):
-            self._on_response_reasoning_summary_text_delta(event)
-        elif isinstance(event, ResponseReasoningSummaryTextDoneEvent):
-            self._on_response_reasoning_summary_text_done(event)
-        elif isinstance(event, ResponseFileSearchCallCompletedEvent):
-            self._on_response_file_search_call_completed(event)
-        elif isinstance(event, ResponseFileSearchCallInProgressEvent):
-            self._on_response_file_search_call_in_progress(event)
-        elif isinstance(event, ResponseFileSearchCallSearchingEvent):
-            self._on_response_file_search_call_searching(event)
-        elif isinstance(event, ResponseImageGenCallGeneratingEvent):
-            self._on_response_image_gen_call_generating(event)
-        elif isinstance(event, ResponseImageGenCallPartialImageEvent):
-            self._on_response_image_gen_call_partial_image(event)
-        elif isinstance(event, ResponseImageGenCallInProgressEvent):
-            self._on_response_image_gen_call_in_progress(event)
-        elif isinstance(event, ResponseMcpCallArgumentsDeltaEvent):
-            self._on_response_mcp_call_arguments_delta(event)
-        elif isinstance(event, ResponseMcpCallArgumentsDoneEvent):
-            self._on_response_mcp_call_arguments_done(event)
-        elif isinstance(event, ResponseMcpCallCompletedEvent):
-            self._on_response_mcp_call_completed(event)
-        elif isinstance(event, ResponseMcpCallFailedEvent):
-            self._on_response_mcp_call_failed(event)
-        elif isinstance(event, ResponseMcpCallInProgressEvent):
-            self._on_response_mcp_call_in_progress(event)
-        elif isinstance(event, ResponseMcpListToolsCompletedEvent):
-            self._on_response_mcp_list_tools_completed(event)
-        elif isinstance(event, ResponseMcpListToolsFailedEvent):
-            self._on_response_mcp_list_tools_failed(event)
-        elif isinstance(event, ResponseMcpListToolsInProgressEvent):
-            self._on_response_mcp_list_tools_in_progress(event)
-        elif isinstance(event, ResponseOutputTextAnnotationAddedEvent):
-            self._on_response_output_text_annotation_added(event)
-        else:
-            raise ValueError(f"Unexpected stream event {event.type}: {event}")
+        on_event = self.conversation.on_event
+        if on_event is not None:
+            on_event(event)
+        handler = self._event_handlers.get(event.type)
+        if handler is None:
+            self.unhandled_events[event.type] += 1
+            return
+        handler(event)
+
+    async def _stream_response(self, input: ResponseInput) -> None:
+        """Creates a response and dispatches its stream events; function calls start while it streams."""
+        stream = await self._create_response(input)
+        async for event in stream:
+            self.sequence_number = event.sequence_number # todo checker and generic response id update
+            self._handle_event(event)
 
     async def _execute_turn(self, user_input: ResponseInput):
         """
-        Executes a single turn of the conversation, handling the API call,
-        streaming the response, and processing any tool calls.
+        Executes a single turn of the conversation as a loop of model round-trips: each response is streamed,
+        the function calls it makes run concurrently, and all their outputs go back in one continuation,
+        until a response makes no calls or MAX_ROUND_TRIPS is reached. The outputs of a stopped turn are
+        sent with the next user input, as the model expects an output for every call.
+        The calls run in the turn's task group, so a cancelled turn leaves none behind.
         """
-        stream = await self._create_response(user_input)
-
-        async for event in stream:
-            self.sequence_number = event.sequence_number # todo checker and generic response id update
-            self._handle_event(event)                
-        
-        print() # Add a newline after text deltas
-        
+        conversation = self.conversation
+        input: ResponseInput = user_input
+        if conversation.pending_outputs:
+            input = [*conversation.pending_outputs, {"role": "user", "content": user_input}]
+            conversation.pending_outputs = []
+        if isinstance(user_input, str):
+            selection = self.tool_index.select(self.TOOLS, user_input, conversation.tool_history)
+            conversation.tool_history.start_turn(user_input)
+            conversation.tools = selection.tools
+            self.console(f"[system] tools sent={len(selection.tools)}/{len(self.TOOLS)} tokens={selection.tokens} saved={selection.tokens_saved}", flush=True)
+        try:
+            async with asyncio.TaskGroup() as group:
+                scheduler = conversation.scheduler = TurnScheduler(self, group, self.MAX_PARALLEL_CALLS, self.FUNCTION_TIMEOUT)
+                while True:
+                    await self._stream_response(input)
+                    outputs = await scheduler.collect()
+                    if not outputs:
+                        break
+                    scheduler.round_trips += 1
+                    if scheduler.round_trips >= self.MAX_ROUND_TRIPS:
+                        conversation.pending_outputs = outputs
+                        self.console(f"[system] turn stopped reason='max_round_trips' round_trips={self.MAX_ROUND_TRIPS}", flush=True)
+                        break
+                    self.console(f"[system] continuation outputs={len(outputs)} round_trip={scheduler.round_trips}", flush=True)
+                    input = outputs
+        finally:
+            conversation.scheduler = None
+            conversation.tools = None
+
+        self.console() # Add a newline after text deltas
 
     def terminate(self, *_, **__) -> ToolFunctionResult: # todo add farewell message
             self.RUNNING = False
@@ -610,12 +784,18 @@ class Agent: # todo debug log only
         """Runs the main conversation loop."""
         self.RUNNING = True
         self.last_response_id = None
+        discovery = asyncio.create_task(self._discover_tools()) # the prompt shows while the MCP servers start
         print(f"[system] agent='openai@{openai.__version__}' model='{self.MODEL}' instructions='{self.INSTRUCTIONS}' tools='{self.TOOLS}'.")
-        
+        self.startup.mark("prompt")
+        waited = False
+
         while self.RUNNING:
             try:
                 print(f"[user] ", end="", flush=True)
                 user_input = await asyncio.to_thread(sys.stdin.readline)
+                if not waited:
+                    waited = True
+                    await self._wait_for_tools(discovery)
 
                 # Get Response using the new API
                 try:
@@ -630,7 +810,8 @@ class Agent: # todo debug log only
 
             except (KeyboardInterrupt, EOFError):
                 self.RUNNING = False
-        
+
+        discovery.cancel()
         print("", flush=True)
 
 async def main() -> None:
@@ -11,21 +11,51 @@ Requirements:
 """
 import base64
 import json
+import logging
 import os
 import sys
+import time
 import traceback
-from typing import List, Optional, Union
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import timedelta
+from typing import Dict, List, Literal, Optional, Tuple, Union
 from halo import Halo
+from pydantic import BaseModel
 
 from mcp import StdioServerParameters, types
 import openai
-from openai.types.responses import Response, ResponseInputItemParam, ResponseInputParam, WebSearchToolParam
+from openai import Stream
+from openai.types.responses import Response, ResponseInputItemParam, ResponseInputParam, ResponseStreamEvent, WebSearchToolParam
 from openai.types.responses.function_tool_param import FunctionToolParam
 from openai.types.responses.response_function_tool_call import ResponseFunctionToolCall
 from openai.types.responses.response_input_param import FunctionCallOutput
 from openai.types.responses.tool_param import Mcp, ToolParam, ImageGeneration
 
-from mcp_client_agent import HttpServerParameters, McpClientAgent, ToolFunctionCall, ToolFunctionResult
+from mcp_client_agent import HttpServerParameters, ToolFunctionCall, ToolFunctionResult
+from mcp_router import McpRouter
+from startup import StartupTimer
+from tool_catalog import ToolCatalogCache
+from tool_index import ToolHistory, ToolIndex
+from tool_output import OutputBudget, ToolOutputEncoder
+from tool_result_cache import ToolResultCache
+
+log = logging.getLogger(__name__)
+
+class IterationMetrics(BaseModel):
+    """Timing of one model round-trip of a turn: the response, then its function calls."""
+    iteration: int
+    response_seconds: float
+    function_seconds: float
+    function_calls: int
+    tokens_saved: int = 0 # by the output encoder, against str(result), over the function calls
+
+class TurnMetrics(BaseModel):
+    """How a user turn went: its iterations and why it stopped."""
+    iterations: List[IterationMetrics] = []
+    seconds: float = 0
+    stop_reason: Literal["completed", "max_round_trips", "budget", "repeated_calls"] = "completed"
+    tools: int = 0 # sent with each request of the turn
+    tool_tokens_saved: int = 0 # by the tool selection, over the requests of the turn
 
 class Agent:
     """
@@ -36,11 +66,19 @@ class Agent:
     ResponseInput = Union[str | ResponseInputParam]
     
     def __init__(self) -> None:
+        self.startup = StartupTimer()
         # --- Configuration ---
         self.MODEL: str = "gpt-4.1" 
         self.INSTRUCTIONS: str = "You are an agent of delight. Use the tools provided."
         self.TOOLS: List[ToolParam] = []
         self.FUNCTIONS: dict[str, ToolFunctionCall] = {}
+        self.MAX_PARALLEL_CALLS: int = 8 # function calls of one response run concurrently up to this limit
+        self.FUNCTION_TIMEOUT: float = 60 # seconds per function call
+        self.STREAM: bool = True # render text as it arrives and start function calls as soon as their arguments are complete
+        self.MAX_ROUND_TRIPS: int = 10 # function call round-trips per user turn
+        self.TURN_BUDGET: float = 300 # wall-clock seconds per user turn, checked between round-trips
+        self.MAX_REPEATED_CALLS: int = 2 # stop when a response repeats the previous calls (name and arguments) this many times
+        self.TOOLS_WAIT: float = 30 # seconds the first request waits for MCP servers still starting; later ones join when up
 
         # --- Tool Definitions ---
 
@@ -74,18 +112,25 @@ class Agent:
         self.FUNCTIONS[TERMINATOR_FUNCTION_NAME] = self.terminate
 
         # Local Mcp Tool(s) (stdio, sse, streamable-http)
-        # McpClientAgent manually discovers and appends tools,
+        # McpRouter manually discovers and appends tools of all servers,
         # must manage functions and invocations manually on the client (!)
-        local_mcp_agent = McpClientAgent(StdioServerParameters(
-            command="npx",
-            args=["-y", "@professional-wiki/mediawiki-mcp-server@latest"],
-            env=None,
-        )) # stdio
-        # MCP_TRANSPORT=http PORT=9999 npx -y @professional-wiki/mediawiki-mcp-server@latest
-        local_mcp_agent = McpClientAgent(HttpServerParameters(url="http://localhost:9999/mcp")) # http
-        LOCAL_STDIO_TOOLS:List[FunctionToolParam] = local_mcp_agent.get_tools()
-        self.TOOLS.extend(LOCAL_STDIO_TOOLS)
-        self.FUNCTIONS.update(local_mcp_agent.get_functions())
+        # Servers start concurrently in the background, so the prompt shows at once; the first request waits
+        # for the ones still starting (see _wait_for_tools). Tool names are prefixed with the server label only when they collide.
+        # Catalogs are cached on disk, so startup waits for the connection but not for list_tools; stale ones refresh in the background.
+        # Results of the read-only wiki tools are cached (seconds per tool); set-wiki and page edits clear them.
+        tool_result_cache = ToolResultCache(tools={"get-page": 10 * 60, "get-page-history": 60, "search-page": 10 * 60, "get-file": 10 * 60})
+        self.mcp_router = McpRouter({
+            # MCP_TRANSPORT=http PORT=9999 npx -y @professional-wiki/mediawiki-mcp-server@latest
+            "mediawiki": HttpServerParameters(url="http://localhost:9999/mcp"), # http
+            # "mediawiki": StdioServerParameters(command="npx", args=["-y", "@professional-wiki/mediawiki-mcp-server@latest"]), # stdio
+            "profile": StdioServerParameters(
+                command=sys.executable,
+                args=[os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "adk-mcp", "mcp_profile.py")],
+            ), # stdio
+        }, catalog_cache=ToolCatalogCache(), result_cache=tool_result_cache)
+        self.mcp_router.add_tools_listener(self._on_tools_changed) # each server's tools join as it comes up
+        # Results go back to the model as their structured content or text, within per-tool budgets.
+        self.output_encoder = ToolOutputEncoder(budgets={"get-page": OutputBudget(max_tokens=8192), "get-page-history": OutputBudget(max_tokens=1024)})
 
         web_search = WebSearchToolParam(
             type="web_search_preview",
@@ -98,10 +143,35 @@ class Agent:
         )
         self.TOOLS.append(image_generation)
 
+        # Each turn sends the function tools most relevant to the user input (BM25 over names and descriptions),
+        # `bye` and the hosted tools; pass `embed=tool_index.openai_embedder(...)` to blend in embeddings.
+        self.tool_index = ToolIndex(top_k=8, pinned={TERMINATOR_FUNCTION_NAME})
+
+        with self.startup.phase("mcp_start"): # the tool list is complete but for the MCP tools, which the listener adds
+            self.mcp_router.start_in_background()
+
         # --- State ---
         self.RUNNING: bool = False
-        self.client: openai.OpenAI = self._initialize_client()
+        with self.startup.phase("openai_client"):
+            self.client: openai.OpenAI = self._initialize_client()
         self.last_response_id: Optional[str] = None
+        self.pending_outputs: List[FunctionCallOutput] = [] # outputs of a stopped turn, sent with the next user input
+        self.last_turn: Optional[TurnMetrics] = None
+        self.turn_tools: Optional[List[ToolParam]] = None # selected by tool_index for the running turn
+        self.tool_history = ToolHistory() # recent inputs and called tools, so follow-ups keep their tools
+        self.executor = ThreadPoolExecutor(max_workers=self.MAX_PARALLEL_CALLS, thread_name_prefix="function")
+        self.call_started: Dict[str, float] = {} # call_id -> when a worker picked the call up
+        self.startup_reported: bool = False
+
+    def _on_tools_changed(self, old_tools: List[FunctionToolParam], new_tools: List[FunctionToolParam]) -> None:
+        """
+        Swaps in the tools of a started server or a refreshed catalog; the next request sends the new list.
+        Runs on the MCP loop thread while function calls may run, so both are replaced with one assignment each:
+        a call never sees a tool missing that is in the old list and the new one.
+        """
+        old_names = {tool["name"] for tool in old_tools}
+        self.TOOLS = [tool for tool in self.TOOLS if tool not in old_tools] + list(new_tools)
+        self.FUNCTIONS = {name: function for name, function in self.FUNCTIONS.items() if name not in old_names} | self.mcp_router.get_functions()
 
     def _initialize_client(self) -> openai.OpenAI:
         """Checks for API key and initializes the OpenAI client."""
@@ -114,59 +184,254 @@ class Agent:
             sys.stderr.write(f"Error initializing OpenAI client: {e}\n")
             sys.exit(1)
 
-    def _create_response(self, input: ResponseInput):
+    def _create_response(self, input: ResponseInput, stream: bool = False):
         """Utility method to create a response from the OpenAI client given user input."""
-        with Halo(spinner='dots') as spinner:
-            return self.client.responses.create(
-                background=False,
-                stream=False,
-                store=True,
-                model=self.MODEL,
-                instructions=self.INSTRUCTIONS,
-                tools=self.TOOLS,
-                input=input,
-                previous_response_id=self.last_response_id,
-            )
+        return self.client.responses.create(
+            background=False,
+            stream=stream,
+            store=True,
+            model=self.MODEL,
+            instructions=self.INSTRUCTIONS,
+            tools=self.TOOLS if self.turn_tools is None else self.turn_tools,
+            input=input,
+            previous_response_id=self.last_response_id,
+        )
+
+    def _stream_response(self, input: ResponseInput) -> Tuple[Response, Dict[str, Future[FunctionCallOutput]]]:
+        """
+        Streams a response: prints text deltas as they arrive and submits each function call
+        as soon as its `response.function_call_arguments.done` event arrives,
+        so tools run while the model is still generating the rest of its output.
+        Returns the completed response and the started calls by call_id.
+        """
+        spinner = Halo(spinner='dots')
+        spinner.start()
+        function_calls: Dict[str, ResponseFunctionToolCall] = {} # by item_id, arguments still empty
+        started: Dict[str, Future[FunctionCallOutput]] = {}
+        response: Optional[Response] = None
+        try:
+            events: Stream[ResponseStreamEvent] = self._create_response(input, stream=True)
+            for event in events:
+                if spinner.spinner_id: # stop on the first event only, stop() clears the line
+                    spinner.stop()
+                if event.type == "response.output_item.added" and event.item.type == "function_call":
+                    function_calls[event.item.id or event.item.call_id] = event.item
+                elif event.type == "response.function_call_arguments.done":
+                    functionCall = function_calls.pop(event.item_id).model_copy(update={"arguments": event.arguments})
+                    started[functionCall.call_id] = self.executor.submit(self._handle_function_call, functionCall)
+                elif event.type == "response.content_part.added" and event.part.type == "output_text":
+                    print("[agent] ", end="", flush=True)
+                elif event.type == "response.output_text.delta":
+                    print(event.delta, end="", flush=True)
+                elif event.type == "response.content_part.done" and event.part.type == "output_text":
+                    print("", flush=True)
+                elif event.type == "error":
+                    print(f"[system] error='{event.message}'", flush=True)
+                elif event.type in ("response.completed", "response.failed", "response.incomplete"):
+                    response = event.response
+        finally:
+            if spinner.spinner_id:
+                spinner.stop()
+        if response is None:
+            raise RuntimeError("The response stream ended without a final response.")
+        if response.error:
+            print(f"[system] response='{response.id}' error='{response.error}'", flush=True)
+        return response, started
+
+    def _respond(self, input: ResponseInput) -> Tuple[Response, Dict[str, Future[FunctionCallOutput]]]:
+        """Creates the next response, streamed or not; see `_stream_response` for the started calls."""
+        if self.STREAM:
+            return self._stream_response(input)
+        with Halo(spinner='dots'):
+            return self._create_response(input), {}
 
     def _handle_function_result(self, functionCall: ResponseFunctionToolCall, result: ToolFunctionResult) -> FunctionCallOutput:
-        """Handles a function result from the model's response."""
+        """Handles a function result from the model's response: the output is the result's compact encoding."""
+        encoded = self.output_encoder.encode(functionCall.name, result)
+        print(f"[system] function_output='{functionCall.call_id}' tokens={encoded.tokens} saved={encoded.tokens_saved} truncated={encoded.truncated}", flush=True)
         return FunctionCallOutput(
             type="function_call_output",
             call_id=functionCall.call_id,
-            output=str(result)
+            output=encoded.text
         )
 
+    def _handle_function_error(self, functionCall: ResponseFunctionToolCall, error: str) -> FunctionCallOutput:
+        """Reports a failed function call to the model instead of aborting the turn."""
+        print(f"[system] function='{functionCall}' error='{error}'", flush=True)
+        return self._handle_function_result(functionCall, ToolFunctionResult(
+            content=[types.TextContent(type="text", text=error)],
+            structuredContent=None,
+            isError=True
+        ))
+
     def _handle_function_call(self, functionCall: ResponseFunctionToolCall) -> FunctionCallOutput:
         """Handles a function call from the model's response."""
+        self.call_started[functionCall.call_id] = time.perf_counter()
+        self.tool_history.called(functionCall.name)
         function: ToolFunctionCall = self.FUNCTIONS[functionCall.name]
-        result = function(json.loads(functionCall.arguments))
+        result = function(json.loads(functionCall.arguments), read_timeout_seconds=timedelta(seconds=self.FUNCTION_TIMEOUT))
         print(f"[system] function='{functionCall}' result='{result}'", flush=True)
         return self._handle_function_result(functionCall, result)
 
+    def _handle_function_calls(self, functionCalls: List[ResponseFunctionToolCall], started: Optional[Dict[str, Future[FunctionCallOutput]]] = None) -> List[FunctionCallOutput]:
+        """
+        Runs the function calls of a response concurrently and returns their outputs in call order.
+        Calls already started while streaming (by call_id) are awaited instead of submitted again.
+        Each call has FUNCTION_TIMEOUT seconds from when a worker picks it up; the timeout is passed down to the tool,
+        the wait here is a backstop. Calls queued for a worker wait while the response's calls keep starting, and are
+        reported as not started when no worker freed up for FUNCTION_TIMEOUT seconds.
+        """
+        started = started or {}
+        futures: List[Future[FunctionCallOutput]] = [
+            started.pop(call.call_id) if call.call_id in started else self.executor.submit(self._handle_function_call, call)
+            for call in functionCalls
+        ]
+        submitted_at = time.perf_counter()
+        outputs: List[Optional[FunctionCallOutput]] = [None] * len(functionCalls)
+        pending: Dict[Future[FunctionCallOutput], int] = {future: index for index, future in enumerate(futures)}
+        while pending:
+            now = time.perf_counter()
+            starts = [self.call_started.get(call.call_id) for call in functionCalls]
+            queue_deadline = max([submitted_at, *(start for start in starts if start is not None)]) + self.FUNCTION_TIMEOUT
+            deadlines: List[float] = []
+            for future, index in list(pending.items()):
+                if future.done():
+                    deadlines.append(now)
+                    continue
+                functionCall = functionCalls[index]
+                start = starts[index]
+                deadline = queue_deadline if start is None else start + self.FUNCTION_TIMEOUT
+                if now < deadline:
+                    deadlines.append(deadline)
+                elif start is None and future.cancel(): # still queued, it does not start any more
+                    del pending[future]
+                    outputs[index] = self._handle_function_error(functionCall, f"Function '{functionCall.name}' not started: no worker was free for {self.FUNCTION_TIMEOUT}s.")
+                elif start is None: # picked up just now
+                    self.call_started.setdefault(functionCall.call_id, now)
+                    deadlines.append(now + self.FUNCTION_TIMEOUT)
+                else:
+                    del pending[future]
+                    outputs[index] = self._handle_function_error(functionCall, f"Function '{functionCall.name}' timed out after {self.FUNCTION_TIMEOUT}s.")
+            if not pending:
+                break
+            done, _ = wait(pending, timeout=max(0, min(deadlines) - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    outputs[index] = future.result()
+                except Exception as e:
+                    outputs[index] = self._handle_function_error(functionCalls[index], f"Function '{functionCalls[index].name}' failed: {e}")
+        for call in functionCalls:
+            self.call_started.pop(call.call_id, None)
+        return [output for output in outputs if output is not None]
+
     def _handle_image_generation(self, id:str, image: str) -> None:
         print(f"[system] image='{id}.png'", flush=True)
         with open(f"{id}.png", "wb") as f:
             f.write(base64.b64decode(image))
 
-    def _handle_response(self, response: Response):
-        """Utility method to handle the response object: prints output_text and handles function calls."""
+    def _handle_response(self, response: Response, started: Optional[Dict[str, Future[FunctionCallOutput]]] = None) -> List[FunctionCallOutput]:
+        """Utility method to handle the response object: prints output_text, runs function calls and returns their outputs."""
         if hasattr(response, 'id') and response.id:
             self.last_response_id = response.id
 
-        if hasattr(response, 'output_text') and response.output_text:
+        if not self.STREAM and hasattr(response, 'output_text') and response.output_text: # streamed text is already printed
             print(f"[agent] {response.output_text}", flush=True)
 
-        function_results: List[ResponseInputItemParam] = []
+        function_calls: List[ResponseFunctionToolCall] = []
         if hasattr(response, 'output') and response.output:
             for item in response.output:
                 if getattr(item, 'type', None) == 'image_generation_call':
                     self._handle_image_generation(getattr(item, 'id'), getattr(item, 'result'))
                 if getattr(item, 'type', None) == 'function_call':
-                    function_call = ResponseFunctionToolCall.model_validate(item)
-                    function_results.append(self._handle_function_call(function_call))
-        if function_results:
-            response = self._create_response(function_results)
-            self._handle_response(response) # recursion for the win
+                    function_calls.append(ResponseFunctionToolCall.model_validate(item))
+        return self._handle_function_calls(function_calls, started)
+
+    @staticmethod
+    def _call_signature(outputs: List[FunctionCallOutput], response: Response) -> Tuple[Tuple[str, str], ...]:
+        """The (name, arguments) of the function calls answered by the outputs, to spot a model repeating itself."""
+        calls = {item.call_id: item for item in response.output or [] if getattr(item, 'type', None) == 'function_call'}
+        return tuple((calls[output["call_id"]].name, calls[output["call_id"]].arguments) for output in outputs if output["call_id"] in calls)
+
+    def _wait_for_tools(self) -> None:
+        """
+        Before the first request: waits for the MCP servers still starting, at most TOOLS_WAIT seconds.
+        Servers with a cached catalog of their version are up once connected; a server still starting after that joins when it is up.
+        Then prints the startup report.
+        """
+        if self.startup_reported:
+            return
+        self.startup_reported = True
+        with self.startup.phase("tools_wait"):
+            starting = self.mcp_router.starting
+            if starting:
+                with Halo(text=f"starting {', '.join(starting)}", spinner='dots'):
+                    starting = self.mcp_router.wait_started(self.TOOLS_WAIT)
+        for label, error in self.mcp_router.errors.items():
+            print(f"[system] mcp server='{label}' error='{error}'", flush=True)
+        for label in starting:
+            print(f"[system] mcp server='{label}' still starting, its tools join when it is up", flush=True)
+        for label, seconds in self.mcp_router.startup_seconds.items():
+            self.startup.record(f"mcp:{label}", seconds, self.mcp_router.startup_started[label])
+        print(f"[system] startup {self.startup.report()}", flush=True)
+
+    def _run_turn(self, user_input: str) -> TurnMetrics:
+        """
+        Runs a user turn as a loop of model round-trips until a response has no function calls.
+        The loop is bounded by MAX_ROUND_TRIPS, TURN_BUDGET and MAX_REPEATED_CALLS; outputs of a stopped turn
+        are sent with the next user input, as the model expects an output for every call.
+        """
+        turn = TurnMetrics()
+        started_at = time.perf_counter()
+        input: ResponseInput = user_input
+        if self.pending_outputs:
+            input = [*self.pending_outputs, {"role": "user", "content": user_input}]
+            self.pending_outputs = []
+        self._wait_for_tools()
+        selection = self.tool_index.select(self.TOOLS, user_input, self.tool_history)
+        self.tool_history.start_turn(user_input)
+        self.turn_tools = selection.tools
+        turn.tools = len(selection.tools)
+        print(f"[system] tools sent={len(selection.tools)}/{len(self.TOOLS)} tokens={selection.tokens} saved={selection.tokens_saved}", flush=True)
+        previous_signature: Tuple[Tuple[str, str], ...] = ()
+        repeats = 0
+        while True:
+            iteration_started = time.perf_counter()
+            tokens_saved = self.output_encoder.tokens_saved # calls start while the response streams
+            response, started = self._respond(input)
+            functions_started = time.perf_counter()
+            outputs = self._handle_response(response, started)
+            iteration = IterationMetrics(
+                iteration=len(turn.iterations) + 1,
+                response_seconds=functions_started - iteration_started,
+                function_seconds=time.perf_counter() - functions_started,
+                function_calls=len(outputs),
+                tokens_saved=self.output_encoder.tokens_saved - tokens_saved,
+            )
+            turn.iterations.append(iteration)
+            log.info(f"turn iteration {iteration.model_dump_json()}")
+            if not outputs:
+                break
+
+            signature = self._call_signature(outputs, response)
+            repeats = repeats + 1 if signature == previous_signature else 0
+            previous_signature = signature
+            if repeats >= self.MAX_REPEATED_CALLS:
+                turn.stop_reason = "repeated_calls"
+            elif len(turn.iterations) >= self.MAX_ROUND_TRIPS:
+                turn.stop_reason = "max_round_trips"
+            elif time.perf_counter() - started_at >= self.TURN_BUDGET:
+                turn.stop_reason = "budget"
+            if turn.stop_reason != "completed":
+                self.pending_outputs = outputs
+                print(f"[system] turn stopped reason='{turn.stop_reason}' iterations={len(turn.iterations)}", flush=True)
+                break
+            input = list(outputs)
+        self.turn_tools = None
+        turn.tool_tokens_saved = selection.tokens_saved * len(turn.iterations)
+        turn.seconds = time.perf_counter() - started_at
+        self.last_turn = turn
+        return turn
 
     def terminate(self, *_, **__) -> ToolFunctionResult:
             self.RUNNING = False
@@ -180,8 +445,9 @@ class Agent:
         """Runs the main conversation loop."""
         self.RUNNING = True
         self.last_response_id = None
-        print(f"[system] model='{self.MODEL}' instructions='{self.INSTRUCTIONS}' tools='{self.TOOLS}'.")
-        
+        print(f"[system] model='{self.MODEL}' instructions='{self.INSTRUCTIONS}' tools='{self.TOOLS}' mcp_starting='{self.mcp_router.starting}'.")
+        self.startup.mark("prompt")
+
         while self.RUNNING:
             try:
                 print(f"[user] ", end="", flush=True)
@@ -189,8 +455,7 @@ class Agent:
 
                 # Get Response using the new API
                 try:
-                    response = self._create_response(user_input)
-                    self._handle_response(response)
+                    self._run_turn(user_input)
 
                 except openai.APIError as e:
                     sys.stderr.write(f"OpenAI API Error: {e}\n")
@@ -6,6 +6,8 @@ from openai import AsyncOpenAI
 from mcp import ClientSession, types
 from mcp.client.streamable_http import streamablehttp_client
 
+from mcp_client_agent import stream_tool_call
+
 # --- Basic Logging Setup ---
 logging.basicConfig(
     level=logging.INFO,
@@ -38,13 +40,19 @@ tools = [
 async def call_mcp_tool(session: ClientSession, function_name: str, function_args: dict) -> str:
     """
     Calls a tool on the MCP server and aggregates the streaming response.
+    Partial content is logged as soon as the server streams it.
     """
     log.info(f"LLM decided to call tool: '{function_name}' with args: {function_args}")
     
     profile_parts = []
     try:
-        # Await the result from the tool call
-        tool_result = await session.call_tool(function_name, function_args)
+        # Iterate the streamed chunks; the last item is the result of the tool call
+        tool_result: types.CallToolResult | None = None
+        async for chunk in stream_tool_call(lambda progress_callback: session.call_tool(function_name, function_args, progress_callback=progress_callback)):
+            if isinstance(chunk, types.TextContent):
+                log.info(f"  > Streamed chunk: '{chunk.text}'")
+            else:
+                tool_result = chunk
         log.info(f"Received tool result object: {tool_result}")
 
         # The result's 'content' is a list of content objects.
@@ -14,6 +14,7 @@ from langchain.agents import AgentExecutor, create_openai_tools_agent
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
 from mcp_toolkit import MCPToolkit
+from tool_catalog import ToolCatalogCache
 
 # --- Basic Logging Setup ---
 logging.basicConfig(
@@ -34,7 +35,7 @@ async def main():
     try:
         # Use the MCPToolkit as an async context manager.
         # It handles the connection, session, and cleanup automatically.
-        async with MCPToolkit(url=server_url) as toolkit:
+        async with MCPToolkit(url=server_url, catalog_cache=ToolCatalogCache()) as toolkit:
             
             # 1. Discover tools automatically from the server
             mcp_tools = await toolkit.get_tools_async()
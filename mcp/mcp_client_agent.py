@@ -1,14 +1,24 @@
 """
 Defines a reusable MCPClientAgent for interacting with MCP servers.
-This version uses separate connection manager classes for stdio and http.
+This version uses separate connection manager classes for stdio and http,
+and keeps warm sessions in a pool so tool calls skip the connect/initialize handshake.
 """
 import asyncio
+import atexit
+import concurrent.futures
+import logging
+import threading
+import time
+import weakref
 from datetime import timedelta
 from functools import partial
 import traceback
-from contextlib import _AsyncGeneratorContextManager
-from typing import List, Dict, Any, Union, Optional, Protocol
+from contextlib import _AsyncGeneratorContextManager, asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, ClassVar, Coroutine, List, Dict, Any, TypeVar, Union, Optional, Protocol
 
+import anyio
+
+from mcp.client.session import MessageHandlerFnT
 from mcp.shared.session import ProgressFnT
 from pydantic import BaseModel
 from mcp import ClientSession, types
@@ -18,6 +28,11 @@ from mcp.shared.message import SessionMessage
 from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
 from openai.types.responses.function_tool_param import FunctionToolParam
 
+from tool_catalog import ToolCatalog, ToolCatalogCache
+from tool_result_cache import ToolResultCache
+
+log = logging.getLogger(__name__)
+
 # --- Server Configuration Types ---
 
 class HttpServerParameters(BaseModel): # for some reason the mcp guys did not define this type
@@ -57,14 +72,49 @@ class ToolFunctionCall(Protocol):
     ) -> ToolFunctionResult:
         ...
 
+class AsyncToolFunctionCall(Protocol):
+    """A protocol for a coroutine function that executes a tool, matching the signature of `McpClientAgent.acall_tool`."""
+    async def __call__(
+        self,
+        arguments: ToolFunctionArguments,
+        read_timeout_seconds: Optional[timedelta] = None,
+        progress_callback: Optional[ProgressFnT] = None,
+    ) -> ToolFunctionResult:
+        ...
+
+# Partial output of a streamed tool call: text chunks while the tool runs, then the final result.
+ToolStreamChunk = Union[types.TextContent, ToolFunctionResult]
+
+async def stream_tool_call(call: Callable[[ProgressFnT], Awaitable[ToolFunctionResult]]) -> AsyncIterator[ToolStreamChunk]:
+    """
+    Runs `call(progress_callback)` and yields a TextContent for every progress notification
+    that carries a message, as soon as it arrives, followed by the final CallToolResult.
+    Servers stream partial content this way, see `get_profile` in server.py.
+    """
+    chunks: asyncio.Queue[Optional[types.TextContent]] = asyncio.Queue()
+
+    async def on_progress(progress: float, total: float | None, message: str | None) -> None:
+        if message:
+            chunks.put_nowait(types.TextContent(type="text", text=message))
+
+    task = asyncio.create_task(call(on_progress))
+    task.add_done_callback(lambda _: chunks.put_nowait(None)) # progress notifications always precede the response
+    try:
+        while (chunk := await chunks.get()) is not None:
+            yield chunk
+        yield await task
+    finally:
+        task.cancel()
+
 # --- Connection Manager Classes ---
 
 class McpClientSession:
     """
     A client agent that connects to an MCP server, handles sessions.
     """
-    def __init__(self, server_params: McpServerParameters):
+    def __init__(self, server_params: McpServerParameters, message_handler: Optional[MessageHandlerFnT] = None):
         self._server_params: McpServerParameters = server_params
+        self._message_handler = message_handler
         self._client: Optional[McpClientAsync] = None
         self._session: Optional[ClientSession] = None
 
@@ -80,15 +130,313 @@ class McpClientSession:
         else:
             raise TypeError(f"Unsupported connection type {self._server_params}")
             
-        self._session = ClientSession(read, write)
+        self._session = ClientSession(read, write, message_handler=self._message_handler)
         await self._session.__aenter__()
         return self._session
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self._session:
-            await self._session.__aexit__(exc_type, exc_val, exc_tb)
-        if self._client:
-            await self._client.__aexit__(exc_type, exc_val, exc_tb)
+        try:
+            if self._session:
+                await self._session.__aexit__(exc_type, exc_val, exc_tb)
+        finally: # always close the transport, a generator left to the garbage collector exits its cancel scope in another task
+            if self._client:
+                await self._client.__aexit__(exc_type, exc_val, exc_tb)
+
+class McpSessionPoolConfig(BaseModel):
+    min_size: int = 1 # sessions kept warm, even when idle
+    max_size: int = 4 # upper bound of concurrently open sessions
+    idle_timeout: float = 60 * 5 # seconds an idle session above min_size is kept
+    health_check_interval: float = 30 # seconds after which an idle session is pinged before reuse
+    health_check_timeout: float = 5
+    acquire_timeout: float = 60 # seconds to wait for a free session (includes connecting)
+
+T = TypeVar("T")
+
+# Errors that mean the session was already dead, so the request never reached the server and may be retried.
+SESSION_CLOSED_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream)
+
+class McpPooledSession:
+    """
+    An initialized ClientSession owned by a dedicated task.
+    The task enters and exits the transport and session contexts itself,
+    because anyio cancel scopes must be exited from the task that entered them.
+    """
+    def __init__(self, server_params: McpServerParameters, message_handler: Optional[MessageHandlerFnT] = None):
+        self._server_params = server_params
+        self._message_handler = message_handler
+        self.session: Optional[ClientSession] = None
+        self.server_info: Optional[types.Implementation] = None
+        self.last_used: float = time.monotonic()
+        self.last_checked: float = time.monotonic()
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error: Optional[BaseException] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def closed(self) -> bool:
+        return self.session is None
+
+    async def open(self) -> "McpPooledSession":
+        self._task = asyncio.create_task(self._run())
+        await self._ready.wait()
+        if self._error:
+            raise self._error
+        return self
+
+    async def _run(self) -> None:
+        try:
+            async with McpClientSession(self._server_params, self._message_handler) as session:
+                self.server_info = (await session.initialize()).serverInfo
+                self.session = session
+                self._ready.set()
+                await self._closing.wait()
+        except Exception as e:
+            self._error = e
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def ping(self, timeout: float) -> bool:
+        if self.session is None:
+            return False
+        try:
+            with anyio.fail_after(timeout):
+                await self.session.send_ping()
+        except Exception:
+            return False
+        self.last_checked = time.monotonic()
+        return True
+
+    async def close(self) -> None:
+        self._closing.set()
+        if self._task:
+            await self._task
+
+class McpSessionPool:
+    """
+    A pool of warm sessions to a single MCP server.
+    Sessions are reused across calls, pinged when they were idle for a while,
+    evicted after the idle timeout and replaced when they die.
+    Pools are shared per event loop and server parameters, see `for_params`.
+    """
+    _pools: ClassVar[weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, "McpSessionPool"]]] = weakref.WeakKeyDictionary()
+
+    def __init__(self, server_params: McpServerParameters, config: Optional[McpSessionPoolConfig] = None):
+        self._server_params = server_params
+        self.config = config or McpSessionPoolConfig()
+        self._idle: List[McpPooledSession] = [] # LIFO, the most recently used session is the warmest
+        self._size: int = 0 # open + opening sessions
+        self._condition = asyncio.Condition()
+        self._reaper: Optional[asyncio.Task] = None
+        self.server_info: Optional[types.Implementation] = None # as reported by the latest opened session
+        self._tools_changed_listeners: List[Callable[[], Any]] = []
+
+    @staticmethod
+    def key(server_params: McpServerParameters) -> str:
+        return f"{type(server_params).__name__}:{server_params.model_dump_json()}"
+
+    @classmethod
+    def for_params(cls, server_params: McpServerParameters, config: Optional[McpSessionPoolConfig] = None) -> "McpSessionPool":
+        """
+        Returns the running loop's shared pool for the given server parameters, creating it on first use.
+        Sessions are bound to the loop that opened them, so each loop gets its own pools.
+        The pools of closed loops are dropped here: their reapers and conditions hold on to the loop,
+        so the weak keys alone would never let them go.
+        """
+        for loop in [loop for loop in cls._pools if loop.is_closed()]:
+            cls._pools.pop(loop, None)
+        pools = cls._pools.setdefault(asyncio.get_running_loop(), {})
+        key = cls.key(server_params)
+        pool = pools.get(key)
+        if pool is None:
+            pool = pools[key] = cls(server_params, config)
+        return pool
+
+    @classmethod
+    async def close_all(cls) -> None:
+        """Closes all pools of the running loop."""
+        pools = list(cls._pools.pop(asyncio.get_running_loop(), {}).values())
+        await asyncio.gather(*(pool.close() for pool in pools), return_exceptions=True)
+
+    def add_tools_changed_listener(self, listener: Callable[[], Any]) -> None:
+        """Registers a callback for `notifications/tools/list_changed` from any session of the pool."""
+        self._tools_changed_listeners.append(listener)
+
+    async def _handle_message(self, message: Any) -> None:
+        if isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+            for listener in list(self._tools_changed_listeners):
+                listener()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    async def _reserve(self) -> Optional[McpPooledSession]:
+        """Returns an idle session, or None after reserving a slot for a new one."""
+        async with self._condition:
+            async with asyncio.timeout(self.config.acquire_timeout):
+                await self._condition.wait_for(lambda: self._idle or self._size < self.config.max_size)
+            if self._idle:
+                return self._idle.pop()
+            self._size += 1
+            return None
+
+    async def _open(self) -> McpPooledSession:
+        try:
+            async with asyncio.timeout(self.config.acquire_timeout):
+                pooled = await McpPooledSession(self._server_params, self._handle_message).open()
+                self.server_info = pooled.server_info
+                return pooled
+        except BaseException:
+            await self._forget()
+            raise
+
+    async def _forget(self) -> None:
+        async with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    async def _discard(self, pooled: McpPooledSession) -> None:
+        try:
+            await pooled.close()
+        finally:
+            await self._forget()
+
+    async def _healthy(self, pooled: McpPooledSession) -> bool:
+        if pooled.closed:
+            return False
+        if time.monotonic() - pooled.last_checked < self.config.health_check_interval:
+            return True
+        return await pooled.ping(self.config.health_check_timeout)
+
+    async def acquire(self) -> McpPooledSession:
+        """Returns a healthy session, reconnecting or waiting for a free one as needed."""
+        self._start_reaper()
+        while True:
+            pooled = await self._reserve()
+            if pooled is None:
+                return await self._open()
+            if await self._healthy(pooled):
+                return pooled
+            await self._discard(pooled)
+
+    async def warm(self) -> None:
+        """Makes sure a session is open, e.g. to learn `server_info` before trusting a cached catalog."""
+        await self.release(await self.acquire())
+
+    async def release(self, pooled: McpPooledSession, discard: bool = False) -> None:
+        if discard or pooled.closed:
+            await self._discard(pooled)
+            return
+        pooled.last_used = pooled.last_checked = time.monotonic()
+        async with self._condition:
+            self._idle.append(pooled)
+            self._condition.notify()
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[ClientSession]:
+        """Borrows an initialized session for the duration of the context."""
+        pooled = await self.acquire()
+        discard = False
+        try:
+            yield pooled.session
+        except SESSION_CLOSED_ERRORS:
+            discard = True
+            raise
+        finally:
+            await self.release(pooled, discard)
+
+    async def run(self, operation: Callable[[ClientSession], Awaitable[T]], retries: int = 1) -> T:
+        """Runs the operation on a pooled session, retrying on a fresh session if the borrowed one turns out to be dead."""
+        for attempt in range(retries + 1):
+            try:
+                async with self.session() as session:
+                    return await operation(session)
+            except SESSION_CLOSED_ERRORS:
+                if attempt == retries:
+                    raise
+        raise AssertionError("unreachable")
+
+    def _start_reaper(self) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap())
+
+    async def _reap(self) -> None:
+        """Keeps min_size sessions warm, drops dead ones and evicts those idle for longer than the idle timeout."""
+        interval = max(0.1, min(self.config.idle_timeout, self.config.health_check_interval) / 2)
+        while True:
+            await self._warm_up()
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            async with self._condition:
+                dead = [p for p in self._idle if p.closed]
+                expired = [p for p in self._idle if not p.closed and now - p.last_used > self.config.idle_timeout]
+                expired = expired[:max(0, self._size - len(dead) - self.config.min_size)] # oldest first
+                self._idle = [p for p in self._idle if p not in dead and p not in expired]
+            for pooled in dead + expired:
+                await self._discard(pooled)
+
+    async def _warm_up(self) -> None:
+        while True:
+            async with self._condition:
+                if self._size >= self.config.min_size:
+                    return
+                self._size += 1
+            try:
+                pooled = await self._open()
+            except Exception:
+                return # the next acquire or reaper round retries
+            await self.release(pooled)
+
+    async def close(self) -> None:
+        if self._reaper:
+            self._reaper.cancel()
+            self._reaper = None
+        async with self._condition:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            await self._discard(pooled)
+
+class McpEventLoopThread:
+    """
+    A daemon thread running the event loop that owns the pooled sessions of the sync API.
+    A loop per `asyncio.run` call would tear down every session after each call.
+    """
+    _instance: ClassVar[Optional["McpEventLoopThread"]] = None
+    _lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="mcp-client-loop", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def get(cls) -> "McpEventLoopThread":
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+                atexit.register(cls._instance.shutdown)
+            return cls._instance
+
+    def run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        """Runs the coroutine on the loop thread and blocks until it is done."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def submit(self, coroutine: Coroutine[Any, Any, T]) -> "concurrent.futures.Future[T]":
+        """Runs the coroutine on the loop thread without waiting for it."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def shutdown(self) -> None:
+        try:
+            asyncio.run_coroutine_threadsafe(McpSessionPool.close_all(), self.loop).result(timeout=5)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
 
 # --- Main Agent Class ---
 
@@ -96,43 +444,162 @@ class McpClientAgent:
     """
     A client agent that connects to an MCP server, discovers its tools,
     and provides methods to access them.
+
+    The `a`-prefixed coroutines run on the caller's event loop and share its session pool.
+    The sync methods run the same coroutines on a background loop thread,
+    so they can be used from plain scripts.
+
+    With a `result_cache`, calls of cacheable tools are answered from the cache when possible,
+    and a call of any other tool (which may write) clears the cached results of this server.
     """
-    def __init__(self, server_params: McpServerParameters):
+    def __init__(self, server_params: McpServerParameters, pool_config: Optional[McpSessionPoolConfig] = None, catalog_cache: Optional[ToolCatalogCache] = None, result_cache: Optional[ToolResultCache] = None):
         self._server_params = server_params
+        self._pool_config = pool_config
+        self._catalog_cache = catalog_cache
+        self._result_cache = result_cache
         self._tools: List[FunctionToolParam] = []
+        self._mcp_tools: Dict[str, types.Tool] = {}
+        self._tools_listeners: List[Callable[[List[FunctionToolParam], List[FunctionToolParam]], Any]] = []
+        self._watched_pools: weakref.WeakSet[McpSessionPool] = weakref.WeakSet()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def _pool(self) -> McpSessionPool:
+        pool = McpSessionPool.for_params(self._server_params, self._pool_config)
+        if pool not in self._watched_pools:
+            self._watched_pools.add(pool)
+            pool.add_tools_changed_listener(self._on_server_tools_changed)
+        return pool
+
+    @property
+    def server_key(self) -> str:
+        return McpSessionPool.key(self._server_params)
+
+    @property
+    def tools(self) -> List[FunctionToolParam]:
+        """The tools discovered so far in OpenAI's function format, a copy; empty until `get_tools`."""
+        return list(self._tools)
+
+    def _run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        return McpEventLoopThread.get().run(coroutine)
 
-    async def _discover_tools(self, session: ClientSession) -> None:
-        await session.initialize()
-        tool_response = await session.list_tools()
-        for tool in tool_response.tools:
-            params = tool.inputSchema.copy()
-            params.pop("$schema", None)  # Remove the unsupported $schema key
-            self._tools.append(FunctionToolParam(
-                type="function",
-                name=tool.name,
-                description=tool.description, # TODO: append tool.outputSchema etc?
-                parameters=params,
-                strict=False,
+    @staticmethod
+    def _to_function_tool(tool: types.Tool) -> FunctionToolParam:
+        params = tool.inputSchema.copy()
+        params.pop("$schema", None)  # Remove the unsupported $schema key
+        return FunctionToolParam(
+            type="function",
+            name=tool.name,
+            description=tool.description, # TODO: append tool.outputSchema etc?
+            parameters=params,
+            strict=False,
+        )
+
+    def add_tools_listener(self, listener: Callable[[List[FunctionToolParam], List[FunctionToolParam]], Any]) -> None:
+        """Registers a callback(old_tools, new_tools), called when a refresh changes the tools."""
+        self._tools_listeners.append(listener)
+
+    def _set_tools(self, tools: List[types.Tool]) -> None:
+        old_tools = self._tools
+        self._mcp_tools = {tool.name: tool for tool in tools}
+        self._tools = [self._to_function_tool(tool) for tool in tools]
+        if old_tools and old_tools != self._tools:
+            for listener in list(self._tools_listeners):
+                listener(old_tools, self._tools)
+
+    async def _discover_tools(self, session: ClientSession) -> List[types.Tool]:
+        tools: List[types.Tool] = []
+        cursor: Optional[str] = None
+        while True:
+            tool_response = await session.list_tools(cursor)
+            tools.extend(tool_response.tools)
+            cursor = tool_response.nextCursor
+            if not cursor:
+                return tools
+
+    async def arefresh_tools(self) -> List[FunctionToolParam]:
+        """Lists the tools on the server and updates the catalog cache."""
+        pool = self._pool
+        tools = await pool.run(self._discover_tools)
+        if self._catalog_cache:
+            self._catalog_cache.store(ToolCatalog(
+                server_key=self.server_key,
+                server_name=pool.server_info.name if pool.server_info else None,
+                server_version=pool.server_info.version if pool.server_info else None,
+                fetched_at=time.time(),
+                tools=tools,
             ))
-    
-    async def _get_tools(self) -> List[FunctionToolParam]:
-        self._tools = []
-        async with McpClientSession(self._server_params) as session:
-            await self._discover_tools(session)
+        self._set_tools(tools)
+        return self._tools
+
+    def _refresh_in_background(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._background_refresh())
+
+    async def _background_refresh(self) -> None:
+        try:
+            await self.arefresh_tools()
+        except Exception as e:
+            log.warning(f"Background tool refresh of '{self.server_key}' failed: {e}")
+
+    def _on_server_tools_changed(self) -> None:
+        """Handles `notifications/tools/list_changed`: the cached catalog is outdated."""
+        if self._catalog_cache:
+            self._catalog_cache.invalidate(self.server_key)
+        self._refresh_in_background()
+
+    async def aget_tools(self, refresh: bool = False) -> List[FunctionToolParam]:
+        """
+        Returns all discovered tools in OpenAI's function format.
+        With a catalog cache, starts from the cached catalog and refreshes a stale one in the background.
+        A catalog of another server version than the connected one is never used: a cached catalog
+        saves listing the tools, not connecting, as `...@latest` servers may have updated since.
+        """
+        pool = self._pool
+        cached = self._catalog_cache.load(self.server_key) if self._catalog_cache and not refresh else None
+        if cached and pool.server_info is None:
+            await pool.warm()
+        if cached and (pool.server_info is None or cached.server_version != pool.server_info.version):
+            cached = None
+        if cached is None:
+            return await self.arefresh_tools()
+        self._set_tools(cached.tools)
+        if not self._catalog_cache.is_fresh(cached):
+            self._refresh_in_background()
         return self._tools
 
     def get_tools(self) -> List[FunctionToolParam]:
         """Returns all discovered tools in OpenAI's function format."""
-        return asyncio.run(self._get_tools())
+        return self._run(self.aget_tools())
 
-    async def _call_tool(self, name: str, arguments: ToolFunctionArguments, read_timeout_seconds: timedelta | None = None, progress_callback: ProgressFnT | None = None) -> ToolFunctionResult: 
-        async with McpClientSession(self._server_params) as session:
-                await session.initialize()
-                return await session.call_tool(name, arguments, read_timeout_seconds, progress_callback)
+    async def acall_tool(self, name: str, arguments: ToolFunctionArguments, read_timeout_seconds: timedelta | None = None, progress_callback: ProgressFnT | None = None) -> ToolFunctionResult: 
+        """Calls a tool by name with the given arguments, on a warm pooled session of the running loop."""
+        cache = self._result_cache
+        if cache is None:
+            return await self._pool.run(lambda session: session.call_tool(name, arguments, read_timeout_seconds, progress_callback))
+        if not cache.is_cacheable(name, self._mcp_tools.get(name)):
+            cache.clear(self.server_key)
+            try:
+                return await self._pool.run(lambda session: session.call_tool(name, arguments, read_timeout_seconds, progress_callback))
+            finally:
+                cache.clear(self.server_key) # also the results of reads that started while the write ran
+        result = cache.get(self.server_key, name, arguments)
+        if result is None:
+            generation = cache.generation(self.server_key)
+            result = await self._pool.run(lambda session: session.call_tool(name, arguments, read_timeout_seconds, progress_callback))
+            cache.put(self.server_key, name, arguments, result, generation) # dropped if a write cleared the server meanwhile
+        return result
 
     def call_tool(self, name: str, arguments: ToolFunctionArguments, read_timeout_seconds: timedelta | None = None, progress_callback: ProgressFnT | None = None) -> ToolFunctionResult:
-        """Calls a tool by name with the given arguments."""
-        return asyncio.run(self._call_tool(name, arguments, read_timeout_seconds, progress_callback))
+        """Calls a tool by name with the given arguments, on a warm pooled session."""
+        return self._run(self.acall_tool(name, arguments, read_timeout_seconds, progress_callback))
+
+    def astream_tool(self, name: str, arguments: ToolFunctionArguments, read_timeout_seconds: timedelta | None = None) -> AsyncIterator[ToolStreamChunk]:
+        """
+        Calls a tool and iterates its partial output while it runs, see `stream_tool_call`:
+        `async for chunk in agent.astream_tool(...)` yields TextContent chunks, then the CallToolResult.
+        """
+        return stream_tool_call(lambda progress_callback: self.acall_tool(name, arguments, read_timeout_seconds, progress_callback))
     
     def get_function(self, name: str) -> ToolFunctionCall:
         """Returns a function that calls a tool by name with the given arguments."""
@@ -147,6 +614,22 @@ class McpClientAgent:
             tool["name"]: self.get_function(tool["name"])
             for tool in self._tools
         }
+
+    def aget_function(self, name: str) -> AsyncToolFunctionCall:
+        """Returns a coroutine function that calls a tool by name with the given arguments."""
+        return partial(self.acall_tool, name)
+
+    async def aget_functions(self) -> Dict[str, AsyncToolFunctionCall]:
+        """
+        Returns a mapping from each tool's name to a coroutine function that calls the tool with the given arguments.
+        Discovers the tools first if that has not happened yet.
+        """
+        if not self._tools:
+            await self.aget_tools()
+        return {
+            tool["name"]: self.aget_function(tool["name"])
+            for tool in self._tools
+        }
 # --- Example Usage ---
 
 def main():
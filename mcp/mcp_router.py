@@ -0,0 +1,184 @@
+"""
+Routes tool calls across many MCP servers through one merged function table.
+
+Each server gets a label and its own McpClientAgent (and so its own session pool).
+Servers are started concurrently, so startup takes as long as the slowest server,
+or, with `start_in_background`, not at all: each server's tools join when it is up.
+Tool names are namespaced with the server label when they collide, see `McpRouter`.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import re
+import time
+from datetime import timedelta
+from functools import partial
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from mcp.shared.session import ProgressFnT
+from openai.types.responses.function_tool_param import FunctionToolParam
+
+from mcp_client_agent import (
+    AsyncToolFunctionCall, McpClientAgent, McpEventLoopThread, McpServerParameters, McpSessionPoolConfig,
+    ToolFunctionArguments, ToolFunctionCall, ToolFunctionResult,
+)
+from tool_catalog import ToolCatalogCache
+from tool_result_cache import ToolResultCache
+
+log = logging.getLogger(__name__)
+
+NAMESPACE_SEPARATOR = "__"
+MAX_FUNCTION_NAME_LENGTH = 64 # OpenAI function names: ^[a-zA-Z0-9_-]{1,64}$
+
+class ToolRoute(NamedTuple):
+    """Where a merged function name points to: the server label and the tool name on that server."""
+    server: str
+    tool: str
+
+class McpRouter:
+    """
+    Connects to several MCP servers and merges their tools into one function table.
+
+    Collision rule: a tool keeps its own name while it is unique across all servers.
+    When two or more servers offer the same name, every one of them is exposed as
+    `<label>__<tool>`, so no server silently shadows another. With `always_namespace`
+    every tool is prefixed. Names are cut to 64 characters, as OpenAI requires.
+
+    A server that fails to start is logged and left out; `errors` keeps the reason.
+    """
+    def __init__(
+        self,
+        servers: Dict[str, McpServerParameters],
+        pool_config: Optional[McpSessionPoolConfig] = None,
+        catalog_cache: Optional[ToolCatalogCache] = None,
+        result_cache: Optional[ToolResultCache] = None,
+        always_namespace: bool = False,
+    ):
+        for label in servers:
+            if not re.fullmatch(r"[a-zA-Z0-9_-]+", label):
+                raise ValueError(f"Server label '{label}' may only contain letters, digits, '_' and '-'.")
+        self.agents: Dict[str, McpClientAgent] = {
+            label: McpClientAgent(params, pool_config, catalog_cache, result_cache) for label, params in servers.items()
+        }
+        self.always_namespace = always_namespace
+        self.routes: Dict[str, ToolRoute] = {}
+        self.errors: Dict[str, Exception] = {}
+        self.startup_seconds: Dict[str, float] = {}
+        self.startup_started: Dict[str, float] = {} # time.perf_counter() at each server's start
+        self._starting: Dict[str, concurrent.futures.Future[None]] = {}
+        self._tools: List[FunctionToolParam] = []
+        self._tools_listeners: List[Callable[[List[FunctionToolParam], List[FunctionToolParam]], Any]] = []
+        for label, agent in self.agents.items():
+            agent.add_tools_listener(partial(self._on_server_tools_changed, label))
+
+    @staticmethod
+    def namespaced(label: str, tool: str) -> str:
+        return f"{label}{NAMESPACE_SEPARATOR}{tool}"[:MAX_FUNCTION_NAME_LENGTH]
+
+    def _merge(self) -> None:
+        """Rebuilds the merged tool list and the routes from the tools each started server has."""
+        owners: Dict[str, int] = {}
+        for label, agent in self.agents.items():
+            if label not in self.errors:
+                for tool in agent.tools:
+                    owners[tool["name"]] = owners.get(tool["name"], 0) + 1
+
+        tools: List[FunctionToolParam] = []
+        routes: Dict[str, ToolRoute] = {}
+        for label, agent in self.agents.items():
+            if label in self.errors:
+                continue
+            for tool in agent.tools:
+                name = tool["name"]
+                if self.always_namespace or owners[name] > 1:
+                    name = self.namespaced(label, name)
+                if name in routes:
+                    log.warning(f"Tool '{tool['name']}' of '{label}' is hidden by '{routes[name].server}', both map to '{name}'.")
+                    continue
+                routes[name] = ToolRoute(label, tool["name"])
+                tools.append(FunctionToolParam(**{**tool, "name": name}))
+        self.routes = routes
+        self._tools = tools
+
+    def add_tools_listener(self, listener: Callable[[List[FunctionToolParam], List[FunctionToolParam]], Any]) -> None:
+        """Registers a callback(old_tools, new_tools), called when a server's refreshed tools change the merged list."""
+        self._tools_listeners.append(listener)
+
+    def _on_server_tools_changed(self, label: str, *_) -> None:
+        old_tools = self._tools
+        self._merge()
+        if old_tools != self._tools:
+            for listener in list(self._tools_listeners):
+                listener(old_tools, self._tools)
+
+    async def _start_server(self, label: str) -> None:
+        started = self.startup_started[label] = time.perf_counter()
+        try:
+            await self.agents[label].aget_tools()
+            self.errors.pop(label, None)
+        except Exception as e:
+            log.warning(f"MCP server '{label}' failed to start: {e}")
+            self.errors[label] = e
+        finally:
+            self.startup_seconds[label] = time.perf_counter() - started
+
+    async def astart(self) -> List[FunctionToolParam]:
+        """Discovers the tools of all servers concurrently and returns the merged list."""
+        await asyncio.gather(*(self._start_server(label) for label in self.agents))
+        self._merge()
+        return self._tools
+
+    def start(self) -> List[FunctionToolParam]:
+        """Discovers the tools of all servers concurrently, on the background loop thread of the sync API."""
+        return McpEventLoopThread.get().run(self.astart())
+
+    async def _start_and_merge(self, label: str) -> None:
+        await self._start_server(label)
+        self._on_server_tools_changed(label)
+
+    def start_in_background(self) -> None:
+        """
+        Starts all servers concurrently on the loop thread of the sync API and returns at once.
+        The tools of each server are merged as soon as it is up, and the tools listeners are
+        told; `wait_started` waits for the servers still starting.
+        """
+        loop = McpEventLoopThread.get()
+        self._starting = {label: loop.submit(self._start_and_merge(label)) for label in self.agents}
+
+    @property
+    def starting(self) -> List[str]:
+        """The servers started in the background that are not up (or failed) yet."""
+        return [label for label, future in self._starting.items() if not future.done()]
+
+    def wait_started(self, timeout: Optional[float] = None) -> List[str]:
+        """Blocks until the servers started in the background are up, at most `timeout` seconds; returns those still starting."""
+        concurrent.futures.wait(self._starting.values(), timeout)
+        return self.starting
+
+    @property
+    def tools(self) -> List[FunctionToolParam]:
+        """The merged tools in OpenAI's function format."""
+        return self._tools
+
+    def route(self, name: str) -> ToolRoute:
+        try:
+            return self.routes[name]
+        except KeyError:
+            raise KeyError(f"No MCP server offers a tool named '{name}'.") from None
+
+    async def acall_tool(self, name: str, arguments: ToolFunctionArguments, read_timeout_seconds: timedelta | None = None, progress_callback: ProgressFnT | None = None) -> ToolFunctionResult:
+        """Calls a merged tool on its owning server's pooled session."""
+        route = self.route(name)
+        return await self.agents[route.server].acall_tool(route.tool, arguments, read_timeout_seconds, progress_callback)
+
+    def call_tool(self, name: str, arguments: ToolFunctionArguments, read_timeout_seconds: timedelta | None = None, progress_callback: ProgressFnT | None = None) -> ToolFunctionResult:
+        route = self.route(name)
+        return self.agents[route.server].call_tool(route.tool, arguments, read_timeout_seconds, progress_callback)
+
+    def get_functions(self) -> Dict[str, ToolFunctionCall]:
+        """Returns a mapping from each merged tool name to a function that calls it on its server."""
+        return {name: partial(self.call_tool, name) for name in self.routes}
+
+    async def aget_functions(self) -> Dict[str, AsyncToolFunctionCall]:
+        """Returns a mapping from each merged tool name to a coroutine function that calls it on its server."""
+        return {name: partial(self.acall_tool, name) for name in self.routes}
@@ -3,11 +3,12 @@ This module contains the generic MCPTool class, which acts as a
 LangChain wrapper for a single function on an MCP server.
 """
 import logging
-from typing import Type
+from typing import AsyncIterator, Type
 
 from pydantic import BaseModel
 from langchain_core.tools import BaseTool
 from mcp import ClientSession, types
+from mcp_client_agent import stream_tool_call
 
 log = logging.getLogger(__name__)
 
@@ -51,3 +52,19 @@ class MCPTool(BaseTool):
         except Exception as e:
             log.error(f"An unexpected error occurred while running tool '{self.name}': {e}", exc_info=True)
             return f"An unexpected error occurred: {e}"
+
+    async def astream_tool(self, **kwargs) -> AsyncIterator[str]:
+        """
+        Executes the MCP tool and yields its text as the server streams it (progress notifications),
+        before the call completes. Yields the whole response text once if the server does not stream.
+        """
+        log.info(f"Streaming MCP tool '{self.name}' with args: {kwargs}")
+        streamed = False
+        async for chunk in stream_tool_call(lambda progress_callback: self.session.call_tool(self.name, kwargs, progress_callback=progress_callback)):
+            if isinstance(chunk, types.TextContent):
+                streamed = True
+                yield chunk.text
+            elif chunk.isError:
+                yield f"Error from tool '{self.name}': {chunk.content}"
+            elif not streamed:
+                yield " ".join(item.text for item in chunk.content if isinstance(item, types.TextContent))
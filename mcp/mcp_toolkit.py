@@ -2,14 +2,18 @@
 This module contains the MCPToolkit, a self-contained class for
 connecting to an MCP server and discovering its tools for use with LangChain.
 """
+import asyncio
 import logging
-from typing import List
+import time
+from typing import Any, List, Optional
 
 from pydantic import Field, create_model
 from langchain_core.tools import BaseTool, BaseToolkit
-from mcp import ClientSession
+from mcp import ClientSession, types
 from mcp.client.streamable_http import streamablehttp_client
+from mcp_client_agent import HttpServerParameters, McpSessionPool
 from mcp_tool import MCPTool
+from tool_catalog import ToolCatalog, ToolCatalogCache
 
 log = logging.getLogger(__name__)
 
@@ -19,7 +23,10 @@ class MCPToolkit(BaseToolkit):
     from an MCP server. This class manages the connection and session.
     """
     url: str
+    catalog_cache: Optional[ToolCatalogCache] = None # start from the cached tool catalog when set
     _session_cm = None # To hold the session's context manager
+    _server_info: Optional[types.Implementation] = None
+    _refresh_task: Optional[asyncio.Task] = None
 
     class Config:
         arbitrary_types_allowed = True
@@ -31,15 +38,17 @@ class MCPToolkit(BaseToolkit):
         read, write, _ = await self._http_client_cm.__aenter__()
         
         # Create the session and enter its context to start background tasks
-        self._session_cm = ClientSession(read, write)
+        self._session_cm = ClientSession(read, write, message_handler=self._handle_message)
         self._session = await self._session_cm.__aenter__()
         
-        await self._session.initialize()
+        self._server_info = (await self._session.initialize()).serverInfo
         log.info("MCP session initialized successfully.")
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager to clean up the connection."""
+        if self._refresh_task:
+            self._refresh_task.cancel()
         if self._session_cm:
             await self._session_cm.__aexit__(exc_type, exc_val, exc_tb)
         if self._http_client_cm:
@@ -50,40 +59,86 @@ class MCPToolkit(BaseToolkit):
         """The standard LangChain interface for getting the tools in the toolkit."""
         raise NotImplementedError("Use 'await get_tools_async()' for this toolkit.")
 
+    @property
+    def server_key(self) -> str:
+        """The catalog cache key, shared with McpClientAgent's HttpServerParameters defaults."""
+        return McpSessionPool.key(HttpServerParameters(url=self.url))
+
+    async def _handle_message(self, message: Any) -> None:
+        """Drops the cached catalog when the server announces `notifications/tools/list_changed`."""
+        if self.catalog_cache and isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+            log.info("Server tool list changed, invalidating the cached catalog.")
+            self.catalog_cache.invalidate(self.server_key)
+
+    async def _list_tools(self) -> List[types.Tool]:
+        """Lists all pages of tools, like McpClientAgent: the cached catalog is shared with it."""
+        tools: List[types.Tool] = []
+        cursor: Optional[str] = None
+        while True:
+            list_tools_result = await self._session.list_tools(cursor)
+            tools.extend(list_tools_result.tools)
+            cursor = list_tools_result.nextCursor
+            if not cursor:
+                break
+        if self.catalog_cache:
+            self.catalog_cache.store(ToolCatalog(
+                server_key=self.server_key,
+                server_name=self._server_info.name if self._server_info else None,
+                server_version=self._server_info.version if self._server_info else None,
+                fetched_at=time.time(),
+                tools=tools,
+            ))
+        return tools
+
+    async def _refresh_catalog(self) -> None:
+        try:
+            await self._list_tools()
+        except Exception as e:
+            log.warning(f"Background refresh of the tool catalog failed: {e}")
+
+    def _create_tool(self, tool_info: types.Tool) -> BaseTool:
+        log.info(f"  - Creating LangChain tool for: '{tool_info.name}'")
+        
+        fields = {}
+        if tool_info.inputSchema and 'properties' in tool_info.inputSchema:
+            for param_name, param_details in tool_info.inputSchema['properties'].items():
+                description = param_details.get('description', '')
+                fields[param_name] = (str, Field(description=description))
+
+        dynamic_args_schema = create_model(f"{tool_info.name}Args", **fields)
+
+        return MCPTool(
+            session=self._session,
+            name=tool_info.name,
+            description=tool_info.description,
+            args_schema=dynamic_args_schema,
+        )
+
     async def get_tools_async(self) -> List[BaseTool]:
         """
         Discovers tools from the initialized MCP session and returns them
         as a list of LangChain-compatible Tool objects.
+        With a catalog cache, uses the cached catalog of the same server version
+        and refreshes a stale one in the background.
         """
         if not self._session:
             raise RuntimeError("Toolkit not connected. Use 'async with MCPToolkit(...)'.")
 
-        log.info("Discovering tools from MCP server...")
-        tools = []
         try:
-            list_tools_result = await self._session.list_tools()
-            server_tools = list_tools_result.tools
+            cached = self.catalog_cache.load(self.server_key) if self.catalog_cache else None
+            if cached and self._server_info and cached.server_version != self._server_info.version:
+                cached = None
+            if cached:
+                log.info("Using cached tool catalog.")
+                server_tools = cached.tools
+                if not self.catalog_cache.is_fresh(cached):
+                    self._refresh_task = asyncio.create_task(self._refresh_catalog())
+            else:
+                log.info("Discovering tools from MCP server...")
+                server_tools = await self._list_tools()
             log.info(f"Found {len(server_tools)} tools on the server.")
 
-            for tool_info in server_tools:
-                log.info(f"  - Creating LangChain tool for: '{tool_info.name}'")
-                
-                fields = {}
-                if tool_info.inputSchema and 'properties' in tool_info.inputSchema:
-                    for param_name, param_details in tool_info.inputSchema['properties'].items():
-                        description = param_details.get('description', '')
-                        fields[param_name] = (str, Field(description=description))
-
-                dynamic_args_schema = create_model(f"{tool_info.name}Args", **fields)
-
-                langchain_tool = MCPTool(
-                    session=self._session,
-                    name=tool_info.name,
-                    description=tool_info.description,
-                    args_schema=dynamic_args_schema,
-                )
-                tools.append(langchain_tool)
-            
+            tools = [self._create_tool(tool_info) for tool_info in server_tools]
             log.info("Tool discovery complete.")
             return tools
         except Exception as e:
@@ -0,0 +1,43 @@
+"""
+Timing of the startup phases of the chat agents.
+
+Phases may overlap (MCP servers start in the background while the OpenAI client is created
+and the prompt shows), so each one is recorded with its offset from the start, not only its
+duration, and the report lists them in the order they began.
+"""
+import contextlib
+import time
+from typing import Dict, Iterator, NamedTuple, Optional
+
+class Phase(NamedTuple):
+    offset: float # seconds after the start
+    seconds: float
+
+class StartupTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, Phase] = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started, started)
+
+    def record(self, name: str, seconds: float, started: Optional[float] = None) -> None:
+        """Records a phase timed elsewhere; without `started`, it is taken to have just ended."""
+        started = time.perf_counter() - seconds if started is None else started
+        self.phases[name] = Phase(started - self.started, seconds)
+
+    def mark(self, name: str) -> None:
+        """Records a point in time, like the first prompt."""
+        self.record(name, 0)
+
+    def report(self) -> str:
+        phases = sorted(self.phases.items(), key=lambda item: item[1].offset)
+        return " ".join(
+            f"{name}@+{phase.offset * 1000:.0f}ms" if phase.seconds == 0 else f"{name}={phase.seconds * 1000:.0f}ms@+{phase.offset * 1000:.0f}ms"
+            for name, phase in phases
+        )
@@ -0,0 +1,120 @@
+import asyncio
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+import unittest
+from unittest.mock import patch
+
+import httpx
+from mcp import StdioServerParameters
+
+MCP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(MCP_DIR, "bench"))
+
+from agent_server import AgentServer, chat_async
+from fake_openai import FakeOpenAI
+from mcp_client_agent import McpClientAgent
+
+PROFILE_SERVER = StdioServerParameters(command=sys.executable, args=["-c", "from server import mcp; mcp.run(transport='stdio')"], cwd=MCP_DIR)
+
+def parse_sse(text: str):
+    """(event, data) pairs of a server-sent event stream."""
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+class TestAgentServer(unittest.IsolatedAsyncioTestCase):
+    """Tests many conversations of one shared Agent against the recorded OpenAI streams and server.py over stdio."""
+
+    async def asyncSetUp(self):
+        self.fake = FakeOpenAI(event_delay=0.002, record=True)
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test", "OPENAI_BASE_URL": self.fake.base_url}):
+            agent = chat_async.Agent()
+        agent.MCP_AGENTS = {"profile": McpClientAgent(PROFILE_SERVER)}
+        self.server = AgentServer(agent, idle_timeout=60)
+        await self.server.start()
+        self.http = httpx.AsyncClient(transport=httpx.ASGITransport(app=self.server.app), base_url="http://agent")
+
+    async def asyncTearDown(self):
+        await self.http.aclose()
+        await self.server.close()
+        self.fake.stop()
+
+    async def new_session(self) -> str:
+        response = await self.http.post("/sessions")
+        self.assertEqual(response.status_code, 201)
+        return response.json()["id"]
+
+    async def turn(self, id: str, text: str = "Who is Alan Turing?"):
+        response = await self.http.post(f"/sessions/{id}/turns", json={"input": text})
+        self.assertEqual(response.status_code, 200)
+        return parse_sse(response.text)
+
+    async def test_turn_streams_the_call_and_its_follow_up(self):
+        events = await self.turn(await self.new_session())
+        types = [event for event, _ in events]
+        self.assertEqual(types.count("response.created"), 2) # the function call, then the answer to its output
+        self.assertIn("response.output_text.delta", types)
+        self.assertEqual(events[-1], ("turn.done", {"last_response_id": "resp_0123456789abcdef", "ended": False}))
+        self.assertEqual(self.fake.bodies[1]["input"][0]["type"], "function_call_output")
+
+    async def test_sessions_keep_their_own_response_chain(self):
+        first, second = await self.new_session(), await self.new_session()
+        await self.turn(first)
+        await self.turn(second)
+        await self.turn(first, "And his hobbies?")
+        previous = [body.get("previous_response_id") for body in self.fake.bodies if isinstance(body["input"], str)] # user turns, not function outputs
+        self.assertEqual(previous, [None, None, "resp_0123456789abcdef"]) # the second session started a new chain
+        self.assertEqual((await self.http.get(f"/sessions/{first}")).json()["turns"], 2)
+
+    async def test_concurrent_sessions_share_one_loop(self):
+        ids = [await self.new_session() for _ in range(20)]
+        await asyncio.gather(*(self.turn(id) for id in ids)) # warms up the MCP session pool, which opens a session per concurrent call
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self.turn(id, "And his hobbies?") for id in ids))
+        elapsed = time.perf_counter() - started
+        self.assertTrue(all(events[-1][0] == "turn.done" for events in results))
+        self.assertEqual(self.fake.requests, 80)
+        sequential = 20 * (12 + 200) * 0.002 # the streams alone, one session after the other
+        self.assertLess(elapsed, sequential / 2)
+        stats = (await self.http.get("/stats")).json()
+        self.assertEqual((stats["sessions"], stats["active_turns"], stats["turns"]), (20, 0, 40))
+
+    async def test_session_errors(self):
+        self.assertEqual((await self.http.post("/sessions/nope/turns", json={"input": "hi"})).status_code, 404)
+        id = await self.new_session()
+        self.assertEqual((await self.http.post(f"/sessions/{id}/turns", json={"text": "hi"})).status_code, 400)
+        self.server.sessions[id].running = True
+        self.assertEqual((await self.http.post(f"/sessions/{id}/turns", json={"input": "hi"})).status_code, 409)
+        self.assertEqual((await self.http.delete(f"/sessions/{id}")).status_code, 204)
+        self.assertEqual((await self.http.get(f"/sessions/{id}")).status_code, 404)
+
+    async def test_turn_not_streamed_leaves_the_session_idle(self):
+        session = self.server.sessions[await self.new_session()]
+        self.server.run_turn(session, "hi") # the client left before the first chunk: never iterated
+        self.assertFalse(session.running)
+
+        session.running = True # a turn started by a racing request
+        events = [event async for event in self.server.run_turn(session, "hi")]
+        self.assertEqual(parse_sse(b"".join(events).decode())[0][0], "turn.error")
+        self.assertTrue(session.running)
+
+    async def test_idle_sessions_are_small_and_expire(self):
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for _ in range(1000):
+            self.server.create_session()
+        per_session = (tracemalloc.get_traced_memory()[0] - before) / 1000
+        tracemalloc.stop()
+        self.assertLess(per_session, 2048) # bytes
+        self.server.idle_timeout = 0
+        self.assertEqual(self.server.expire(), 1000)
+
+if __name__ == "__main__":
+    unittest.main()
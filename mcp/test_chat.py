@@ -0,0 +1,206 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from mcp import types
+from openai.types.responses import Response, ResponseCompletedEvent, ResponseFunctionCallArgumentsDoneEvent, ResponseOutputItemAddedEvent, ResponseTextDeltaEvent
+from openai.types.responses.response_function_tool_call import ResponseFunctionToolCall
+
+from chat import Agent
+from mcp_client_agent import ToolFunctionResult
+from tool_index import ToolHistory, ToolIndex
+from tool_output import ToolOutputEncoder
+
+def sleeping_function(seconds: float):
+    """Returns a tool function that sleeps, then echoes its arguments."""
+    def function(arguments, **_) -> ToolFunctionResult:
+        time.sleep(seconds)
+        return ToolFunctionResult(content=[types.TextContent(type="text", text=str(arguments))], isError=False)
+    return function
+
+def function_call(call_id: str, name: str, arguments: str = "{}") -> ResponseFunctionToolCall:
+    return ResponseFunctionToolCall(type="function_call", call_id=call_id, name=name, arguments=arguments)
+
+class TestAgentFunctionCalls(unittest.TestCase):
+    """Tests the function call handling of the sync chat Agent without connecting to any server."""
+
+    def setUp(self):
+        # Skip __init__, it connects to the configured MCP servers and OpenAI.
+        self.agent = Agent.__new__(Agent)
+        self.agent.FUNCTION_TIMEOUT = 5
+        self.agent.executor = ThreadPoolExecutor(max_workers=4)
+        self.agent.call_started = {}
+        self.agent.FUNCTIONS = {"fast": sleeping_function(0.05), "slow": sleeping_function(0.3)}
+        self.agent.output_encoder = ToolOutputEncoder()
+        self.agent.tool_history = ToolHistory()
+
+    def tearDown(self):
+        self.agent.executor.shutdown()
+
+    def test_calls_run_concurrently_and_keep_call_order(self):
+        calls = [function_call("1", "slow", '{"n": 1}'), function_call("2", "fast", '{"n": 2}'), function_call("3", "slow", '{"n": 3}')]
+
+        started = time.perf_counter()
+        outputs = self.agent._handle_function_calls(calls)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual([output["call_id"] for output in outputs], ["1", "2", "3"])
+        self.assertIn("'n': 3", outputs[2]["output"])
+        self.assertLess(elapsed, 0.55)
+
+    def test_timed_out_call_is_reported_as_error(self):
+        self.agent.FUNCTION_TIMEOUT = 0.1
+        outputs = self.agent._handle_function_calls([function_call("1", "slow"), function_call("2", "fast")])
+
+        self.assertIn("timed out", outputs[0]["output"])
+        self.assertTrue(outputs[0]["output"].startswith("[error] Function 'slow' timed out"))
+        self.assertEqual(outputs[1]["output"], "{}")
+
+    def test_timeout_is_waited_once_for_all_calls(self):
+        self.agent.FUNCTION_TIMEOUT = 0.1
+        started = time.perf_counter()
+        outputs = self.agent._handle_function_calls([function_call(str(n), "slow") for n in range(3)])
+        elapsed = time.perf_counter() - started
+
+        self.assertTrue(all("timed out" in output["output"] for output in outputs))
+        self.assertLess(elapsed, 0.2) # not 3 x FUNCTION_TIMEOUT
+
+    def test_timeout_counts_from_when_a_call_starts(self):
+        self.agent.FUNCTION_TIMEOUT = 0.25
+        self.agent.executor.shutdown()
+        self.agent.executor = ThreadPoolExecutor(max_workers=2)
+        self.agent.FUNCTIONS["medium"] = sleeping_function(0.15)
+        outputs = self.agent._handle_function_calls([function_call(str(n), "medium") for n in range(4)])
+
+        self.assertEqual([output["output"] for output in outputs], ["{}"] * 4) # the last two ran after 0.15s, within their own timeout
+
+    def test_queued_calls_are_reported_as_not_started(self):
+        self.agent.FUNCTION_TIMEOUT = 0.1
+        self.agent.executor.shutdown()
+        self.agent.executor = ThreadPoolExecutor(max_workers=1)
+        outputs = self.agent._handle_function_calls([function_call("1", "slow"), function_call("2", "fast")])
+
+        self.assertTrue(outputs[0]["output"].startswith("[error] Function 'slow' timed out"))
+        self.assertTrue(outputs[1]["output"].startswith("[error] Function 'fast' not started"))
+
+    def test_tools_of_a_started_server_are_swapped_in_at_once(self):
+        class Router:
+            def get_functions(self):
+                return {"search": sleeping_function(0), "fetch": sleeping_function(0)}
+        self.agent.mcp_router = Router()
+        search = {"type": "function", "name": "search"}
+        self.agent.TOOLS = [{"type": "function", "name": "fast"}, search]
+        self.agent.FUNCTIONS["search"] = sleeping_function(0)
+        functions = self.agent.FUNCTIONS
+
+        self.agent._on_tools_changed([search], [search, {"type": "function", "name": "fetch"}])
+
+        self.assertIn("search", functions) # a running call still finds the tool in the map it holds
+        self.assertEqual(set(self.agent.FUNCTIONS), {"fast", "slow", "search", "fetch"})
+        self.assertEqual([tool["name"] for tool in self.agent.TOOLS], ["fast", "search", "fetch"])
+
+class FakeResponses:
+    """Replays one scripted event stream per `responses.create` call and records the inputs."""
+    def __init__(self, *streams):
+        self.streams = list(streams)
+        self.inputs = []
+
+    def create(self, input, **_):
+        self.inputs.append(input)
+        return self.streams.pop(0)()
+
+def text_stream(response_id: str, text: str):
+    def stream():
+        yield ResponseTextDeltaEvent(type="response.output_text.delta", item_id="msg", output_index=0, content_index=0, delta=text, sequence_number=1)
+        yield ResponseCompletedEvent(type="response.completed", response=Response.model_construct(id=response_id, output=[], error=None), sequence_number=2)
+    return stream
+
+def call_stream(response_id: str, call_id: str, name: str, arguments: str):
+    """A response stream with a single function call."""
+    call = function_call(call_id, name, arguments)
+    def stream():
+        yield ResponseCompletedEvent(type="response.completed", response=Response.model_construct(id=response_id, output=[call], error=None), sequence_number=1)
+    return stream
+
+class StreamingAgentTestCase(unittest.TestCase):
+    def setUp(self):
+        self.agent = Agent.__new__(Agent)
+        self.agent.STREAM = True
+        self.agent.MODEL, self.agent.INSTRUCTIONS, self.agent.TOOLS = "test", "", []
+        self.agent.FUNCTION_TIMEOUT = 5
+        self.agent.MAX_ROUND_TRIPS, self.agent.TURN_BUDGET, self.agent.MAX_REPEATED_CALLS = 10, 300, 2
+        self.agent.last_response_id = None
+        self.agent.pending_outputs = []
+        self.agent.executor = ThreadPoolExecutor(max_workers=4)
+        self.agent.call_started = {}
+        self.agent.FUNCTIONS = {"fast": sleeping_function(0), "slow": sleeping_function(0.5)}
+        self.agent.output_encoder = ToolOutputEncoder()
+        self.agent.tool_index = ToolIndex()
+        self.agent.tool_history = ToolHistory()
+        self.agent.turn_tools = None
+        self.agent.startup_reported = True
+
+    def tearDown(self):
+        self.agent.executor.shutdown()
+
+    def respond_with(self, *streams) -> FakeResponses:
+        responses = FakeResponses(*streams)
+        self.agent.client = type("FakeClient", (), {"responses": responses})()
+        return responses
+
+class TestAgentStreaming(StreamingAgentTestCase):
+    """Tests that the streaming Agent starts function calls before the response is complete."""
+
+    def test_function_call_overlaps_with_the_rest_of_the_stream(self):
+        call = function_call("call_1", "slow", '{"n": 1}').model_copy(update={"id": "fc_1", "arguments": ""})
+        def tool_stream():
+            yield ResponseOutputItemAddedEvent(type="response.output_item.added", item=call, output_index=0, sequence_number=1)
+            yield ResponseFunctionCallArgumentsDoneEvent(type="response.function_call_arguments.done", item_id="fc_1", output_index=0, arguments='{"n": 1}', sequence_number=2)
+            time.sleep(0.5) # the model keeps generating while the tool runs
+            output = [call.model_copy(update={"arguments": '{"n": 1}'})]
+            yield ResponseCompletedEvent(type="response.completed", response=Response.model_construct(id="resp_1", output=output, error=None), sequence_number=3)
+        responses = self.respond_with(tool_stream, text_stream("resp_2", "Done."))
+
+        started = time.perf_counter()
+        self.agent._run_turn("go")
+        elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 0.8) # 1s when the call waits for the complete response
+        self.assertEqual(responses.inputs[1][0]["call_id"], "call_1")
+        self.assertIn("'n': 1", responses.inputs[1][0]["output"])
+        self.assertEqual(self.agent.last_response_id, "resp_2")
+
+class TestAgentTurnLoop(StreamingAgentTestCase):
+    """Tests the bounds of the iterative turn loop."""
+
+    def test_turn_completes_when_no_more_calls(self):
+        self.respond_with(call_stream("r1", "c1", "fast", '{"q": 1}'), call_stream("r2", "c2", "fast", '{"q": 2}'), text_stream("r3", "Done."))
+
+        turn = self.agent._run_turn("go")
+
+        self.assertEqual(turn.stop_reason, "completed")
+        self.assertEqual([iteration.function_calls for iteration in turn.iterations], [1, 1, 0])
+        self.assertEqual(self.agent.pending_outputs, [])
+
+    def test_max_round_trips_stops_the_turn(self):
+        self.agent.MAX_ROUND_TRIPS = 3
+        responses = self.respond_with(*(call_stream(f"r{i}", f"c{i}", "fast", f'{{"q": {i}}}') for i in range(5)), text_stream("r9", "Hi."))
+
+        turn = self.agent._run_turn("go")
+
+        self.assertEqual(turn.stop_reason, "max_round_trips")
+        self.assertEqual(len(turn.iterations), 3)
+        self.agent._run_turn("next")
+        self.assertEqual(responses.inputs[3][0]["call_id"], "c2") # the unanswered outputs go out with the next input
+        self.assertEqual(responses.inputs[3][1], {"role": "user", "content": "next"})
+
+    def test_identical_repeated_calls_stop_the_turn(self):
+        self.respond_with(*(call_stream(f"r{i}", f"c{i}", "fast", '{"q": 1}') for i in range(5)))
+
+        turn = self.agent._run_turn("go")
+
+        self.assertEqual(turn.stop_reason, "repeated_calls")
+        self.assertEqual(len(turn.iterations), 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import asyncio
+import importlib.util
+import os
+import unittest
+from unittest.mock import patch
+
+from mcp import types
+from openai.types.responses.response_function_tool_call import ResponseFunctionToolCall
+from openai.types.responses.response_output_item_done_event import ResponseOutputItemDoneEvent
+from openai.types.responses.response_text_delta_event import ResponseTextDeltaEvent
+
+# chat-async.py is not a valid module name, so it is loaded from its path.
+spec = importlib.util.spec_from_file_location("chat_async", os.path.join(os.path.dirname(os.path.abspath(__file__)), "chat-async.py"))
+chat_async = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(chat_async)
+
+class TestAgentEventDispatch(unittest.TestCase):
+    """Tests the event.type dispatch table of the async chat Agent."""
+
+    @patch.dict(os.environ, {"OPENAI_API_KEY": "test"})
+    def setUp(self):
+        self.agent = chat_async.Agent()
+
+    def test_registered_handler_receives_event(self):
+        received = []
+        self.agent.register_event_handler("response.output_text.delta", received.append)
+        event = ResponseTextDeltaEvent(type="response.output_text.delta", item_id="msg_1", output_index=0, content_index=0, delta="Hi", sequence_number=1)
+
+        self.agent._handle_event(event)
+
+        self.assertEqual(received, [event])
+
+    def test_unknown_event_is_counted(self):
+        event = ResponseTextDeltaEvent.model_construct(type="response.brand_new.delta", delta="?", sequence_number=1)
+
+        self.agent._handle_event(event)
+        self.agent._handle_event(event)
+
+        self.assertEqual(self.agent.unhandled_events["response.brand_new.delta"], 2)
+
+def call_done(call_id: str, name: str = "work", arguments: str = "{}") -> ResponseOutputItemDoneEvent:
+    item = ResponseFunctionToolCall(type="function_call", call_id=call_id, name=name, arguments=arguments)
+    return ResponseOutputItemDoneEvent(type="response.output_item.done", item=item, output_index=0, sequence_number=1)
+
+class TestTurnScheduler(unittest.IsolatedAsyncioTestCase):
+    """Tests that the function calls of a response run concurrently and go back in one continuation."""
+
+    @patch.dict(os.environ, {"OPENAI_API_KEY": "test"})
+    def setUp(self):
+        self.agent = chat_async.Agent()
+        self.agent.default_conversation.console = False
+        self.inputs = []
+        self.responses = [] # events of each response, in order; then responses without calls
+        self.peak = 0
+        self.sent_tools = []
+        async def create_response(input):
+            self.inputs.append(input)
+            self.sent_tools.append([tool.get("name", tool["type"]) for tool in self.agent.conversation.tools])
+            events = self.responses.pop(0) if self.responses else []
+            async def stream():
+                for event in events:
+                    yield event
+            return stream()
+        self.agent._create_response = create_response
+
+    def work(self, delay: float = 0.01):
+        async def function(arguments):
+            scheduler = self.agent.conversation.scheduler
+            self.peak = max(self.peak, scheduler.in_flight)
+            await asyncio.sleep(delay)
+            if arguments.get("fail"):
+                raise RuntimeError("broken")
+            return types.CallToolResult(content=[types.TextContent(type="text", text=arguments.get("text", "done"))])
+        return function
+
+    async def test_outputs_go_back_together_in_call_order(self):
+        self.agent.FUNCTIONS["work"] = self.work()
+        self.responses = [[call_done("a", arguments='{"text": "A"}'), call_done("b", arguments='{"text": "B"}'), call_done("c", arguments='{"fail": true}')]]
+
+        await self.agent._execute_turn("Hi")
+
+        self.assertEqual(len(self.inputs), 2) # the user input, then one continuation
+        continuation = self.inputs[1]
+        self.assertEqual([output["call_id"] for output in continuation], ["a", "b", "c"])
+        self.assertEqual(continuation[0]["output"], "A")
+        self.assertEqual(continuation[2]["output"], "[error] Function 'work' failed: broken")
+        self.assertIsNone(self.agent.conversation.scheduler)
+
+    async def test_concurrency_is_bounded(self):
+        self.agent.MAX_PARALLEL_CALLS = 2
+        self.agent.FUNCTIONS["work"] = self.work()
+        self.responses = [[call_done(str(index)) for index in range(6)]]
+
+        await self.agent._execute_turn("Hi")
+
+        self.assertEqual(self.peak, 2)
+        self.assertEqual(len(self.inputs[1]), 6)
+
+    async def test_timeout_becomes_an_error_output(self):
+        self.agent.FUNCTION_TIMEOUT = 0.01
+        self.agent.FUNCTIONS["work"] = self.work(delay=1)
+        self.responses = [[call_done("slow")]]
+
+        await self.agent._execute_turn("Hi")
+
+        self.assertIn("timed out", self.inputs[1][0]["output"])
+
+    async def test_cancelled_turn_leaves_no_calls_behind(self):
+        self.agent.FUNCTIONS["work"] = self.work(delay=10)
+        self.responses = [[call_done("a"), call_done("b")]]
+        turn = asyncio.create_task(self.agent._execute_turn("Hi"))
+        while self.agent.conversation.scheduler is None or self.agent.conversation.scheduler.in_flight < 2:
+            await asyncio.sleep(0)
+        scheduler = self.agent.conversation.scheduler
+
+        turn.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await turn
+
+        self.assertEqual((scheduler.in_flight, scheduler.waiting), (0, 0))
+        self.assertEqual(asyncio.all_tasks(), {asyncio.current_task()})
+        self.assertEqual(len(self.inputs), 1) # no continuation was sent
+
+    async def test_turn_sends_the_selected_tools(self):
+        self.agent.tool_index.top_k = 1
+        for name, description in [("get-weather", "Returns the weather forecast of a city."), ("work", "Does the work.")]:
+            self.agent.TOOLS.append({"type": "function", "name": name, "description": description, "parameters": {"type": "object", "properties": {}}, "strict": True})
+        self.agent.FUNCTIONS["work"] = self.work(delay=0)
+        self.responses = [[call_done("a")]]
+
+        await self.agent._execute_turn("Do the work")
+
+        self.assertEqual(self.sent_tools, [["bye", "web_search_preview", "image_generation", "work"]] * 2) # the continuation too
+        self.assertIsNone(self.agent.conversation.tools)
+
+    async def test_stopped_turn_sends_its_outputs_with_the_next_input(self):
+        self.agent.MAX_ROUND_TRIPS = 2
+        self.agent.FUNCTIONS["work"] = self.work(delay=0)
+        self.responses = [[call_done("a")], [call_done("b")]]
+
+        await self.agent._execute_turn("Hi")
+        self.assertEqual(len(self.inputs), 2)
+        await self.agent._execute_turn("Go on")
+
+        self.assertEqual([item.get("call_id") for item in self.inputs[2]], ["b", None])
+        self.assertEqual(self.inputs[2][1], {"role": "user", "content": "Go on"})
+        self.assertEqual(self.agent.conversation.pending_outputs, [])
+
+if __name__ == "__main__":
+    unittest.main()
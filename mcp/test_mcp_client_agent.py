@@ -0,0 +1,192 @@
+import asyncio
+import gc
+import os
+import sys
+import tempfile
+import time
+import unittest
+import weakref
+
+from mcp import StdioServerParameters, types
+
+from mcp_client_agent import McpClientAgent, McpEventLoopThread, McpSessionPool, McpSessionPoolConfig
+from tool_catalog import ToolCatalogCache
+from tool_result_cache import ToolResultCache
+
+MCP_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_SERVER = os.path.join(MCP_DIR, "..", "adk-mcp", "mcp_profile.py")
+
+class TestMcpSessionPool(unittest.TestCase):
+    """Tests McpClientAgent session pooling against the local stdio profile server."""
+
+    def setUp(self):
+        self.params = StdioServerParameters(command=sys.executable, args=[PROFILE_SERVER])
+
+    def tearDown(self):
+        McpEventLoopThread.get().run(McpSessionPool.close_all())
+
+    def pool(self) -> McpSessionPool:
+        """Returns the pool the sync API uses, which lives on the background loop."""
+        async def for_params():
+            return McpSessionPool.for_params(self.params)
+        return McpEventLoopThread.get().run(for_params())
+
+    def test_calls_reuse_a_warm_session(self):
+        agent = McpClientAgent(self.params)
+        agent.get_tools()
+        self.assertIn("get_user_token", agent.get_functions())
+
+        for user in ("Alice", "Bob", "Carol"):
+            result = agent.call_tool("get_user_token", {"user": user})
+            self.assertTrue(result.content[0].text.startswith(f"User {user} has secret token "))
+
+        pool = self.pool()
+        self.assertEqual(pool.size, 1)
+        self.assertEqual(pool.idle, 1)
+
+    def test_dead_session_is_reconnected(self):
+        agent = McpClientAgent(self.params, McpSessionPoolConfig(health_check_interval=0))
+        agent.call_tool("get_user_token", {"user": "Alice"})
+
+        pool = self.pool()
+        McpEventLoopThread.get().run(pool._idle[0].close())
+
+        result = agent.call_tool("get_user_token", {"user": "Bob"})
+        self.assertFalse(result.isError)
+        self.assertEqual(pool.size, 1)
+
+    def test_idle_sessions_above_min_size_are_evicted(self):
+        agent = McpClientAgent(self.params, McpSessionPoolConfig(min_size=0, idle_timeout=0.2, health_check_interval=0.2))
+        agent.call_tool("get_user_token", {"user": "Alice"})
+
+        pool = self.pool()
+        self.assertEqual(pool.size, 1)
+        time.sleep(1)
+        self.assertEqual(pool.size, 0)
+
+    def test_pools_of_closed_loops_are_dropped(self):
+        async def start_pool():
+            McpSessionPool.for_params(self.params)._start_reaper()
+            return asyncio.get_running_loop()
+        loop = weakref.ref(asyncio.run(start_pool()))
+        asyncio.run(start_pool())
+        gc.collect()
+
+        self.assertIsNone(loop())
+        self.assertEqual(sum(1 for loop in McpSessionPool._pools if loop.is_closed()), 1) # the last run's, until the next lookup
+
+class TestMcpClientAgentAsync(unittest.IsolatedAsyncioTestCase):
+    """Tests the async McpClientAgent API on the caller's event loop."""
+
+    def setUp(self):
+        self.params = StdioServerParameters(command=sys.executable, args=[PROFILE_SERVER])
+
+    async def asyncTearDown(self):
+        await McpSessionPool.close_all()
+
+    async def test_async_calls_share_the_callers_loop_pool(self):
+        agent = McpClientAgent(self.params)
+        functions = await agent.aget_functions()
+        results = await asyncio.gather(*(functions["get_user_token"]({"user": user}) for user in ("Alice", "Bob")))
+        self.assertTrue(results[0].content[0].text.startswith("User Alice"))
+        self.assertTrue(results[1].content[0].text.startswith("User Bob"))
+
+        pool = McpSessionPool.for_params(self.params)
+        self.assertGreaterEqual(pool.size, 1)
+        self.assertEqual(pool.idle, pool.size)
+
+    async def test_cached_results_skip_the_server(self):
+        cache = ToolResultCache(tools={"get_user_token": None})
+        agent = McpClientAgent(self.params, result_cache=cache)
+
+        first = await agent.acall_tool("get_user_token", {"user": "Alice"})
+        second = await agent.acall_tool("get_user_token", {"user": "Alice"})
+        self.assertEqual(first.content[0].text, second.content[0].text) # the token has random digits
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        cache.tools = {} # no longer cacheable, so the call may write: the results of the server are cleared
+        await agent.acall_tool("get_user_token", {"user": "Bob"})
+        self.assertEqual(cache.size_bytes, 0)
+
+class TestStreamedToolCall(unittest.IsolatedAsyncioTestCase):
+    """Tests streaming get_profile of server.py, served over stdio for the test."""
+
+    def setUp(self):
+        self.params = StdioServerParameters(command=sys.executable, args=["-c", "from server import mcp; mcp.run(transport='stdio')"], cwd=MCP_DIR)
+
+    async def asyncTearDown(self):
+        await McpSessionPool.close_all()
+
+    async def test_chunks_arrive_before_the_result(self):
+        chunks = [chunk async for chunk in McpClientAgent(self.params).astream_tool("get_profile", {"name": "Ada"})]
+
+        *words, result = chunks
+        self.assertEqual([word.text for word in words][:3], ["ACCORDING", "TO", "SUPER"])
+        self.assertTrue(all(isinstance(word, types.TextContent) for word in words))
+        self.assertIsInstance(result, types.CallToolResult)
+        self.assertEqual(len(result.content), len(words))
+
+class TestToolCatalogCache(unittest.IsolatedAsyncioTestCase):
+    """Tests that McpClientAgent starts from the on-disk tool catalog."""
+
+    def setUp(self):
+        self.params = StdioServerParameters(command=sys.executable, args=[PROFILE_SERVER])
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ToolCatalogCache(self.directory.name)
+
+    async def asyncTearDown(self):
+        await McpSessionPool.close_all()
+        self.directory.cleanup()
+
+    async def test_cached_catalog_skips_discovery(self):
+        await McpClientAgent(self.params, catalog_cache=self.cache).aget_tools()
+        catalog = self.cache.load(McpSessionPool.key(self.params))
+        self.assertEqual(catalog.server_name, "Profile")
+        self.assertEqual([tool.name for tool in catalog.tools], ["get_user_token"])
+
+        await McpSessionPool.close_all()
+        catalog.tools.append(types.Tool(name="cached_only", inputSchema={"type": "object"}))
+        self.cache.store(catalog)
+        agent = McpClientAgent(self.params, catalog_cache=self.cache)
+        tools = await agent.aget_tools()
+        self.assertEqual([tool["name"] for tool in tools], ["get_user_token", "cached_only"]) # not listed again
+
+    async def test_catalog_of_another_server_version_is_not_used_on_a_cold_start(self):
+        await McpClientAgent(self.params, catalog_cache=self.cache).aget_tools()
+        catalog = self.cache.load(McpSessionPool.key(self.params))
+        await McpSessionPool.close_all()
+        catalog.server_version = "0.0.1-old"
+        catalog.tools.append(types.Tool(name="removed", inputSchema={"type": "object"}))
+        self.cache.store(catalog)
+
+        agent = McpClientAgent(self.params, catalog_cache=self.cache)
+        tools = await agent.aget_tools()
+        self.assertEqual([tool["name"] for tool in tools], ["get_user_token"])
+        self.assertNotEqual(self.cache.load(agent.server_key).server_version, "0.0.1-old")
+
+    async def test_stale_catalog_is_refreshed_in_background(self):
+        self.cache.ttl = 0
+        await McpClientAgent(self.params, catalog_cache=self.cache).aget_tools()
+        fetched_at = self.cache.load(McpSessionPool.key(self.params)).fetched_at
+
+        agent = McpClientAgent(self.params, catalog_cache=self.cache)
+        self.assertEqual(len(await agent.aget_tools()), 1)
+        await agent._refresh_task
+        self.assertGreater(self.cache.load(agent.server_key).fetched_at, fetched_at)
+
+    async def test_list_changed_notification_invalidates_catalog(self):
+        agent = McpClientAgent(self.params, catalog_cache=self.cache)
+        await agent.aget_tools()
+        listeners = []
+        agent.add_tools_listener(lambda old, new: listeners.append((old, new)))
+
+        notification = types.ServerNotification(types.ToolListChangedNotification(method="notifications/tools/list_changed"))
+        await McpSessionPool.for_params(self.params)._handle_message(notification)
+        self.assertIsNone(self.cache.load(agent.server_key))
+
+        await agent._refresh_task
+        self.assertIsNotNone(self.cache.load(agent.server_key))
+        self.assertEqual(listeners, []) # same tools after the refresh
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import sys
+import socket
+import time
+import unittest
+
+from mcp import StdioServerParameters
+
+from mcp_client_agent import HttpServerParameters, McpSessionPool
+from mcp_router import McpRouter, ToolRoute
+
+MCP_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_SERVER = os.path.join(MCP_DIR, "..", "adk-mcp", "mcp_profile.py")
+
+def tool(name: str):
+    return {"type": "function", "name": name, "description": name, "parameters": {"type": "object", "properties": {}}, "strict": False}
+
+class TestMcpRouter(unittest.IsolatedAsyncioTestCase):
+    """Tests the merged tool namespace of McpRouter against local stdio servers."""
+
+    async def asyncTearDown(self):
+        await McpSessionPool.close_all()
+
+    async def test_colliding_tools_are_namespaced_and_routed(self):
+        router = McpRouter({
+            "alpha": StdioServerParameters(command=sys.executable, args=[PROFILE_SERVER]),
+            "beta": StdioServerParameters(command=sys.executable, args=[PROFILE_SERVER, "--unused"]), # other parameters, so another pool
+            "demo": StdioServerParameters(command=sys.executable, args=["-c", "from server import mcp; mcp.run(transport='stdio')"], cwd=MCP_DIR),
+        })
+        tools = await router.astart()
+
+        self.assertEqual(sorted(tool["name"] for tool in tools), ["alpha__get_user_token", "beta__get_user_token", "get_profile"])
+        self.assertEqual(router.routes["beta__get_user_token"], ToolRoute("beta", "get_user_token"))
+        result = await (await router.aget_functions())["beta__get_user_token"]({"user": "Alice"})
+        self.assertTrue(result.content[0].text.startswith("User Alice"))
+        with self.assertRaises(KeyError):
+            await router.acall_tool("get_user_token", {"user": "Alice"})
+
+    async def test_servers_start_concurrently_and_failures_are_left_out(self):
+        router = McpRouter({label: StdioServerParameters(command="unused") for label in ("one", "two", "broken")})
+        def slow_tools(agent, name):
+            async def aget_tools():
+                await asyncio.sleep(0.3)
+                if name == "broken":
+                    raise ConnectionError("refused")
+                agent._tools = [tool(name)]
+                return agent._tools
+            return aget_tools
+        for label, agent in router.agents.items():
+            agent.aget_tools = slow_tools(agent, label)
+
+        started = time.perf_counter()
+        tools = await router.astart()
+        elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 0.6)
+        self.assertEqual([tool["name"] for tool in tools], ["one", "two"])
+        self.assertIsInstance(router.errors["broken"], ConnectionError)
+        self.assertEqual(set(router.startup_seconds), {"one", "two", "broken"})
+
+    async def test_unreachable_http_server_does_not_cancel_the_others(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            unused = s.getsockname()[1]
+        router = McpRouter({
+            "down": HttpServerParameters(url=f"http://127.0.0.1:{unused}/mcp"),
+            "profile": StdioServerParameters(command=sys.executable, args=[PROFILE_SERVER]),
+        })
+        tools = await router.astart()
+
+        self.assertEqual([tool["name"] for tool in tools], ["get_user_token"])
+        self.assertIn("down", router.errors)
+
+    async def test_refreshed_server_tools_notify_listeners(self):
+        router = McpRouter({"one": StdioServerParameters(command="unused")})
+        agent = router.agents["one"]
+        agent._tools = [tool("search")]
+        router._merge()
+        changes = []
+        router.add_tools_listener(lambda old, new: changes.append(([t["name"] for t in old], [t["name"] for t in new])))
+
+        agent._tools = [tool("search"), tool("fetch")]
+        router._on_server_tools_changed("one")
+
+        self.assertEqual(changes, [(["search"], ["search", "fetch"])])
+
+class TestMcpRouterBackgroundStart(unittest.TestCase):
+    """Tests that start_in_background returns at once and each server's tools join when it is up."""
+
+    def test_servers_join_as_they_come_up(self):
+        router = McpRouter({label: StdioServerParameters(command="unused") for label in ("fast", "slow")})
+        def delayed_tools(agent, name, seconds):
+            async def aget_tools():
+                await asyncio.sleep(seconds)
+                agent._tools = [tool(name)]
+                return agent._tools
+            return aget_tools
+        router.agents["fast"].aget_tools = delayed_tools(router.agents["fast"], "fast", 0)
+        router.agents["slow"].aget_tools = delayed_tools(router.agents["slow"], "slow", 0.5)
+        changes = []
+        router.add_tools_listener(lambda old, new: changes.append([t["name"] for t in new]))
+
+        started = time.perf_counter()
+        router.start_in_background()
+        self.assertLess(time.perf_counter() - started, 0.1)
+
+        self.assertEqual(router.wait_started(timeout=0.2), ["slow"])
+        self.assertEqual([t["name"] for t in router.tools], ["fast"])
+        self.assertEqual(router.wait_started(), [])
+        self.assertEqual(changes, [["fast"], ["fast", "slow"]])
+        self.assertEqual(set(router.startup_started), {"fast", "slow"})
+
+if __name__ == "__main__":
+    unittest.main()
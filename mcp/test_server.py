@@ -0,0 +1,69 @@
+import asyncio
+import json
+import logging
+import unittest
+
+from server import SERVER_BUSY, ConcurrencyLimit, SampledFilter, ServingConfig
+
+def request(id, method="tools/call"):
+    return json.dumps({"jsonrpc": "2.0", "id": id, "method": method, "params": {}}).encode()
+
+class TestServingMode(unittest.IsolatedAsyncioTestCase):
+    """Tests log sampling and the concurrency limit of the streamable HTTP app."""
+
+    def test_sampled_filter(self):
+        def record(sampled):
+            record = logging.LogRecord("test", logging.INFO, __file__, 1, "called", None, None)
+            if sampled:
+                record.sampled = True
+            return record
+        self.assertFalse(SampledFilter(0).filter(record(True)))
+        self.assertTrue(SampledFilter(0).filter(record(False)))
+        self.assertTrue(SampledFilter(1).filter(record(True)))
+        passed = sum(SampledFilter(0.1).filter(record(True)) for _ in range(10000))
+        self.assertTrue(700 < passed < 1300, passed)
+
+    async def test_concurrency_limit_queues_then_rejects(self):
+        running, peak, release = 0, 0, asyncio.Event()
+        async def app(scope, receive, send):
+            nonlocal running, peak
+            body = (await receive())["body"]
+            if json.loads(body).get("method") == "tools/call":
+                running += 1
+                peak = max(peak, running)
+                await release.wait()
+                running -= 1
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": body})
+
+        limited = ConcurrencyLimit(app, ServingConfig(max_concurrency=2, max_queue=1, retry_after=3))
+        async def post(body):
+            sent = []
+            chunks = [{"type": "http.request", "body": body[:5], "more_body": True}, {"type": "http.request", "body": body[5:]}]
+            async def receive():
+                return chunks.pop(0)
+            async def send(message):
+                sent.append(message)
+            await limited({"type": "http", "method": "POST"}, receive, send)
+            return sent
+
+        calls = [asyncio.create_task(post(request(id))) for id in range(3)] # 2 run, 1 waits
+        await asyncio.sleep(0.05)
+        self.assertEqual((limited.active, limited.waiting), (2, 1))
+
+        rejected = await post(request(3))
+        self.assertIn((b"retry-after", b"3"), rejected[0]["headers"])
+        error = json.loads(rejected[1]["body"])
+        self.assertEqual((error["id"], error["error"]["code"]), (3, SERVER_BUSY))
+
+        notification = json.dumps({"jsonrpc": "2.0", "method": "notifications/initialized"}).encode()
+        self.assertEqual((await post(notification))[1]["body"], notification) # not limited
+        self.assertEqual((await asyncio.wait_for(post(request(4, "initialize")), 1))[0]["status"], 200) # not limited either
+        release.set()
+
+        results = await asyncio.gather(*calls)
+        self.assertEqual([json.loads(sent[1]["body"])["id"] for sent in results], [0, 1, 2]) # the body was replayed whole
+        self.assertEqual((peak, limited.rejected, limited.admitted), (2, 1, 0))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+import time
+import unittest
+
+from startup import StartupTimer
+
+class TestStartupTimer(unittest.TestCase):
+    """Tests the phase report of StartupTimer."""
+
+    def test_overlapping_phases_are_reported_in_start_order(self):
+        timer = StartupTimer()
+        background_started = time.perf_counter()
+        with timer.phase("openai_client"):
+            time.sleep(0.01)
+        timer.mark("prompt")
+        timer.record("mcp:wiki", 0.05, background_started) # ran alongside the others
+
+        self.assertEqual(list(timer.phases), ["openai_client", "prompt", "mcp:wiki"])
+        self.assertGreaterEqual(timer.phases["openai_client"].seconds, 0.01)
+        self.assertGreaterEqual(timer.phases["prompt"].offset, timer.phases["openai_client"].seconds)
+        report = timer.report().split()
+        self.assertEqual([part.split("=")[0].split("@")[0] for part in report], ["mcp:wiki", "openai_client", "prompt"])
+        self.assertTrue(report[0].startswith("mcp:wiki=50ms@+"))
+        self.assertRegex(report[2], r"^prompt@\+\d+ms$")
+
+if __name__ == "__main__":
+    unittest.main()
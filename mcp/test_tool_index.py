@@ -0,0 +1,96 @@
+import unittest
+
+from tool_index import ToolHistory, ToolIndex, tokenize
+
+def function(tool_name: str, description: str, **parameters: str):
+    properties = {parameter: {"type": "string", "description": text} for parameter, text in parameters.items()}
+    return {"type": "function", "name": tool_name, "description": description, "parameters": {"type": "object", "properties": properties}, "strict": True}
+
+# the MediaWiki tools of tools.json, the terminator and the hosted tools of chat.py
+TOOLS = [
+    {"type": "mcp", "server_label": "remote-deepwiki", "server_url": "https://mcp.deepwiki.com/mcp", "require_approval": "never"},
+    function("bye", "Call this function to end the conversation."),
+    function("get-page", "Returns the standard page object for a wiki page, optionally including page source or rendered HTML.", title="Wiki page title"),
+    function("get-page-history", "Returns information about the latest revisions to a wiki page.", title="Wiki page title", olderThan="The ID of the oldest revision"),
+    function("search-page", "Search wiki page titles and contents for the provided search terms.", query="Search terms"),
+    function("set-wiki", "Set the wiki to use for the current session.", wikiUrl="Any URL from the target wiki"),
+    function("update-page", "Updates a wiki page. Replaces the existing content of a page with the provided content.", title="Wiki page title", source="Page content"),
+    function("get-file", "Returns information about a file, including links to download the file in thumbnail, preview, and original sizes.", title="File title"),
+    function("create-page", "Creates a wiki page with the provided content.", title="Wiki page title", source="Page content"),
+    function("get_profile", "Streams a profile message for the given name.", name="Name"),
+    {"type": "web_search_preview"},
+    {"type": "image_generation", "output_format": "png"},
+]
+
+def names(tools):
+    return [tool.get("name") or tool["type"] for tool in tools]
+
+class TestToolIndex(unittest.TestCase):
+    """Tests the per-turn tool selection of ToolIndex."""
+
+    def test_tokenize_splits_names(self):
+        self.assertEqual(tokenize("get-page-history olderThan get_profile Pages"), ["get", "page", "history", "older", "than", "get", "profile", "page"])
+
+    def test_top_k_keeps_pinned_and_hosted_tools_in_order(self):
+        selection = ToolIndex(top_k=2).select(TOOLS, "Search the wiki for Alan Turing and show the revision history")
+
+        self.assertEqual(names(selection.tools), ["mcp", "bye", "get-page-history", "search-page", "web_search_preview", "image_generation"])
+        self.assertGreater(selection.tokens_saved, 0)
+        self.assertEqual(selection.tokens + selection.tokens_saved, selection.all_tokens)
+
+    def test_lexical_ranking(self):
+        index = ToolIndex(top_k=1)
+
+        self.assertIn("get-file", names(index.select(TOOLS, "download the thumbnail of that file").tools))
+        self.assertIn("get_profile", names(index.select(TOOLS, "What does the profile of Alan Turing say?").tools))
+
+    def test_all_tools_are_sent_below_top_k(self):
+        selection = ToolIndex(top_k=None).select(TOOLS, "hi")
+        self.assertEqual((selection.tools, selection.tokens_saved), (TOOLS, 0))
+        self.assertEqual(ToolIndex(top_k=20).select(TOOLS, "hi").tools, TOOLS)
+
+    def test_embeddings_rank_without_shared_words(self):
+        vectors = {"profile": [1.0, 0.0], "other": [0.0, 1.0]}
+        def embed(texts):
+            return [vectors["profile"] if "profile" in text or "biography" in text else vectors["other"] for text in texts]
+        index = ToolIndex(top_k=1, embed=embed, embedding_weight=0.9)
+
+        self.assertIn("get_profile", names(index.select(TOOLS, "Tell me his biography").tools))
+
+    def test_index_is_rebuilt_when_the_tools_change(self):
+        index = ToolIndex(top_k=1)
+        index.select(TOOLS, "weather")
+        tools = TOOLS + [function("get-weather", "Returns the weather forecast of a city.", city="City")]
+
+        self.assertIn("get-weather", names(index.select(tools, "weather in Paris").tools))
+
+    def test_index_is_rebuilt_when_a_description_changes(self):
+        index = ToolIndex(top_k=1)
+        index.select(TOOLS, "weather")
+        tools = [function("get_profile", "Returns the weather forecast of a city.", city="City") if tool.get("name") == "get_profile" else tool for tool in TOOLS]
+
+        self.assertIn("get_profile", names(index.select(tools, "weather in Paris").tools))
+
+    def test_follow_ups_keep_the_tools_of_recent_turns(self):
+        index = ToolIndex(top_k=1)
+        history = ToolHistory()
+        self.assertIn("get-file", names(index.select(TOOLS, "download the thumbnail of that file", history).tools))
+        history.start_turn("download the thumbnail of that file")
+        history.called("get-file")
+
+        self.assertEqual(index.select(TOOLS, "same again please").tools, TOOLS) # no match alone
+        selected = names(index.select(TOOLS, "same again please", history).tools)
+        self.assertIn("get-file", selected)
+        self.assertLess(len(selected), len(TOOLS))
+        history.start_turn("same again please")
+        self.assertIn("get-file", names(index.select(TOOLS, "and now the third", history).tools))
+
+    def test_no_match_sends_all_tools(self):
+        self.assertEqual(ToolIndex(top_k=1).select(TOOLS, "hi there").tools, TOOLS)
+
+    def test_empty_tool_documents(self):
+        tools = [{"type": "function", "name": "_"}, {"type": "function", "name": "__"}]
+        self.assertEqual(ToolIndex(top_k=1).select(tools, "anything").tools, tools)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+from mcp import types
+
+from tool_output import OutputBudget, ToolOutputEncoder
+
+def text_result(*texts: str, is_error: bool = False) -> types.CallToolResult:
+    return types.CallToolResult(content=[types.TextContent(type="text", text=text) for text in texts], isError=is_error)
+
+class TestToolOutputEncoder(unittest.TestCase):
+    """Tests the compact encoding and the budgets of ToolOutputEncoder."""
+
+    def test_structured_content_is_compact_json(self):
+        result = types.CallToolResult(content=[types.TextContent(type="text", text='{"name": "Ada", "age": 36}')], structuredContent={"name": "Ada", "age": 36})
+
+        encoded = ToolOutputEncoder().encode("get-user", result)
+
+        self.assertEqual(encoded.text, '{"name":"Ada","age":36}')
+        self.assertFalse(encoded.truncated)
+        self.assertGreater(encoded.tokens_saved, 0)
+
+    def test_text_blocks_are_joined_without_the_repr(self):
+        encoded = ToolOutputEncoder().encode("get_profile", text_result("rapper", "and", "cave diver"))
+
+        self.assertEqual(encoded.text, "rapper\nand\ncave diver")
+        self.assertLess(encoded.tokens, encoded.raw_tokens / 5)
+
+    def test_errors_and_other_blocks_are_marked(self):
+        result = types.CallToolResult(content=[
+            types.TextContent(type="text", text="no such page"),
+            types.ImageContent(type="image", data="aGk=", mimeType="image/png"),
+            types.ResourceLink(type="resource_link", name="Page", uri="https://wiki/Page"),
+        ], isError=True)
+
+        self.assertEqual(ToolOutputEncoder().encode("get-page", result).text, "[error] no such page\n[image image/png]\n[resource https://wiki/Page]")
+
+    def test_over_budget_output_keeps_head_and_tail(self):
+        encoder = ToolOutputEncoder(budgets={"get-page": OutputBudget(max_bytes=200)}, head_fraction=0.5)
+        page = "HEAD " + "é" * 1000 + " TAIL"
+
+        encoded = encoder.encode("get-page", text_result(page))
+
+        self.assertTrue(encoded.truncated)
+        self.assertLessEqual(len(encoded.text.encode("utf-8")), 200)
+        self.assertTrue(encoded.text.startswith("HEAD "))
+        self.assertTrue(encoded.text.endswith(" TAIL"))
+        self.assertIn(f"of {len(page.encode('utf-8'))} bytes cut", encoded.text)
+        self.assertFalse(encoder.encode("other", text_result(page)).truncated) # within the default budget
+
+    def test_token_budget_and_totals(self):
+        encoder = ToolOutputEncoder(default_budget=OutputBudget(max_tokens=50))
+
+        encoded = encoder.encode("search", text_result("word " * 500))
+
+        self.assertLessEqual(encoded.tokens, 50)
+        self.assertEqual((encoder.calls, encoder.tokens, encoder.tokens_saved), (1, encoded.tokens, encoded.tokens_saved))
+
+    def test_token_budget_holds_for_a_real_tokenizer(self):
+        words = lambda text: len(text.split()) # a word is a token, far more than 4 characters
+        encoder = ToolOutputEncoder(default_budget=OutputBudget(max_tokens=100), count_tokens=words)
+
+        encoded = encoder.encode("search", text_result(" ".join(f"w{index}" for index in range(1000))))
+
+        self.assertTrue(encoded.truncated)
+        self.assertLessEqual(encoded.tokens, 100)
+        self.assertTrue(encoded.text.startswith("w0 w1 "))
+        self.assertIn("bytes cut", encoded.text)
+
+    def test_budget_smaller_than_the_marker_drops_it(self):
+        encoder = ToolOutputEncoder(default_budget=OutputBudget(max_bytes=10))
+
+        encoded = encoder.encode("search", text_result("word " * 100))
+
+        self.assertEqual(encoded.text, "word word ")
+        self.assertLessEqual(len(encoded.text.encode("utf-8")), 10)
+
+if __name__ == "__main__":
+    unittest.main()
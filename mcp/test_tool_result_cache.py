@@ -0,0 +1,90 @@
+import tempfile
+import time
+import unittest
+
+from mcp import types
+
+from tool_result_cache import ToolResultCache
+
+def text_result(text: str, is_error: bool = False) -> types.CallToolResult:
+    return types.CallToolResult(content=[types.TextContent(type="text", text=text)], isError=is_error)
+
+def tool(name: str, **hints) -> types.Tool:
+    return types.Tool(name=name, inputSchema={"type": "object"}, annotations=types.ToolAnnotations(**hints) if hints else None)
+
+class TestToolResultCache(unittest.TestCase):
+    """Tests the memory and disk tiers of ToolResultCache."""
+
+    def test_arguments_are_canonicalized(self):
+        cache = ToolResultCache(tools={"get-page": None})
+        cache.put("wiki", "get-page", {"title": "A", "content": "withSource"}, text_result("page A"))
+
+        self.assertEqual(cache.get("wiki", "get-page", {"content": "withSource", "title": "A"}).content[0].text, "page A")
+        self.assertIsNone(cache.get("wiki", "get-page", {"title": "B", "content": "withSource"}))
+        self.assertIsNone(cache.get("other", "get-page", {"title": "A", "content": "withSource"}))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_allowlist_and_annotations_decide_what_is_cacheable(self):
+        cache = ToolResultCache(tools={"get-page": 60})
+
+        self.assertTrue(cache.is_cacheable("get-page"))
+        self.assertTrue(cache.is_cacheable("search", tool("search", readOnlyHint=True)))
+        self.assertFalse(cache.is_cacheable("set-flag", tool("set-flag", readOnlyHint=False, idempotentHint=True))) # an idempotent write
+        self.assertFalse(cache.is_cacheable("update-page", tool("update-page", destructiveHint=True)))
+        self.assertFalse(cache.is_cacheable("update-page"))
+        self.assertFalse(ToolResultCache(use_hints=False).is_cacheable("search", tool("search", readOnlyHint=True)))
+
+    def test_results_expire_after_their_tools_ttl(self):
+        cache = ToolResultCache(tools={"history": 0.1, "page": None}, ttl=60)
+        cache.put("wiki", "history", {}, text_result("history"))
+        cache.put("wiki", "page", {}, text_result("page"))
+        time.sleep(0.2)
+
+        self.assertIsNone(cache.get("wiki", "history", {}))
+        self.assertIsNotNone(cache.get("wiki", "page", {}))
+
+    def test_least_recently_used_results_are_evicted_over_budget(self):
+        size = len(text_result("x" * 100).model_dump_json())
+        cache = ToolResultCache(tools={"page": None}, max_bytes=2 * size)
+        for title in ("a", "b"):
+            cache.put("wiki", "page", {"title": title}, text_result(title * 100))
+        cache.get("wiki", "page", {"title": "a"}) # b is now least recently used
+        cache.put("wiki", "page", {"title": "c"}, text_result("c" * 100))
+
+        self.assertIsNotNone(cache.get("wiki", "page", {"title": "a"}))
+        self.assertIsNone(cache.get("wiki", "page", {"title": "b"}))
+        self.assertLessEqual(cache.size_bytes, 2 * size)
+
+    def test_errors_are_not_cached(self):
+        cache = ToolResultCache(tools={"page": None})
+        cache.put("wiki", "page", {}, text_result("boom", is_error=True))
+
+        self.assertIsNone(cache.get("wiki", "page", {}))
+
+    def test_result_of_a_call_overtaken_by_a_write_is_not_cached(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ToolResultCache(tools={"page": None}, directory=directory)
+            generation = cache.generation("wiki") # the read starts
+            cache.clear("wiki") # a write runs meanwhile
+            cache.put("wiki", "page", {"title": "A"}, text_result("stale A"), generation)
+            self.assertIsNone(cache.get("wiki", "page", {"title": "A"}))
+
+            other = cache.generation("other")
+            cache.put("other", "page", {"title": "A"}, text_result("other A"), other)
+            self.assertEqual(cache.get("other", "page", {"title": "A"}).content[0].text, "other A")
+            cache.clear()
+            self.assertNotEqual(cache.generation("other"), other)
+
+    def test_disk_tier_survives_a_new_cache_and_clears_per_server(self):
+        with tempfile.TemporaryDirectory() as directory:
+            ToolResultCache(tools={"page": None}, directory=directory).put("wiki", "page", {"title": "A"}, text_result("page A"))
+            ToolResultCache(tools={"page": None}, directory=directory).put("other", "page", {"title": "A"}, text_result("other A"))
+
+            cache = ToolResultCache(tools={"page": None}, directory=directory)
+            self.assertEqual(cache.get("wiki", "page", {"title": "A"}).content[0].text, "page A")
+            cache.clear("wiki")
+            self.assertIsNone(cache.get("wiki", "page", {"title": "A"}))
+            self.assertEqual(ToolResultCache(directory=directory).get("other", "page", {"title": "A"}).content[0].text, "other A")
+
+if __name__ == "__main__":
+    unittest.main()
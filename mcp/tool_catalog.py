@@ -0,0 +1,76 @@
+"""
+A persistent, on-disk cache of MCP tool catalogs.
+
+Discovering tools means connecting to the server and running `list_tools`,
+which takes seconds for `npx` based servers. The cache stores the raw MCP tool
+definitions per server, so clients can start from the cached catalog and
+refresh it in the background.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from typing import List, Optional
+
+from mcp import types
+from pydantic import BaseModel, ValidationError
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ai-journey", "mcp-tools")
+
+class ToolCatalog(BaseModel):
+    """The tools of one MCP server, as listed at `fetched_at` (epoch seconds)."""
+    server_key: str
+    server_name: Optional[str] = None
+    server_version: Optional[str] = None
+    fetched_at: float
+    tools: List[types.Tool]
+
+class ToolCatalogCache:
+    """
+    Stores one JSON file per server, named after a hash of the server key.
+    Entries older than `ttl` seconds are stale: they can still be used to start up,
+    but should be refreshed. A catalog listed by a different server version replaces the old one.
+    """
+    def __init__(self, directory: Optional[str] = None, ttl: float = 24 * 60 * 60):
+        self.directory = directory or os.environ.get("MCP_TOOL_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.ttl = ttl
+
+    def _path(self, server_key: str) -> str:
+        digest = hashlib.sha256(server_key.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def is_fresh(self, catalog: ToolCatalog) -> bool:
+        return time.time() - catalog.fetched_at < self.ttl
+
+    def load(self, server_key: str) -> Optional[ToolCatalog]:
+        """Returns the cached catalog, fresh or stale, or None if there is none."""
+        try:
+            with open(self._path(server_key), "r", encoding="utf-8") as f:
+                catalog = ToolCatalog.model_validate_json(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValidationError) as e:
+            log.warning(f"Ignoring unreadable tool catalog for '{server_key}': {e}")
+            return None
+        return catalog if catalog.server_key == server_key else None
+
+    def store(self, catalog: ToolCatalog) -> None:
+        """Writes the catalog atomically, so concurrent readers never see a partial file."""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(catalog.model_dump_json(exclude_none=True))
+            os.replace(tmp_path, self._path(catalog.server_key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def invalidate(self, server_key: str) -> None:
+        try:
+            os.remove(self._path(server_key))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,180 @@
+"""
+Per-turn selection of the function tools sent to the model.
+
+Every tool schema in `tools` is prompt input of every request, so prompt size and time to first
+token grow with the tools of all MCP servers. `ToolIndex` ranks the function tools against the
+user's input with BM25 over their names, descriptions and parameters, optionally blended with
+embedding similarity, and a turn sends only the top `top_k` of them. Pinned tools (like `bye`)
+and hosted tools (web search, image generation, remote MCP), which have no local schema to rank,
+are always sent. Follow-ups like "do it again for the other file" share no words with the tools
+they need, so the previous inputs of the conversation are ranked too, and the tools it called in
+its recent turns are kept (`ToolHistory`). Each selection reports the tool tokens it saved.
+"""
+import json
+import logging
+import math
+import re
+from collections import Counter, deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from tool_output import estimate_tokens
+
+log = logging.getLogger(__name__)
+
+Embed = Callable[[List[str]], List[List[float]]] # texts -> vectors
+
+WORD = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|[0-9]+") # splits camelCase, kebab-case and snake_case
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words, plural "s" dropped, so "pages" finds "get-page"."""
+    words = (word.lower() for word in WORD.findall(text))
+    return [word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word for word in words]
+
+def tool_text(tool: Dict[str, Any]) -> str:
+    """The searchable text of a function tool: name, description, parameter names and descriptions."""
+    parts = [tool["name"], tool.get("description") or ""]
+    for name, schema in ((tool.get("parameters") or {}).get("properties") or {}).items():
+        parts.append(name)
+        if isinstance(schema, dict):
+            parts.append(schema.get("description") or "")
+    return " ".join(parts)
+
+def openai_embedder(client: Any, model: str = "text-embedding-3-small") -> Embed:
+    """An `Embed` backed by the embeddings API of a sync `openai.OpenAI` client."""
+    def embed(texts: List[str]) -> List[List[float]]:
+        return [item.embedding for item in client.embeddings.create(model=model, input=texts).data]
+    return embed
+
+class ToolHistory:
+    """The user inputs of the last `turns` turns of one conversation and the tools they called."""
+    def __init__(self, turns: int = 2):
+        self.inputs: Deque[str] = deque(maxlen=turns)
+        self.calls: Deque[Set[str]] = deque(maxlen=turns)
+
+    def start_turn(self, user_input: str) -> None:
+        """Called after the tools of the turn are selected, so the selection ranks only the previous turns."""
+        self.inputs.append(user_input)
+        self.calls.append(set())
+
+    def called(self, name: str) -> None:
+        if self.calls:
+            self.calls[-1].add(name)
+
+    @property
+    def called_tools(self) -> Set[str]:
+        return set().union(*self.calls)
+
+class ToolSelection(NamedTuple):
+    tools: List[Any] # in their original order
+    tokens: int # estimated, of the selected tools' schemas
+    all_tokens: int # of all tools
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.all_tokens - self.tokens
+
+class ToolIndex:
+    """
+    Selects the tools of a turn: the `top_k` function tools that best match the query, plus
+    the `pinned` ones by name and every non-function tool. With `top_k` None, no more
+    candidates than `top_k`, or no tool matching the query at all, all tools are sent.
+    With a `ToolHistory`, the previous inputs add their scores at `history_weight` and the
+    tools called in those turns are kept.
+
+    The index is rebuilt when the tools change (a refreshed MCP catalog, or a changed
+    description or schema). With `embed`, the
+    BM25 score (scaled to 0..1) is blended with the cosine similarity of query and tool
+    embeddings by `embedding_weight`; the tools are embedded once per build, the query per turn.
+    """
+    def __init__(
+        self,
+        top_k: Optional[int] = 8,
+        pinned: Iterable[str] = ("bye",),
+        embed: Optional[Embed] = None,
+        embedding_weight: float = 0.5,
+        history_weight: float = 0.5,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ):
+        self.top_k = top_k
+        self.pinned = set(pinned)
+        self.embed = embed
+        self.embedding_weight = embedding_weight
+        self.history_weight = history_weight
+        self.k1 = k1
+        self.b = b
+        self._signature: Optional[Tuple[str, ...]] = None # the tools indexed, descriptions and schemas included
+        self._names: List[str] = []
+        self._term_counts: List[Counter[str]] = []
+        self._lengths: List[int] = []
+        self._idf: Dict[str, float] = {}
+        self._average_length = 0.0
+        self._vectors: List[List[float]] = []
+        self._tokens: Dict[str, int] = {} # tool key -> estimated schema tokens
+
+    @staticmethod
+    def _key(tool: Any) -> str:
+        return tool.get("name") or tool.get("server_label") or tool["type"]
+
+    @staticmethod
+    def _signature_of(tools: Sequence[Any]) -> Tuple[str, ...]:
+        return tuple(json.dumps(tool, sort_keys=True, default=str) for tool in tools)
+
+    def build(self, tools: Sequence[Any]) -> None:
+        candidates = [tool for tool in tools if tool.get("type") == "function" and tool["name"] not in self.pinned]
+        texts = [tool_text(tool) for tool in candidates]
+        self._names = [tool["name"] for tool in candidates]
+        self._term_counts = [Counter(tokenize(text)) for text in texts]
+        self._lengths = [sum(counts.values()) for counts in self._term_counts]
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        document_frequency: Counter[str] = Counter(term for counts in self._term_counts for term in counts)
+        count = len(candidates)
+        self._idf = {term: math.log(1 + (count - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+        self._vectors = self.embed(texts) if self.embed and texts else []
+        self._tokens = {self._key(tool): estimate_tokens(json.dumps(tool, separators=(",", ":"))) for tool in tools}
+        self._signature = self._signature_of(tools)
+        log.debug(f"Indexed {count} tools, {len(self._idf)} terms")
+
+    def scores(self, query: str) -> Dict[str, float]:
+        """The relevance of each candidate tool to the query, by name."""
+        terms = [term for term in tokenize(query) if term in self._idf]
+        bm25 = []
+        for counts, length in zip(self._term_counts, self._lengths):
+            score = 0.0
+            for term in terms:
+                frequency = counts.get(term, 0)
+                if frequency:
+                    relative_length = length / self._average_length if self._average_length else 1.0
+                    score += self._idf[term] * frequency * (self.k1 + 1) / (frequency + self.k1 * (1 - self.b + self.b * relative_length))
+            bm25.append(score)
+        if not self._vectors:
+            return dict(zip(self._names, bm25))
+        top = max(bm25, default=0.0) or 1.0
+        query_vector = self.embed([query])[0]
+        return {
+            name: (1 - self.embedding_weight) * score / top + self.embedding_weight * self._cosine(query_vector, vector)
+            for name, score, vector in zip(self._names, bm25, self._vectors)
+        }
+
+    @staticmethod
+    def _cosine(a: List[float], b: List[float]) -> float:
+        norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+        return sum(x * y for x, y in zip(a, b)) / norm if norm else 0.0
+
+    def select(self, tools: Sequence[Any], query: str, history: Optional[ToolHistory] = None) -> ToolSelection:
+        """The tools to send for a turn that starts with `query`, after the turns of `history`."""
+        if self._signature != self._signature_of(tools):
+            self.build(tools)
+        all_tokens = sum(self._tokens.values())
+        if self.top_k is None or len(self._names) <= self.top_k:
+            return ToolSelection(list(tools), all_tokens, all_tokens)
+        scores = self.scores(query)
+        if history and history.inputs:
+            previous = self.scores(" ".join(history.inputs))
+            scores = {name: score + self.history_weight * previous[name] for name, score in scores.items()}
+        if not any(scores.values()): # nothing to rank by, any cut would be arbitrary
+            return ToolSelection(list(tools), all_tokens, all_tokens)
+        ranked = sorted(self._names, key=lambda name: -scores[name]) # stable: ties keep the tools' order
+        kept = self.pinned | set(ranked[:self.top_k]) | (history.called_tools if history else set())
+        chosen = [tool for tool in tools if tool.get("type") != "function" or tool["name"] in kept]
+        return ToolSelection(chosen, sum(self._tokens[self._key(tool)] for tool in chosen), all_tokens)
@@ -0,0 +1,139 @@
+"""
+Compact encoding of MCP tool results as function call outputs for the model.
+
+`str(result)` of a `CallToolResult` is its pydantic repr: field names, `meta`, `annotations`
+and escaped text, all of which the model reads as prompt tokens on the next request.
+`ToolOutputEncoder` sends only what the tool returned: its `structuredContent` as compact JSON,
+else the text of its content blocks. Outputs over the tool's byte or token budget keep their
+head and tail, with a marker of what was cut in between. Each call reports its tokens and the
+tokens saved against the repr.
+"""
+import json
+import logging
+import threading
+from typing import Callable, Dict, NamedTuple, Optional
+
+from mcp import types
+
+log = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4 # estimate, as in ochat/session.py; pass `count_tokens` for a real tokenizer
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+class OutputBudget(NamedTuple):
+    """Limits of one tool's output; None is no limit."""
+    max_bytes: Optional[int] = None # of the UTF-8 output
+    max_tokens: Optional[int] = None
+
+class EncodedOutput(NamedTuple):
+    text: str
+    tokens: int
+    raw_tokens: int # of str(result), what was sent before
+    truncated: bool
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.raw_tokens - self.tokens)
+
+class ToolOutputEncoder:
+    """
+    Encodes tool results within per-tool budgets: `budgets` maps a tool name to its `OutputBudget`,
+    other tools get `default_budget`. Truncation keeps `head_fraction` of the budget from the start
+    of the output and the rest from its end, where errors and summaries tend to be.
+    Subclass and override `extract` for other encodings.
+
+    `calls`, `tokens` and `tokens_saved` total all encoded outputs.
+    """
+    def __init__(
+        self,
+        budgets: Optional[Dict[str, OutputBudget]] = None,
+        default_budget: OutputBudget = OutputBudget(max_bytes=64 * 1024, max_tokens=4096),
+        head_fraction: float = 0.7,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+    ):
+        self.budgets = budgets or {}
+        self.default_budget = default_budget
+        self.head_fraction = head_fraction
+        self.count_tokens = count_tokens
+        self.calls = 0
+        self.tokens = 0
+        self.tokens_saved = 0
+        self._lock = threading.Lock() # chat.py encodes on its function call threads
+
+    def budget_for(self, name: str) -> OutputBudget:
+        return self.budgets.get(name, self.default_budget)
+
+    def extract(self, result: types.CallToolResult) -> str:
+        """The payload of the result: structured content as compact JSON, else the text of its content blocks."""
+        if result.structuredContent is not None:
+            text = json.dumps(result.structuredContent, separators=(",", ":"), ensure_ascii=False, default=str)
+        else:
+            text = "\n".join(self._block_text(block) for block in result.content)
+        return f"[error] {text}" if result.isError else text
+
+    @staticmethod
+    def _block_text(block: types.ContentBlock) -> str:
+        if isinstance(block, types.TextContent):
+            return block.text
+        if isinstance(block, types.EmbeddedResource) and isinstance(block.resource, types.TextResourceContents):
+            return block.resource.text
+        if isinstance(block, types.EmbeddedResource):
+            return f"[resource {block.resource.uri}]"
+        if isinstance(block, types.ResourceLink):
+            return f"[resource {block.uri}]"
+        return f"[{block.type} {block.mimeType}]" # image and audio data is no use in a text prompt
+
+    @staticmethod
+    def _fits_bytes(text: str, budget: OutputBudget) -> bool:
+        return budget.max_bytes is None or len(text.encode("utf-8")) <= budget.max_bytes
+
+    def _fits_tokens(self, text: str, budget: OutputBudget) -> bool:
+        return budget.max_tokens is None or self.count_tokens(text) <= budget.max_tokens
+
+    def truncate(self, text: str, budget: OutputBudget) -> str:
+        """
+        Cuts the middle of `text` to fit the budget; the marker counts against it, and is left out
+        when it alone does not fit. The kept bytes start from the byte budget (or the token budget at
+        CHARS_PER_TOKEN) and shrink until `count_tokens` agrees.
+        """
+        if self._fits_bytes(text, budget) and self._fits_tokens(text, budget):
+            return text
+        data = text.encode("utf-8")
+        keep = len(data)
+        if budget.max_bytes is not None:
+            keep = min(keep, budget.max_bytes)
+        if budget.max_tokens is not None:
+            keep = min(keep, budget.max_tokens * CHARS_PER_TOKEN)
+        while True:
+            result = self._cut(data, keep)
+            if keep == 0 or (self._fits_bytes(result, budget) and self._fits_tokens(result, budget)):
+                return result
+            tokens = self.count_tokens(result)
+            ratio = budget.max_tokens / tokens if budget.max_tokens is not None and tokens > budget.max_tokens else 0.9
+            keep = max(0, min(keep - 1, int(keep * ratio)))
+
+    def _cut(self, data: bytes, keep: int) -> str:
+        """At most `keep` bytes of `data`: its head and tail around a marker of what was cut, or only its head."""
+        marker = f"\n[... {{}} of {len(data)} bytes cut ...]\n"
+        room = keep - len(marker.format(len(data)))
+        if room < 0: # not even the marker fits
+            return data[:keep].decode("utf-8", errors="ignore")
+        head = int(room * self.head_fraction)
+        tail = room - head
+        start = data[:head].decode("utf-8", errors="ignore")
+        end = data[len(data) - tail:].decode("utf-8", errors="ignore") if tail else ""
+        cut = len(data) - len(start.encode("utf-8")) - len(end.encode("utf-8"))
+        return start + marker.format(cut) + end
+
+    def encode(self, name: str, result: types.CallToolResult) -> EncodedOutput:
+        text = self.extract(result)
+        truncated = self.truncate(text, self.budget_for(name))
+        encoded = EncodedOutput(truncated, self.count_tokens(truncated), self.count_tokens(str(result)), truncated is not text)
+        with self._lock:
+            self.calls += 1
+            self.tokens += encoded.tokens
+            self.tokens_saved += encoded.tokens_saved
+        log.debug(f"Output of '{name}': {encoded.tokens} tokens, {encoded.tokens_saved} saved, truncated={encoded.truncated}")
+        return encoded
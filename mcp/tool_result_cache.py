@@ -0,0 +1,207 @@
+"""
+A cache of MCP tool results, for tools that are safe to call only once.
+
+Read-only tools, like `get-page` of the MediaWiki server, are called again and again
+with the same arguments. The cache keys a result by server, tool name and canonical
+JSON arguments, keeps recent results in an LRU memory tier with a byte budget,
+and optionally in an on-disk tier shared between runs.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional
+
+from mcp import types
+from pydantic import BaseModel, ValidationError
+
+log = logging.getLogger(__name__)
+
+class CachedToolResult(BaseModel):
+    """A result as stored on disk; expires at `expires_at` (epoch seconds)."""
+    server_key: str
+    tool: str
+    expires_at: float
+    result: types.CallToolResult
+
+class _MemoryEntry(NamedTuple):
+    server_key: str
+    expires_at: float
+    size: int
+    result: types.CallToolResult
+
+class ToolResultCache:
+    """
+    Caches the results of tools that are safe to cache:
+    tools on the `tools` allowlist, which maps a tool name to its TTL in seconds (None for the default `ttl`),
+    and, with `use_hints`, tools the server annotates with `readOnlyHint`. Every other tool is taken
+    to be a write, `idempotentHint` included (it only describes tools that are not read-only), and
+    calling it clears the server's cached results. Error results are never cached.
+
+    The memory tier evicts least recently used results above `max_bytes` (of their JSON).
+    With a `directory`, results are also written there and read back after a memory miss.
+
+    A call's result must not outlive a write that ran while the call was in flight: take the
+    server's `generation` before the call and pass it to `put`, which drops the result when
+    `clear` ran in between.
+    """
+    def __init__(
+        self,
+        tools: Optional[Dict[str, Optional[float]]] = None,
+        ttl: float = 5 * 60,
+        use_hints: bool = True,
+        max_bytes: int = 32 * 1024 * 1024,
+        directory: Optional[str] = None,
+    ):
+        self.tools = tools or {}
+        self.ttl = ttl
+        self.use_hints = use_hints
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, _MemoryEntry] = OrderedDict()
+        self._bytes = 0
+        self._generations: Dict[str, int] = {} # clears per server
+        self._cleared_all = 0
+        self._lock = threading.Lock() # the sync and async agent APIs may share a cache from different threads
+
+    @staticmethod
+    def key(server_key: str, name: str, arguments: Dict[str, Any]) -> str:
+        """Hashes the call; arguments are canonicalized, so key order and whitespace do not matter."""
+        canonical = json.dumps([server_key, name, arguments], sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, name: str, tool: Optional[types.Tool] = None) -> bool:
+        if name in self.tools:
+            return True
+        annotations = tool.annotations if tool else None
+        return bool(self.use_hints and annotations and annotations.readOnlyHint)
+
+    def ttl_for(self, name: str) -> float:
+        ttl = self.tools.get(name)
+        return self.ttl if ttl is None else ttl
+
+    def _path(self, server_key: str, key: str) -> str:
+        # prefixed with the server hash, so `clear` can drop the results of one server
+        server = hashlib.sha256(server_key.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, f"{server}-{key}.json")
+
+    def generation(self, server_key: str) -> int:
+        """Changes whenever the results of the server are cleared."""
+        with self._lock:
+            return self._cleared_all + self._generations.get(server_key, 0)
+
+    def _remember(self, key: str, entry: _MemoryEntry, generation: Optional[int] = None) -> bool:
+        """Keeps the entry in memory, unless its server was cleared since `generation`; returns whether it was kept."""
+        with self._lock:
+            if generation is not None and generation != self._cleared_all + self._generations.get(entry.server_key, 0):
+                return False
+            old = self._entries.pop(key, None)
+            if old:
+                self._bytes -= old.size
+            if entry.size > self.max_bytes:
+                return True
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+            return True
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry:
+                self._bytes -= entry.size
+
+    def _load(self, server_key: str, name: str, key: str) -> Optional[CachedToolResult]:
+        path = self._path(server_key, key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                cached = CachedToolResult.model_validate_json(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValidationError) as e:
+            log.warning(f"Ignoring unreadable result of '{name}': {e}")
+            return None
+        if cached.expires_at <= time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return cached if cached.server_key == server_key and cached.tool == name else None
+
+    def _store(self, server_key: str, key: str, cached: CachedToolResult) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(cached.model_dump_json())
+            os.replace(tmp_path, self._path(server_key, key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, server_key: str, name: str, arguments: Dict[str, Any]) -> Optional[types.CallToolResult]:
+        """Returns the unexpired cached result of the call, or None."""
+        key = self.key(server_key, name, arguments)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.expires_at > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.result
+        if entry:
+            self._forget(key)
+        cached = self._load(server_key, name, key) if self.directory else None
+        if cached:
+            self._remember(key, _MemoryEntry(server_key, cached.expires_at, len(cached.result.model_dump_json()), cached.result))
+            self.hits += 1
+            return cached.result
+        self.misses += 1
+        return None
+
+    def put(self, server_key: str, name: str, arguments: Dict[str, Any], result: types.CallToolResult, generation: Optional[int] = None) -> None:
+        """Caches the result; with the server's `generation` from before the call, only if no clear ran since."""
+        if result.isError:
+            return
+        key = self.key(server_key, name, arguments)
+        cached = CachedToolResult(server_key=server_key, tool=name, expires_at=time.time() + self.ttl_for(name), result=result)
+        if not self._remember(key, _MemoryEntry(server_key, cached.expires_at, len(result.model_dump_json()), result), generation):
+            return
+        if self.directory:
+            try:
+                self._store(server_key, key, cached)
+                if generation is not None and generation != self.generation(server_key): # cleared while writing
+                    os.remove(self._path(server_key, key))
+            except OSError as e:
+                log.warning(f"Could not store result of '{name}': {e}")
+
+    def clear(self, server_key: Optional[str] = None) -> None:
+        """Drops the cached results of one server, or all of them, and of the calls in flight."""
+        with self._lock:
+            if server_key is None:
+                self._cleared_all += 1
+            else:
+                self._generations[server_key] = self._generations.get(server_key, 0) + 1
+            for key in [key for key, entry in self._entries.items() if server_key is None or entry.server_key == server_key]:
+                self._bytes -= self._entries.pop(key).size
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        prefix = hashlib.sha256(server_key.encode("utf-8")).hexdigest()[:16] + "-" if server_key else ""
+        for file_name in os.listdir(self.directory):
+            if file_name.startswith(prefix) and file_name.endswith(".json"):
+                try:
+                    os.remove(os.path.join(self.directory, file_name))
+                except OSError:
+                    pass
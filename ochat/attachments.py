@@ -0,0 +1,110 @@
+"""
+Image attachments for ochat: deduplicated by content, optionally downscaled, base64-encoded in chunks.
+
+Ollama expects images as base64 strings in the JSON request. Files are memory-mapped, so
+hashing and encoding read them through the page cache instead of copying them into `bytes`
+first, and the base64 text is built chunk by chunk. With a `max_side`, images larger than
+the model's input resolution are downscaled with Pillow (optional) before encoding.
+"""
+import base64
+import hashlib
+import io
+import mmap
+import os
+import sys
+from typing import List, Optional, Set, Tuple, Union
+
+from llm_client import ollama_client
+
+try:
+    from PIL import Image
+except ImportError: # downscaling is optional
+    Image = None
+
+CHUNK_SIZE = 3 * 1024 * 1024 # a multiple of 3, so the base64 of the chunks concatenates without padding
+
+Buffer = Union[bytes, memoryview, mmap.mmap]
+
+def _mapped(path: str) -> Tuple[io.BufferedReader, Buffer]:
+    """Opens and memory-maps a file; empty files cannot be mapped and get an empty buffer."""
+    f = open(path, "rb")
+    if os.fstat(f.fileno()).st_size == 0:
+        return f, b""
+    return f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def content_hash(path: str) -> str:
+    """The SHA-256 of the file's content."""
+    f, data = _mapped(path)
+    with f:
+        try:
+            return hashlib.sha256(data).hexdigest()
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+def encode_base64(data: Buffer, chunk_size: int = CHUNK_SIZE) -> str:
+    """Encodes the buffer chunk by chunk, so no base64 copy of the whole input exists besides the result."""
+    view = memoryview(data)
+    encoded = bytearray()
+    for start in range(0, len(view), chunk_size):
+        encoded += base64.b64encode(view[start:start + chunk_size])
+    view.release()
+    return encoded.decode("ascii")
+
+def encode_file(path: str) -> str:
+    f, data = _mapped(path)
+    with f:
+        try:
+            return encode_base64(data)
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+def downscale(path: str, max_side: int) -> Optional[bytes]:
+    """
+    Returns the image re-encoded to fit `max_side` x `max_side`, in its own format when Pillow can write it,
+    or None if it already fits (then the file is sent as is).
+    """
+    if Image is None:
+        raise RuntimeError("Downscaling images needs Pillow: pip install pillow")
+    with Image.open(path) as image:
+        if max(image.size) <= max_side:
+            return None
+        image_format = image.format if image.format in ("JPEG", "PNG", "WEBP") else "PNG"
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        output = io.BytesIO()
+        if image_format == "PNG":
+            image.save(output, format=image_format, optimize=True)
+        else:
+            image.save(output, format=image_format, quality=90)
+        return output.getvalue()
+
+def model_image_size(model: str) -> Optional[int]:
+    """The vision input resolution the model reports (`<arch>.vision.image_size`), or None if it reports none."""
+    try:
+        model_info = ollama_client().show(model).modelinfo or {}
+    except Exception as e:
+        print(f"Warning: could not read the image size of '{model}': {e}", file=sys.stderr)
+        return None
+    for key, value in model_info.items():
+        if key.endswith(".vision.image_size") and isinstance(value, int):
+            return value
+    return None
+
+def prepare_images(paths: List[str], max_side: Optional[int] = None) -> List[str]:
+    """
+    Returns the base64 of each distinct image, in the given order. Duplicates are detected by content hash,
+    so the same file given twice, via a symlink, or as a copy, is sent once.
+    """
+    images: List[str] = []
+    seen: Set[str] = set()
+    for path in paths:
+        digest = content_hash(path)
+        if digest in seen:
+            continue
+        seen.add(digest)
+        scaled = downscale(path, max_side) if max_side else None
+        images.append(encode_base64(scaled) if scaled is not None else encode_file(path))
+    return images
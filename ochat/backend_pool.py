@@ -0,0 +1,312 @@
+"""
+A pool of Ollama backends: routes each request to the least-loaded host that already has the model loaded.
+
+Loading a model takes seconds to minutes, so a host that holds the model in memory (`/api/ps`) is
+preferred while it has a free parallel slot (`parallel`, the server's OLLAMA_NUM_PARALLEL). When all
+of those are busy, the request spills to the least-loaded healthy host, which loads the model and is
+preferred from then on, so the load spreads over the hosts and throughput grows with their number.
+
+A host that fails with a connection error or a 5xx status is skipped for `cooldown` seconds and the
+request is retried on the next host; a streamed request fails over only before its first chunk.
+A 404 (model not pulled there) tries the next host without marking the host down.
+
+A conversation (`session()`) stays on the host of its last turn while that host is healthy and has
+a free slot, so the server's KV cache of its prefix is reused; only new conversations and failovers
+take the next host.
+
+Hosts come from the `hosts` list, else $OLLAMA_HOSTS (comma-separated), else the single default host.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Set, TypeVar
+
+import httpx
+
+from llm_client import ClientConfig, async_ollama_client, ollama_client
+
+try:
+    import openai
+    _OPENAI_ERRORS: tuple = (openai.APIConnectionError,)
+except ImportError: # only the OpenAI-compatible callers need the package
+    _OPENAI_ERRORS = ()
+
+T = TypeVar("T")
+
+FAILOVER_ERRORS = (httpx.TransportError, ConnectionError, TimeoutError, *_OPENAI_ERRORS)
+
+def model_name(model: str) -> str:
+    """The model name with its tag, as `/api/ps` lists it."""
+    return model if ":" in model else f"{model}:latest"
+
+def hosts_from_env() -> List[str]:
+    return [host.strip() for host in os.environ.get("OLLAMA_HOSTS", "").split(",") if host.strip()]
+
+@dataclass
+class Backend:
+    """One Ollama host, its loaded models and its load as seen by this process."""
+    config: ClientConfig
+    in_flight: int = 0
+    requests: int = 0
+    errors: int = 0
+    loaded: Set[str] = field(default_factory=set)
+    refreshed_at: float = 0 # of `loaded`, 0 for never
+    down_until: float = 0
+
+    @property
+    def host(self) -> str:
+        return self.config.base_url
+
+@dataclass
+class Affinity:
+    """The host of a conversation's last request, preferred for its next one."""
+    backend: Optional[Backend] = None
+
+class NoBackendError(ConnectionError):
+    """Raised when no host could serve a request."""
+
+class BackendPool:
+    """
+    Routes requests over `hosts`. `chat` and `achat` take the arguments of `ollama.Client.chat`;
+    `call` and `acall` route any request made through a backend's `config`, e.g. an OpenAI client.
+    """
+    def __init__(
+        self,
+        hosts: Optional[Sequence[str]] = None,
+        config: ClientConfig = ClientConfig(),
+        parallel: int = 4,
+        refresh_seconds: float = 10,
+        cooldown: float = 30,
+        probe_timeout: float = 2,
+    ):
+        hosts = list(hosts or hosts_from_env() or [config.base_url])
+        self.backends = [Backend(replace(config, host=host)) for host in hosts]
+        self.parallel = parallel
+        self.refresh_seconds = refresh_seconds
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout
+        self._lock = threading.Lock()
+        self._next = 0 # rotates ties between equally loaded hosts
+
+    def _probe(self, backend: Backend) -> None:
+        """Reads the models loaded on the host; an unreachable host is marked down."""
+        probe_config = replace(backend.config, connect_timeout=self.probe_timeout, read_timeout=self.probe_timeout, retries=0)
+        try:
+            models = ollama_client(probe_config).ps().models
+        except Exception:
+            with self._lock:
+                backend.down_until = time.monotonic() + self.cooldown
+                backend.refreshed_at = time.monotonic()
+            return
+        with self._lock:
+            backend.loaded = {model.model or model.name for model in models if model.model or model.name}
+            backend.refreshed_at = time.monotonic()
+
+    def _stale(self, force: bool = False) -> List[Backend]:
+        now = time.monotonic()
+        return [backend for backend in self.backends
+                if force or (backend.refreshed_at == 0 or now - backend.refreshed_at > self.refresh_seconds) and backend.down_until <= now]
+
+    def refresh(self, force: bool = False) -> None:
+        """Probes the hosts whose loaded models are older than `refresh_seconds`, in parallel."""
+        stale = self._stale(force)
+        if len(stale) == 1:
+            self._probe(stale[0])
+        elif stale:
+            with ThreadPoolExecutor(max_workers=len(stale)) as executor:
+                list(executor.map(self._probe, stale))
+
+    async def arefresh(self) -> None:
+        if self._stale():
+            await asyncio.to_thread(self.refresh)
+
+    def _choose(self, model: str, tried: Set[str], affinity: Optional[Affinity] = None) -> Backend:
+        """
+        The host for the next attempt: the affine one while it is healthy and has a free slot, else
+        a loaded one with a free slot, else the least loaded. Needs the lock.
+        """
+        name = model_name(model)
+        now = time.monotonic()
+        candidates = [backend for backend in self.backends if backend.host not in tried and backend.down_until <= now]
+        if not candidates: # all hosts are down: try those in cooldown too, rather than failing right away
+            candidates = [backend for backend in self.backends if backend.host not in tried]
+        if not candidates:
+            raise NoBackendError(f"No Ollama host could serve '{model}' (tried {', '.join(sorted(tried)) or 'none'}).")
+        last = affinity.backend if affinity else None
+        if last is not None and last.host not in tried and last.down_until <= now and last.in_flight < self.parallel:
+            return last
+        loaded = [backend for backend in candidates if name in backend.loaded and backend.in_flight < self.parallel]
+        self._next += 1
+        return min(loaded or candidates, key=lambda b: (b.in_flight, (self.backends.index(b) - self._next) % len(self.backends)))
+
+    def _acquire(self, model: str, tried: Set[str], affinity: Optional[Affinity] = None) -> Backend:
+        """Picks the host for the next attempt and counts the request in its load."""
+        with self._lock:
+            backend = self._choose(model, tried, affinity)
+            if affinity is not None:
+                affinity.backend = backend
+            backend.in_flight += 1
+            backend.requests += 1
+            return backend
+
+    def _release(self, backend: Backend, model: str, error: Optional[BaseException] = None) -> bool:
+        """Ends a request on the host; returns whether the error allows retrying on another host."""
+        with self._lock:
+            backend.in_flight -= 1
+            if error is None:
+                backend.loaded.add(model_name(model)) # the server has loaded it for this request
+                backend.down_until = 0
+                return False
+            backend.errors += 1
+            status = getattr(error, "status_code", None)
+            if isinstance(error, FAILOVER_ERRORS) or (isinstance(status, int) and status >= 500):
+                backend.down_until = time.monotonic() + self.cooldown
+                backend.loaded.discard(model_name(model))
+                return True
+            if status == 404: # the model is not pulled on this host
+                backend.loaded.discard(model_name(model))
+                return True
+            return False
+
+    def _failed(self, backend: Backend, model: str, error: Exception, tried: Set[str]) -> None:
+        """Ends a failed attempt; returns if another host should be tried, else raises."""
+        if not self._release(backend, model, error):
+            raise error
+        if len(tried) == len(self.backends):
+            raise NoBackendError(f"No Ollama host could serve '{model}', the last error was: {error}") from error
+
+    def call(self, model: str, request: Callable[[Backend], T], affinity: Optional[Affinity] = None) -> T:
+        """Runs `request` on the best host for `model`, failing over to the next host on host errors."""
+        self.refresh()
+        tried: Set[str] = set()
+        while True:
+            backend = self._acquire(model, tried, affinity)
+            tried.add(backend.host)
+            try:
+                result = request(backend)
+            except Exception as e:
+                self._failed(backend, model, e, tried)
+                continue
+            self._release(backend, model)
+            return result
+
+    async def acall(self, model: str, request: Callable[[Backend], Awaitable[T]], affinity: Optional[Affinity] = None) -> T:
+        """The async variant of `call`."""
+        await self.arefresh()
+        tried: Set[str] = set()
+        while True:
+            backend = self._acquire(model, tried, affinity)
+            tried.add(backend.host)
+            try:
+                result = await request(backend)
+            except Exception as e:
+                self._failed(backend, model, e, tried)
+                continue
+            self._release(backend, model)
+            return result
+
+    def chat(self, model: str, stream: bool = False, affinity: Optional[Affinity] = None, **kwargs) -> Any:
+        """`ollama.Client.chat` on the best host; a stream fails over until its first chunk arrives."""
+        if not stream:
+            return self.call(model, lambda backend: ollama_client(backend.config).chat(model=model, **kwargs), affinity)
+        self.refresh()
+        tried: Set[str] = set()
+        while True:
+            backend = self._acquire(model, tried, affinity)
+            tried.add(backend.host)
+            try:
+                chunks = ollama_client(backend.config).chat(model=model, stream=True, **kwargs)
+                first = next(chunks)
+            except Exception as e:
+                self._failed(backend, model, e, tried)
+                continue
+            return self._stream(backend, model, first, chunks)
+
+    def _stream(self, backend: Backend, model: str, first: Any, chunks: Iterator[Any]) -> Iterator[Any]:
+        error: Optional[BaseException] = None
+        try:
+            yield first
+            yield from chunks
+        except GeneratorExit: # closed early by the consumer
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._release(backend, model, error)
+
+    async def achat(self, model: str, stream: bool = False, affinity: Optional[Affinity] = None, **kwargs) -> Any:
+        """`ollama.AsyncClient.chat` on the best host; a stream fails over until its first chunk arrives."""
+        if not stream:
+            return await self.acall(model, lambda backend: async_ollama_client(backend.config).chat(model=model, **kwargs), affinity)
+        await self.arefresh()
+        tried: Set[str] = set()
+        while True:
+            backend = self._acquire(model, tried, affinity)
+            tried.add(backend.host)
+            try:
+                chunks = await async_ollama_client(backend.config).chat(model=model, stream=True, **kwargs)
+                first = await chunks.__anext__()
+            except Exception as e:
+                self._failed(backend, model, e, tried)
+                continue
+            return self._astream(backend, model, first, chunks)
+
+    async def _astream(self, backend: Backend, model: str, first: Any, chunks: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        error: Optional[BaseException] = None
+        try:
+            yield first
+            async for chunk in chunks:
+                yield chunk
+        except GeneratorExit: # closed early by the consumer
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._release(backend, model, error)
+
+    def base_url(self, model: str) -> str:
+        """The OpenAI-compatible base URL of the best host for `model`, for clients that take one fixed URL."""
+        self.refresh()
+        with self._lock:
+            return f"{self._choose(model, set()).host}/v1"
+
+    def session(self) -> "BackendSession":
+        """An `ollama.Client`-like view for one conversation, whose turns stay on one host."""
+        return BackendSession(self)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {"host": b.host, "requests": b.requests, "errors": b.errors, "in_flight": b.in_flight,
+                 "loaded": sorted(b.loaded), "down": b.down_until > now}
+                for b in self.backends
+            ]
+
+class AsyncBackendPool:
+    """An `ollama.AsyncClient`-like view of a pool, for code that awaits `client.chat`."""
+    def __init__(self, pool: BackendPool):
+        self.pool = pool
+
+    async def chat(self, model: str, **kwargs) -> Any:
+        return await self.pool.achat(model, **kwargs)
+
+class BackendSession:
+    """
+    The requests of one conversation: each goes to the host of the previous one while that host is
+    healthy and has a free slot, so its prompt prefix is still in the server's KV cache.
+    """
+    def __init__(self, pool: BackendPool):
+        self.pool = pool
+        self.affinity = Affinity()
+
+    def chat(self, model: str, **kwargs) -> Any:
+        return self.pool.chat(model, affinity=self.affinity, **kwargs)
+
+    async def achat(self, model: str, **kwargs) -> Any:
+        return await self.pool.achat(model, affinity=self.affinity, **kwargs)
@@ -0,0 +1,156 @@
+"""
+Batch mode for ochat: runs many prompts through one Ollama server in a single process.
+
+Input is JSONL, one request per line, from a file or stdin:
+    {"id": "q1", "message": "Why is the sky blue?"}
+    {"id": "q2", "message": "Describe this.", "images": ["scan.png"], "max_side": 896, "model": "llava", "options": {"temperature": 0}}
+
+Only `message` is required. Results are written as JSONL in input order, each with per-item stats,
+followed by a summary on stderr. Prompts run concurrently on one pooled AsyncClient (see llm_client.py), and `keep_alive`
+keeps the model loaded between them, so throughput is bound by the model server. With several
+hosts, requests are routed over them (see backend_pool.py), so throughput grows with their number.
+"""
+import asyncio
+import json
+import sys
+import time
+from typing import Any, Dict, IO, Iterable, List, Optional, Sequence
+
+import ollama
+
+from attachments import prepare_images
+from backend_pool import AsyncBackendPool, BackendPool
+from llm_client import ClientConfig, async_ollama_client
+from metrics import StreamMetrics, write_metrics
+from response_cache import ResponseCache, pool_digest
+
+def read_requests(lines: Iterable[str]) -> List[Dict[str, Any]]:
+    """Parses JSONL requests, skipping blank lines; a plain string line is taken as the message."""
+    requests = []
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {number} is not valid JSON: {e}") from None
+        if isinstance(request, str):
+            request = {"message": request}
+        if not isinstance(request, dict) or not isinstance(request.get("message"), str):
+            raise ValueError(f"Line {number} has no 'message' string.")
+        requests.append(request)
+    return requests
+
+async def run_request(
+    client: ollama.AsyncClient,
+    index: int,
+    request: Dict[str, Any],
+    model: str,
+    keep_alive: Optional[str],
+    options: Optional[Dict[str, Any]] = None,
+    cache: Optional[ResponseCache] = None,
+    hosts: Sequence[str] = ("",),
+) -> Dict[str, Any]:
+    """
+    Streams one request and returns its result line; errors are reported in the line, not raised.
+    Options of the line override the batch `options`. With a `cache`, cached responses are replayed,
+    keyed by the model digests on the `hosts` the client may route to ("" is the default host).
+    """
+    model = request.get("model", model)
+    result: Dict[str, Any] = {"index": index, "id": request.get("id", index), "model": model}
+    message: Dict[str, Any] = {"role": "user", "content": request["message"]}
+    metrics = StreamMetrics()
+    parts: List[str] = []
+    try:
+        if request.get("images"):
+            message["images"] = await asyncio.to_thread(prepare_images, request["images"], request.get("max_side"))
+        final_chunk: Any = {}
+        options = {**(options or {}), **request.get("options", {})} or None
+        chat = lambda: client.chat(model=model, messages=[message], options=options, keep_alive=keep_alive, stream=True)
+        if cache:
+            key = ResponseCache.key(await asyncio.to_thread(pool_digest, model, hosts), [message], options)
+            stream = cache.astream(key, chat)
+        else:
+            stream = await chat()
+        async for chunk in stream:
+            if chunk['message']['content']:
+                metrics.chunk()
+            parts.append(chunk['message']['content'])
+            final_chunk = chunk
+        result["response"] = "".join(parts)
+        result["stats"] = metrics.finish(final_chunk)
+    except Exception as e:
+        result["error"] = str(e)
+        result["stats"] = metrics.finish()
+    return result
+
+async def run_batch(
+    requests: List[Dict[str, Any]],
+    output: IO[str],
+    model: str = 'gemma3',
+    concurrency: int = 4,
+    keep_alive: Optional[str] = '10m',
+    host: Optional[str] = None,
+    metrics_path: Optional[str] = None,
+    options: Optional[Dict[str, Any]] = None,
+    cache: Optional[ResponseCache] = None,
+    hosts: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Runs the requests with at most `concurrency` streams in flight and writes each result line
+    as soon as all lines before it are written. Returns the summary of the run.
+    With `metrics_path`, the stats of every request are also written there, see `write_metrics`.
+    With `hosts`, requests are spread over those Ollama hosts, see `BackendPool`.
+    """
+    pool = BackendPool(hosts) if hosts else None
+    client = AsyncBackendPool(pool) if pool else async_ollama_client(ClientConfig(host=host or ""))
+    digest_hosts = [backend.host for backend in pool.backends] if pool else [host or ""] # for the model digests
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(index: int, request: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            return await run_request(client, index, request, model, keep_alive, options, cache, digest_hosts)
+
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(limited(index, request)) for index, request in enumerate(requests)]
+    errors = 0
+    eval_count = 0
+    records: List[Dict[str, Any]] = []
+    for task in tasks: # in input order; later tasks keep running meanwhile
+        result = await task
+        errors += "error" in result
+        eval_count += result["stats"].get("eval_count", 0)
+        records.append({"id": result["id"], "model": result["model"], "error": result.get("error"), **result["stats"]})
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+    wall_seconds = time.perf_counter() - started
+    if metrics_path:
+        write_metrics(records, metrics_path)
+    summary = {
+        "requests": len(requests),
+        "errors": errors,
+        "concurrency": concurrency,
+        "wall_seconds": wall_seconds,
+        "requests_per_second": len(requests) / wall_seconds if wall_seconds else 0,
+        "eval_tokens_per_second": eval_count / wall_seconds if wall_seconds else 0,
+    }
+    if pool:
+        summary["hosts"] = {backend["host"]: backend["requests"] for backend in pool.stats()}
+    if cache:
+        summary.update(cache_hits=cache.hits, cache_misses=cache.misses)
+    return summary
+
+def batch(path: str, output_path: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+    """Reads requests from `path` ('-' for stdin), runs them and writes JSONL to `output_path` (stdout by default)."""
+    if path == "-":
+        requests = read_requests(sys.stdin)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            requests = read_requests(f)
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as output:
+            summary = asyncio.run(run_batch(requests, output, **kwargs))
+    else:
+        summary = asyncio.run(run_batch(requests, sys.stdout, **kwargs))
+    print(f"--- Batch: {json.dumps(summary)} ---", file=sys.stderr)
+    return summary
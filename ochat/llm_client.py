@@ -0,0 +1,118 @@
+"""
+Shared, pooled clients for a local Ollama server: the native API (`ollama`) and its
+OpenAI-compatible `/v1` API (`openai`), sync and async.
+
+Every client built from the same `ClientConfig` shares one httpx connection pool, with
+keep-alive connections, HTTP/2 when the `h2` package is installed, explicit timeouts and
+connection retries. Repeated and concurrent requests reuse open connections instead of
+paying the TCP (and TLS) setup each time. Async clients are bound to an event loop, so
+they are shared per loop.
+
+Used by ochat.py and its modules and ochat/poc.py; tool/ollama_hosts.py is a small copy for the tool POCs.
+"""
+import asyncio
+import os
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+import httpx
+import ollama
+
+DEFAULT_HOST = "http://localhost:11434"
+
+def http2_available() -> bool:
+    try:
+        import h2 # noqa: F401 - httpx needs it for HTTP/2
+        return True
+    except ImportError:
+        return False
+
+@dataclass(frozen=True)
+class ClientConfig:
+    """
+    Connection settings of a client. `host` defaults to $OLLAMA_HOST, else localhost:11434.
+    `retries` retries failed connection attempts (and, for OpenAI clients, retryable responses).
+    The read timeout bounds the wait for the next streamed chunk, not the whole generation.
+    """
+    host: str = ""
+    connect_timeout: float = 5
+    read_timeout: float = 300
+    write_timeout: float = 60
+    pool_timeout: float = 60
+    max_connections: int = 32
+    max_keepalive_connections: int = 16
+    keepalive_expiry: float = 120
+    retries: int = 2
+    http2: bool = True
+
+    @property
+    def base_url(self) -> str:
+        host = (self.host or os.environ.get("OLLAMA_HOST") or DEFAULT_HOST).rstrip("/")
+        return host if "://" in host else f"http://{host}"
+
+    @property
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(connect=self.connect_timeout, read=self.read_timeout, write=self.write_timeout, pool=self.pool_timeout)
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_keepalive_connections, keepalive_expiry=self.keepalive_expiry)
+
+    def transport(self) -> httpx.HTTPTransport:
+        return httpx.HTTPTransport(limits=self.limits, http2=self.http2 and http2_available(), retries=self.retries)
+
+    def async_transport(self) -> httpx.AsyncHTTPTransport:
+        return httpx.AsyncHTTPTransport(limits=self.limits, http2=self.http2 and http2_available(), retries=self.retries)
+
+_lock = threading.Lock()
+_clients: Dict[Tuple[str, ClientConfig], Any] = {}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, ClientConfig], Any]]" = weakref.WeakKeyDictionary()
+
+def _shared(kind: str, config: ClientConfig, create) -> Any:
+    with _lock:
+        key = (kind, config)
+        if key not in _clients:
+            _clients[key] = create()
+        return _clients[key]
+
+def _shared_async(kind: str, config: ClientConfig, create) -> Any:
+    """Shares the client per running event loop; its connections cannot be used from another loop."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        key = (kind, config)
+        if key not in clients:
+            clients[key] = create()
+        return clients[key]
+
+def ollama_client(config: ClientConfig = ClientConfig()) -> ollama.Client:
+    """The shared native Ollama client of the config."""
+    return _shared("ollama", config, lambda: ollama.Client(host=config.base_url, timeout=config.timeout, transport=config.transport()))
+
+def async_ollama_client(config: ClientConfig = ClientConfig()) -> ollama.AsyncClient:
+    """The shared async native Ollama client of the config, for the running event loop."""
+    return _shared_async("ollama", config, lambda: ollama.AsyncClient(host=config.base_url, timeout=config.timeout, transport=config.async_transport()))
+
+def openai_client(config: ClientConfig = ClientConfig()) -> Any:
+    """The shared OpenAI client of the config, for Ollama's OpenAI-compatible API."""
+    import openai # only the OpenAI-compatible callers need the package
+    return _shared("openai", config, lambda: openai.OpenAI(
+        base_url=f"{config.base_url}/v1",
+        api_key="ollama", # required, but unused
+        max_retries=config.retries,
+        timeout=config.timeout,
+        http_client=httpx.Client(timeout=config.timeout, transport=config.transport()),
+    ))
+
+def async_openai_client(config: ClientConfig = ClientConfig()) -> Any:
+    """The shared async OpenAI client of the config, for the running event loop."""
+    import openai
+    return _shared_async("openai", config, lambda: openai.AsyncOpenAI(
+        base_url=f"{config.base_url}/v1",
+        api_key="ollama",
+        max_retries=config.retries,
+        timeout=config.timeout,
+        http_client=httpx.AsyncClient(timeout=config.timeout, transport=config.async_transport()),
+    ))
@@ -0,0 +1,148 @@
+"""
+Throughput and latency metrics of ochat streams, with JSON, CSV and Prometheus textfile sinks.
+
+`StreamMetrics` times a stream on the client (time to first token, inter-token latency)
+and adds the counters Ollama reports in the final chunk (prompt eval and generation
+tokens/sec, model load time). `write_metrics` appends the records to a sink chosen by
+the file extension: `.csv`, `.prom` (node_exporter textfile collector) or JSON lines.
+"""
+import csv
+import json
+import math
+import os
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+NS_PER_S = 1e9
+
+# Record fields, in CSV column order.
+FIELDS = [
+    "id", "model", "error",
+    "wall_seconds", "ttft_seconds",
+    "inter_token_p50_seconds", "inter_token_p90_seconds", "inter_token_p99_seconds",
+    "prompt_eval_count", "prompt_eval_seconds", "prompt_eval_tokens_per_second",
+    "eval_count", "eval_seconds", "eval_tokens_per_second",
+    "load_seconds", "total_seconds",
+]
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (q in 0..100) of the values, None if there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+def _per_second(count: Optional[int], seconds: Optional[float]) -> Optional[float]:
+    return count / seconds if count and seconds else None
+
+class StreamMetrics:
+    """
+    Call `chunk()` for every streamed chunk with content and `finish(final_chunk)` at the end.
+    A chunk carries about one token, so the gaps between chunks are the inter-token latencies.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.chunk_times: List[float] = []
+        self.record: Dict[str, Any] = {}
+
+    def chunk(self) -> None:
+        self.chunk_times.append(time.perf_counter())
+
+    def finish(self, final_chunk: Any = None, error: Optional[str] = None) -> Dict[str, Any]:
+        """Returns the record of the stream; fields that are unknown are left out."""
+        final_chunk = final_chunk or {}
+        gaps = [later - earlier for earlier, later in zip(self.chunk_times, self.chunk_times[1:])]
+        seconds = lambda key: final_chunk.get(key) / NS_PER_S if final_chunk.get(key) is not None else None
+        record = {
+            "error": error,
+            "wall_seconds": time.perf_counter() - self.started,
+            "ttft_seconds": self.chunk_times[0] - self.started if self.chunk_times else None,
+            "inter_token_p50_seconds": percentile(gaps, 50),
+            "inter_token_p90_seconds": percentile(gaps, 90),
+            "inter_token_p99_seconds": percentile(gaps, 99),
+            "prompt_eval_count": final_chunk.get('prompt_eval_count'),
+            "prompt_eval_seconds": seconds('prompt_eval_duration'),
+            "eval_count": final_chunk.get('eval_count'),
+            "eval_seconds": seconds('eval_duration'),
+            "load_seconds": seconds('load_duration'),
+            "total_seconds": seconds('total_duration'),
+        }
+        record["prompt_eval_tokens_per_second"] = _per_second(record["prompt_eval_count"], record["prompt_eval_seconds"])
+        record["eval_tokens_per_second"] = _per_second(record["eval_count"], record["eval_seconds"])
+        self.record = {key: value for key, value in record.items() if value is not None}
+        return self.record
+
+def _write_json_lines(records: List[Dict[str, Any]], path: str) -> None:
+    with open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps({"timestamp": time.time(), **record}, ensure_ascii=False) + "\n")
+
+def _write_csv(records: List[Dict[str, Any]], path: str) -> None:
+    new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["timestamp", *FIELDS], extrasaction="ignore")
+        if new_file:
+            writer.writeheader()
+        for record in records:
+            writer.writerow({"timestamp": time.time(), **record})
+
+def _label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def prometheus_text(records: List[Dict[str, Any]]) -> str:
+    """Summarizes the records per model in the Prometheus text exposition format."""
+    by_model: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for record in records:
+        by_model[record.get("model", "")].append(record)
+    lines: List[str] = []
+
+    def metric(name: str, kind: str, help: str, samples: Iterable[tuple]) -> None:
+        lines.append(f"# HELP ochat_{name} {help}")
+        lines.append(f"# TYPE ochat_{name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{_label(label)}"' for key, label in labels.items())
+            lines.append(f"ochat_{name}{{{label_text}}} {value:.6g}")
+
+    def values(model_records: List[Dict[str, Any]], key: str) -> List[float]:
+        return [record[key] for record in model_records if record.get(key) is not None]
+
+    metric("requests", "gauge", "Requests in the run.", (({"model": model}, len(rs)) for model, rs in by_model.items()))
+    metric("errors", "gauge", "Failed requests in the run.", (({"model": model}, sum(1 for r in rs if r.get("error"))) for model, rs in by_model.items()))
+    for key, name, help in (
+        ("ttft_seconds", "time_to_first_token_seconds", "Client-measured time to the first token."),
+        ("inter_token_p50_seconds", "inter_token_latency_seconds", "Median gap between streamed tokens."),
+        ("eval_tokens_per_second", "eval_tokens_per_second", "Generated tokens per second."),
+        ("prompt_eval_tokens_per_second", "prompt_eval_tokens_per_second", "Prompt tokens evaluated per second."),
+    ):
+        metric(name, "summary", help, (
+            ({"model": model, "quantile": q}, percentile(values(rs, key), q * 100))
+            for model, rs in by_model.items() if values(rs, key) for q in (0.5, 0.9, 0.99)
+        ))
+    metric("load_seconds", "gauge", "Longest model load time in the run.", (
+        ({"model": model}, max(values(rs, "load_seconds"))) for model, rs in by_model.items() if values(rs, "load_seconds")
+    ))
+    return "\n".join(lines) + "\n"
+
+def _write_prometheus(records: List[Dict[str, Any]], path: str) -> None:
+    """Replaces the file atomically, as the textfile collector may read it at any time."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(prometheus_text(records))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def write_metrics(records: List[Dict[str, Any]], path: str) -> None:
+    """Writes the records to `path`: CSV rows for `.csv`, a Prometheus textfile for `.prom`, JSON lines otherwise."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        _write_csv(records, path)
+    elif extension == ".prom":
+        _write_prometheus(records, path)
+    else:
+        _write_json_lines(records, path)
@@ -1,18 +1,31 @@
 import ollama
 import sys
 import argparse
+import itertools
 import os
-from typing import List, Optional
+from typing import List, Optional, Union
 
-def chat_with_ollama(model: str, message: str, images: Optional[List[bytes]] = None, verbose: bool = False):
+from attachments import model_image_size, prepare_images
+from backend_pool import BackendPool, hosts_from_env
+from batch import batch
+from llm_client import ollama_client
+from metrics import StreamMetrics, write_metrics
+from response_cache import ResponseCache, model_digest, pool_digest
+from session import ChatSession, prompt_lines, read_turns, run_session
+
+def chat_with_ollama(model: str, message: str, images: Optional[List[Union[bytes, str]]] = None, verbose: bool = False, metrics_path: Optional[str] = None, options: Optional[dict] = None, cache: Optional[ResponseCache] = None, client: Optional[BackendPool] = None):
     """
     Sends a message, optionally with images, to a local Ollama model and streams the response.
 
     Args:
         model (str): The name of the model to use (e.g., 'llava', 'gemma3').
         message (str): The prompt or message to send to the model.
-        images (Optional[List[bytes]]): A list of image data as bytes.
+        images (Optional[List[Union[bytes, str]]]): A list of image data as bytes or base64 strings.
         verbose (bool): If True, prints statistics at the end of the session.
+        metrics_path (Optional[str]): If set, appends the metrics of the stream to this file (.json, .csv or .prom).
+        options (Optional[dict]): Model options, e.g. temperature and seed.
+        cache (Optional[ResponseCache]): If set, a cached response is replayed instead of generated again.
+        client (Optional[BackendPool]): If set, the request is routed over its hosts instead of the default host.
     """
     try:
         # Prepare the message payload
@@ -27,20 +40,34 @@ def chat_with_ollama(model: str, message: str, images: Optional[List[bytes]] = N
             print(f"--- Asking '{model}': {message} ---\n")
 
         # Start the chat and get a streaming response
-        stream = ollama.chat(
-            model=model,
-            messages=payload,
-            stream=True,
-        )
+        def request():
+            return (client or ollama_client()).chat(
+                model=model,
+                messages=payload,
+                options=options,
+                stream=True,
+            )
+        if cache:
+            digest = pool_digest(model, [backend.host for backend in client.backends]) if client else model_digest(model)
+            stream = cache.stream(ResponseCache.key(digest, payload, options), request)
+        else:
+            stream = request()
 
         final_chunk = {}
+        metrics = StreamMetrics()
         # Print each chunk of the response as it arrives
         for chunk in stream:
+            if chunk['message']['content']:
+                metrics.chunk()
             print(chunk['message']['content'], end='', flush=True)
             final_chunk = chunk
         
         print("\n\n--- End of response ---")
 
+        record = metrics.finish(final_chunk)
+        if metrics_path:
+            write_metrics([{"model": model, **record}], metrics_path)
+
         if verbose and final_chunk.get('done'):
             print("\n--- Statistics ---")
             # Convert nanoseconds to seconds for readability
@@ -59,6 +86,9 @@ def chat_with_ollama(model: str, message: str, images: Optional[List[bytes]] = N
                 "Prompt Eval Duration": f"{prompt_eval_duration_s:.2f}s",
                 "Eval Count": final_chunk.get('eval_count'),
                 "Eval Duration": f"{eval_duration_s:.2f}s",
+                "Time To First Token": f"{record['ttft_seconds']:.2f}s" if 'ttft_seconds' in record else None,
+                "Inter-Token Latency p50/p99": f"{record['inter_token_p50_seconds'] * 1000:.1f}/{record['inter_token_p99_seconds'] * 1000:.1f}ms" if 'inter_token_p50_seconds' in record else None,
+                "Eval Rate": f"{record['eval_tokens_per_second']:.1f} tokens/s" if 'eval_tokens_per_second' in record else None,
             }
             for key, value in stats.items():
                 if value is not None:
@@ -92,15 +122,57 @@ def main():
 
   # Use an alias for the image flag and get verbose stats
   python ochat.py -m llava -f my_image.png -v "Describe this."
+
+  # Downscale large scans to the model's input resolution before sending them
+  python ochat.py -m gemma3 -i scan1.tif scan2.png --max-side auto "Compare these."
+
+  # Run a JSONL file of prompts, 8 at a time, with results as JSONL in input order
+  python ochat.py -m llama3 --batch prompts.jsonl --concurrency 8 > results.jsonl
+
+  # Chat interactively, keeping the history (and the server's KV cache) between turns
+  python ochat.py -m llama3 --chat -v
+
+  # Run a scripted conversation, one user message per line
+  python ochat.py -m llama3 --script questions.txt --metrics turns.csv
+
+  # Spread a batch over several Ollama hosts (also read from OLLAMA_HOSTS)
+  python ochat.py -m llama3 --batch prompts.jsonl --concurrency 16 --hosts gpu1:11434 gpu2:11434
+
+  # Re-run an evaluation with deterministic settings, replaying cached responses
+  python ochat.py -m llama3 --batch prompts.jsonl --seed 42 --temperature 0 --cache ochat-cache.sqlite
 """
     )
     parser.add_argument("message", nargs='*', help="The prompt to send to the model. Defaults to 'Tell me a funny joke.' if not provided.")
     parser.add_argument("-m", "--model", default='gemma3', help="The name of the model to use (e.g., 'llava', 'gemma3').")
     parser.add_argument("-i", "--image", nargs='+', help="Optional path(s) to one or more image files to include in the chat.")
     parser.add_argument("-f", "--file", nargs='+', help="Alias for --image.")
+    parser.add_argument("--max-side", metavar="PIXELS", help="Downscale larger images to fit PIXELS x PIXELS before sending (needs Pillow); 'auto' uses the model's vision input size.")
     parser.add_argument("-v", "--verbose", action='store_true', help="Print all statistics at the end of the session.")
+    parser.add_argument("-b", "--batch", metavar="FILE", help="Run the JSONL requests in FILE ('-' for stdin), see batch.py.")
+    parser.add_argument("-o", "--output", metavar="FILE", help="Write batch results to FILE instead of stdout.")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Batch requests streamed at the same time (default: 4).")
+    parser.add_argument("--keep-alive", default='10m', help="How long the server keeps the model loaded after a batch request or session turn (default: 10m).")
+    parser.add_argument("--temperature", type=float, help="Sampling temperature; 0 makes responses reproducible.")
+    parser.add_argument("--seed", type=int, help="Random seed; a fixed seed makes responses reproducible.")
+    parser.add_argument("--cache", metavar="FILE", help="Replay responses from, and store them in, the SQLite cache FILE (for deterministic settings).")
+    parser.add_argument("--cache-size", type=int, default=256, metavar="MB", help="Size of the response cache, least recently used responses are evicted (default: 256).")
+    parser.add_argument("--chat", action='store_true', help="Keep chatting: read follow-up messages interactively, with the history kept.")
+    parser.add_argument("--script", metavar="FILE", help="Run a multi-turn session with one user message per line of FILE ('-' for stdin).")
+    parser.add_argument("--system", help="System prompt of a --chat or --script session.")
+    parser.add_argument("--context-window", type=int, help="Context window in tokens of a session (default: num_ctx, else 4096); old turns are trimmed to fit.")
+    parser.add_argument("--summarize", action='store_true', help="Replace trimmed turns of a session with a model-written summary.")
+    parser.add_argument("--hosts", nargs='+', metavar="HOST", default=hosts_from_env() or None, help="Ollama hosts to route requests over, to the least-loaded host with the model loaded (default: $OLLAMA_HOSTS).")
+    parser.add_argument("--metrics", metavar="FILE", help="Append latency and throughput metrics to FILE: .csv, .prom (Prometheus textfile) or JSON lines.")
     args = parser.parse_args()
 
+    options = {key: value for key, value in (("temperature", args.temperature), ("seed", args.seed)) if value is not None} or None
+    cache = ResponseCache(args.cache, max_bytes=args.cache_size * 1024 * 1024) if args.cache else None
+    pool = BackendPool(args.hosts) if args.hosts else None
+
+    if args.batch:
+        summary = batch(args.batch, args.output, model=args.model, concurrency=args.concurrency, keep_alive=args.keep_alive, metrics_path=args.metrics, options=options, cache=cache, hosts=args.hosts)
+        sys.exit(1 if summary["errors"] else 0)
+
     # If a message is provided, join it. Otherwise, use the default joke.
     if args.message:
         message = " ".join(args.message)
@@ -113,21 +185,32 @@ def main():
     if args.file:
         image_paths.extend(args.file)
     
-    # Remove duplicates that might result from using both flags
-    if image_paths:
-        image_paths = list(set(image_paths))
-
     images_data = []
     if image_paths:
         for image_path in image_paths:
             if not os.path.exists(image_path):
                 print(f"Error: Image file not found at '{image_path}'", file=sys.stderr)
                 sys.exit(1)
-            with open(image_path, "rb") as f:
-                images_data.append(f.read())
+        max_side = model_image_size(args.model) if args.max_side == "auto" else int(args.max_side) if args.max_side else None
+        # Duplicates (both flags, symlinks, copies) are removed by content, see attachments.py
+        images_data = prepare_images(image_paths, max_side=max_side)
+
+    if args.chat or args.script:
+        session = ChatSession(args.model, system=args.system, options=options, keep_alive=args.keep_alive,
+                              context_window=args.context_window, summarize=args.summarize, client=pool.session() if pool else None)
+        turns = read_turns(args.script) if args.script else prompt_lines()
+        first_turn = [message] if args.message or images_data else []
+        try:
+            run_session(session, itertools.chain(first_turn, turns), interactive=args.chat and not args.script,
+                        verbose=args.verbose, metrics_path=args.metrics, images=images_data or None)
+        except Exception as e:
+            print(f"\nAn error occurred: {e}", file=sys.stderr)
+            print("\nPlease make sure the Ollama application is running and you have pulled the model.", file=sys.stderr)
+            sys.exit(1)
+        return
 
     # The question is defined, the images are read, and now we call the chat function.
-    chat_with_ollama(model=args.model, message=message, images=images_data if images_data else None, verbose=args.verbose)
+    chat_with_ollama(model=args.model, message=message, images=images_data if images_data else None, verbose=args.verbose, metrics_path=args.metrics, options=options, cache=cache, client=pool)
 
 if __name__ == "__main__":
     main()
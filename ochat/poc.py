@@ -4,7 +4,9 @@ Optionally pass file(s) to the model (e.g. images)."""
 import sys
 import argparse
 
-from ollama import chat, RequestError, ResponseError
+from ollama import RequestError, ResponseError
+
+from llm_client import ollama_client
 
 
 def main() -> int:
@@ -40,7 +42,7 @@ def main() -> int:
         }
         if args.files:
             chat_kwargs["files"] = args.files
-        for chunk in chat(**chat_kwargs):
+        for chunk in ollama_client().chat(**chat_kwargs):
             if chunk.message.content is not None:
                 print(chunk.message.content, end="", flush=True)
         print()
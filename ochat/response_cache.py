@@ -0,0 +1,143 @@
+"""
+A content-addressed cache of ochat responses, for re-running the same prompts during evaluation.
+
+A response is keyed by the model digest (so a re-pulled model misses; over several hosts,
+the digests on all of them, as any of them may answer), the options
+(temperature, seed, ...), the message texts and the hashes of the attached images.
+The streamed chunks are stored zlib-compressed in one SQLite file, least recently used
+entries are evicted above a size budget, and a hit is replayed as a stream of the same
+ChatResponse chunks, so callers cannot tell a hit from a live response.
+
+Only deterministic settings (a fixed seed, or temperature 0) give reproducible answers,
+so the cache is opt-in.
+"""
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from functools import lru_cache
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Mapping, Optional, Sequence
+
+import ollama
+
+from llm_client import ClientConfig, ollama_client
+
+@lru_cache(maxsize=None)
+def model_digest(model: str, host: Optional[str] = None) -> str:
+    """The digest of the local model, or its name if the server does not list it."""
+    names = {model, model if ":" in model else f"{model}:latest"}
+    try:
+        for listed in ollama_client(ClientConfig(host=host or "")).list().models:
+            if listed.model in names and listed.digest:
+                return listed.digest
+    except Exception as e:
+        print(f"Warning: could not read the digest of '{model}', caching by name: {e}", file=sys.stderr)
+    return model
+
+def pool_digest(model: str, hosts: Sequence[str]) -> str:
+    """The digests of the model on all `hosts`: a pool may route the request to any of them."""
+    return "+".join(sorted({model_digest(model, host) for host in hosts}))
+
+def _image_hash(image: Any) -> str:
+    data = image.encode("ascii") if isinstance(image, str) else bytes(image)
+    return hashlib.sha256(data).hexdigest()
+
+def _to_dict(chunk: Any) -> Dict[str, Any]:
+    return chunk.model_dump(exclude_none=True) if hasattr(chunk, "model_dump") else dict(chunk)
+
+class ResponseCache:
+    """Stores streamed responses in a SQLite file at `path`, evicting least recently used ones above `max_bytes`."""
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, chunks BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    def close(self) -> None:
+        self._db.close()
+
+    @staticmethod
+    def key(digest: str, messages: Sequence[Mapping[str, Any]], options: Optional[Mapping[str, Any]] = None) -> str:
+        """Hashes what determines a response; images count by content hash."""
+        canonical_messages = [
+            {
+                "role": message.get("role"),
+                "content": message.get("content"),
+                "images": [_image_hash(image) for image in message.get("images") or []],
+            }
+            for message in messages
+        ]
+        canonical = json.dumps([digest, dict(options or {}), canonical_messages], sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    @property
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            row = self._db.execute("SELECT chunks FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, chunks: List[Dict[str, Any]]) -> None:
+        blob = zlib.compress(json.dumps(chunks, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, blob, len(blob), time.time()))
+                total = self._db.execute("SELECT SUM(size) FROM responses").fetchone()[0]
+                for old_key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                    total -= size
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def stream(self, key: str, chat: Callable[[], Iterator[Any]]) -> Iterator[Any]:
+        """Replays the cached response for `key`, or streams `chat()` and stores it once it is done."""
+        cached = self.get(key)
+        if cached is not None:
+            for chunk in cached:
+                yield ollama.ChatResponse.model_validate(chunk)
+            return
+        chunks: List[Dict[str, Any]] = []
+        for chunk in chat():
+            chunks.append(_to_dict(chunk))
+            yield chunk
+        if chunks and chunks[-1].get("done"):
+            self.put(key, chunks)
+
+    async def astream(self, key: str, chat: Callable[[], Awaitable[AsyncIterator[Any]]]) -> AsyncIterator[Any]:
+        """The async variant of `stream`, for `AsyncClient.chat`."""
+        cached = self.get(key)
+        if cached is not None:
+            for chunk in cached:
+                yield ollama.ChatResponse.model_validate(chunk)
+            return
+        chunks: List[Dict[str, Any]] = []
+        async for chunk in await chat():
+            chunks.append(_to_dict(chunk))
+            yield chunk
+        if chunks and chunks[-1].get("done"):
+            self.put(key, chunks)
@@ -0,0 +1,193 @@
+"""
+Multi-turn sessions for ochat, interactive or scripted, that keep the history in one process.
+
+Ollama keeps the evaluated prompt of a loaded model in its KV cache and only evaluates the
+tokens after the longest common prefix with the previous request. A session therefore only
+appends to its messages and keeps the model loaded (`keep_alive`), so each turn evaluates just
+the new user message: `prompt_eval_count` and `prompt_eval_duration` stay flat over the turns.
+
+When the history gets close to the context window, the oldest turns are dropped in one block,
+down to half of the window, optionally replaced by a model-written summary. Dropping a block at
+once, rather than one turn per request, keeps the prefix stable (and cached) between trims.
+"""
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import ollama
+
+from llm_client import ollama_client
+from metrics import StreamMetrics, write_metrics
+
+DEFAULT_CONTEXT_WINDOW = 4096 # Ollama's default num_ctx
+CHARS_PER_TOKEN = 4 # estimate for messages the server has not counted yet
+
+SUMMARY_PROMPT = "Summarize the conversation so far in a few sentences, keeping names, facts and decisions."
+
+class ChatSession:
+    """
+    The message history of one conversation with `model`, and the tokens each message takes in the context.
+    `send` streams a reply; `trim_threshold` is the share of the context window that triggers a trim.
+    """
+    def __init__(
+        self,
+        model: str,
+        system: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+        keep_alive: Optional[str] = '30m',
+        context_window: Optional[int] = None,
+        trim_threshold: float = 0.8,
+        summarize: bool = False,
+        client: Optional[ollama.Client] = None,
+    ):
+        self.model = model
+        self.options = options
+        self.keep_alive = keep_alive
+        self.context_window = context_window or (options or {}).get("num_ctx") or DEFAULT_CONTEXT_WINDOW
+        self.trim_threshold = trim_threshold
+        self.summarize = summarize
+        self.client = client or ollama_client()
+        self.messages: List[Dict[str, Any]] = []
+        self.tokens: List[int] = [] # per message, as counted by the server (or estimated)
+        self.turns = 0
+        self._prefix_cached = False # whether the server still holds the messages sent last time
+        if system:
+            self._append({"role": "system", "content": system}, self._estimate(system))
+
+    @staticmethod
+    def _estimate(text: str) -> int:
+        return max(1, len(text) // CHARS_PER_TOKEN)
+
+    def _append(self, message: Dict[str, Any], tokens: int) -> None:
+        self.messages.append(message)
+        self.tokens.append(tokens)
+
+    @property
+    def context_tokens(self) -> int:
+        return sum(self.tokens)
+
+    def _first_turn(self) -> int:
+        """Index of the first message that may be dropped: everything after the system prompt."""
+        return 1 if self.messages and self.messages[0]["role"] == "system" else 0
+
+    def _summary(self, dropped: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        try:
+            response = self.client.chat(
+                model=self.model,
+                messages=[*dropped, {"role": "user", "content": SUMMARY_PROMPT}],
+                options=self.options,
+                keep_alive=self.keep_alive,
+            )
+        except Exception as e:
+            print(f"\nWarning: could not summarize the dropped turns: {e}", file=sys.stderr)
+            return None
+        return {"role": "system", "content": f"Summary of the earlier conversation: {response['message']['content']}"}
+
+    def trim(self, incoming_tokens: int = 0) -> int:
+        """
+        Drops the oldest turns (user message and reply) if the history plus the incoming message would exceed
+        the threshold, until it fits in half of the context window. Returns the number of dropped messages.
+        """
+        if self.context_tokens + incoming_tokens <= self.context_window * self.trim_threshold:
+            return 0
+        start = self._first_turn()
+        end = start
+        remaining = self.context_tokens + incoming_tokens
+        while end < len(self.messages) and remaining > self.context_window / 2:
+            remaining -= self.tokens[end]
+            end += 1
+        while end < len(self.messages) and self.messages[end]["role"] != "user": # cut between turns
+            end += 1
+        dropped = self.messages[start:end]
+        if not dropped:
+            return 0
+        summary = self._summary(dropped) if self.summarize else None
+        del self.messages[start:end]
+        del self.tokens[start:end]
+        if summary:
+            self.messages.insert(start, summary)
+            self.tokens.insert(start, self._estimate(summary["content"]))
+        self._prefix_cached = False
+        return len(dropped)
+
+    def send(self, message: str, images: Optional[List[Any]] = None, metrics: Optional[StreamMetrics] = None) -> Iterator[Any]:
+        """Streams the reply to `message` and adds both to the history once the reply is complete."""
+        user_message: Dict[str, Any] = {"role": "user", "content": message}
+        if images:
+            user_message["images"] = images
+        self.trim(self._estimate(message))
+        final_chunk: Any = {}
+        parts: List[str] = []
+        stream = self.client.chat(
+            model=self.model,
+            messages=[*self.messages, user_message],
+            options=self.options,
+            keep_alive=self.keep_alive,
+            stream=True,
+        )
+        for chunk in stream:
+            if metrics and chunk['message']['content']:
+                metrics.chunk()
+            parts.append(chunk['message']['content'])
+            final_chunk = chunk
+            yield chunk
+
+        # With the history cached, the server only evaluated the new message. Otherwise it re-evaluated
+        # an unknown part of the history too, so the message is estimated.
+        prompt_tokens = final_chunk.get('prompt_eval_count') if self._prefix_cached else None
+        prompt_tokens = prompt_tokens or self._estimate(message)
+        reply = "".join(parts)
+        self._append(user_message, prompt_tokens)
+        self._append({"role": "assistant", "content": reply}, final_chunk.get('eval_count') or self._estimate(reply))
+        self._prefix_cached = True
+        self.turns += 1
+
+def run_session(
+    session: ChatSession,
+    lines: Iterable[str],
+    interactive: bool = False,
+    verbose: bool = False,
+    metrics_path: Optional[str] = None,
+    images: Optional[List[Any]] = None,
+) -> None:
+    """Sends each line as a user turn and prints the streamed replies; blank lines are skipped. `images` go with the first turn."""
+    if interactive:
+        print(f"--- Chatting with '{session.model}', end with Ctrl-D ---")
+    records: List[Dict[str, Any]] = []
+    for line in lines:
+        message = line.strip()
+        if not message:
+            continue
+        if not interactive:
+            print(f"[user] {message}")
+        print("[assistant] ", end="", flush=True)
+        metrics = StreamMetrics()
+        final_chunk: Any = {}
+        for chunk in session.send(message, images=images, metrics=metrics):
+            print(chunk['message']['content'], end='', flush=True)
+            final_chunk = chunk
+        print("\n")
+        images = None
+        record = {"id": session.turns, "model": session.model, **metrics.finish(final_chunk), "context_tokens": session.context_tokens}
+        records.append(record)
+        if verbose:
+            print(f"--- Turn {session.turns}: prompt eval {record.get('prompt_eval_count')} tokens in {record.get('prompt_eval_seconds', 0):.2f}s, "
+                  f"context {session.context_tokens}/{session.context_window} tokens ---\n")
+    if metrics_path and records:
+        write_metrics(records, metrics_path)
+
+def read_turns(path: str) -> Iterator[str]:
+    """Reads a script of user turns, one per line ('-' for stdin)."""
+    if path == "-":
+        yield from sys.stdin
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        yield from f
+
+def prompt_lines() -> Iterator[str]:
+    """Reads user turns interactively until EOF or Ctrl-C."""
+    while True:
+        try:
+            yield input("[user] ")
+        except (EOFError, KeyboardInterrupt):
+            print()
+            return
@@ -0,0 +1,54 @@
+import base64
+import io
+import os
+import tempfile
+import unittest
+
+from PIL import Image
+
+from attachments import content_hash, downscale, encode_base64, encode_file, prepare_images
+
+class TestAttachments(unittest.TestCase):
+    """Tests the image attachment pipeline of ochat."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_chunked_base64_matches_one_shot(self):
+        data = os.urandom(10_000)
+        for chunk_size in (3, 999, 3 * 1024):
+            self.assertEqual(encode_base64(data, chunk_size), base64.b64encode(data).decode())
+        self.assertEqual(encode_file(self.write('data.bin', data)), base64.b64encode(data).decode())
+        self.assertEqual(encode_file(self.write('empty.bin', b'')), '')
+
+    def test_duplicates_are_detected_by_content(self):
+        first = self.write('a.png', b'same')
+        copy = self.write('b.png', b'same')
+        other = self.write('c.png', b'other')
+
+        self.assertEqual(content_hash(first), content_hash(copy))
+        self.assertEqual(prepare_images([first, other, copy, first]), [base64.b64encode(b'same').decode(), base64.b64encode(b'other').decode()])
+
+    def test_large_images_are_downscaled(self):
+        output = io.BytesIO()
+        Image.new('RGB', (2000, 1000), 'red').save(output, format='PNG')
+        path = self.write('scan.png', output.getvalue())
+
+        scaled = downscale(path, 500)
+        with Image.open(io.BytesIO(scaled)) as image:
+            self.assertEqual(image.size, (500, 250))
+            self.assertEqual(image.format, 'PNG')
+        self.assertIsNone(downscale(path, 2000))
+        self.assertEqual(prepare_images([path], max_side=500), [base64.b64encode(scaled).decode()])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,200 @@
+import asyncio
+import io
+import json
+import socket
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend_pool import BackendPool, NoBackendError
+from batch import run_batch
+from llm_client import ClientConfig, openai_client
+
+class FakeOllama(ThreadingHTTPServer):
+    """
+    A local Ollama host with `loaded` models that answers one chat at a time in `delay` seconds, like a busy GPU.
+    With `status`, chats fail with that HTTP status.
+    """
+    def __init__(self, loaded=(), delay=0.0, status=200):
+        super().__init__(("127.0.0.1", 0), FakeOllamaHandler)
+        self.loaded = list(loaded)
+        self.delay = delay
+        self.status = status
+        self.chats = 0
+        self.busy = threading.Lock()
+        threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    @property
+    def host(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/api/ps":
+            self._send(200, json.dumps({"models": [{"name": model, "model": model} for model in self.server.loaded]}))
+        else:
+            self._send(404, "{}")
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.server.status != 200:
+            self._send(self.server.status, json.dumps({"error": "model not found" if self.server.status == 404 else "boom"}))
+            return
+        with self.server.busy:
+            time.sleep(self.server.delay)
+            self.server.chats += 1
+        if self.path == "/v1/chat/completions":
+            self._send(200, json.dumps({
+                "id": "1", "object": "chat.completion", "created": 0, "model": request["model"],
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": str(self.server.server_port)}}],
+            }))
+            return
+        content = str(self.server.server_port) # tells the test which host answered
+        if request.get("stream"):
+            lines = [
+                {"model": request["model"], "message": {"role": "assistant", "content": content}, "done": False},
+                {"model": request["model"], "message": {"role": "assistant", "content": ""}, "done": True, "eval_count": 1},
+            ]
+            self._send(200, "".join(json.dumps(line) + "\n" for line in lines), "application/x-ndjson")
+        else:
+            self._send(200, json.dumps({"model": request["model"], "message": {"role": "assistant", "content": content}, "done": True}))
+
+def unused_host() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+def port(host: str) -> str:
+    return host.rsplit(":", 1)[1]
+
+class TestBackendPool(unittest.TestCase):
+    """Tests routing, failover and scaling of the backend pool against local fake Ollama hosts."""
+
+    def setUp(self):
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+
+    def start(self, **kwargs) -> FakeOllama:
+        server = FakeOllama(**kwargs)
+        self.servers.append(server)
+        return server
+
+    def ask(self, pool, model="gemma3") -> str:
+        return pool.chat(model=model, messages=[{"role": "user", "content": "hi"}])["message"]["content"]
+
+    def test_prefers_the_host_with_the_model_loaded(self):
+        cold = self.start(loaded=["llama3:latest"])
+        warm = self.start(loaded=["gemma3:latest"])
+        pool = BackendPool([cold.host, warm.host])
+        self.assertEqual({self.ask(pool) for _ in range(4)}, {port(warm.host)})
+        self.assertEqual(self.ask(pool, "llama3"), port(cold.host))
+        self.assertEqual(pool.base_url("gemma3"), f"{warm.host}/v1")
+
+    def test_a_session_stays_on_one_host(self):
+        first = self.start(loaded=["gemma3:latest"])
+        second = self.start(loaded=["gemma3:latest"])
+        pool = BackendPool([first.host, second.host])
+        self.assertEqual(len({self.ask(pool) for _ in range(4)}), 2) # single requests rotate over equal hosts
+        session = pool.session()
+        answers = [self.ask(session) for _ in range(4)]
+        self.assertEqual(len(set(answers)), 1, answers)
+        stuck = first if answers[0] == port(first.host) else second
+        stuck.status = 500 # fails over, then stays on the other host
+        self.assertEqual({self.ask(session) for _ in range(3)}, {port((second if stuck is first else first).host)})
+
+    def test_spills_to_other_hosts_when_the_loaded_host_is_busy(self):
+        warm = self.start(loaded=["gemma3:latest"], delay=0.2)
+        cold = self.start(delay=0.2)
+        pool = BackendPool([warm.host, cold.host], parallel=1)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            answers = set(executor.map(lambda _: self.ask(pool), range(2)))
+        self.assertEqual(answers, {port(warm.host), port(cold.host)})
+        self.assertIn("gemma3:latest", pool.backends[1].loaded) # loaded by the spilled request
+
+    def test_fails_over_on_host_errors(self):
+        broken = self.start(loaded=["gemma3:latest"], status=500)
+        healthy = self.start()
+        down = unused_host()
+        pool = BackendPool([down, broken.host, healthy.host])
+        self.assertEqual(self.ask(pool), port(healthy.host))
+        chunks = list(pool.chat(model="gemma3", messages=[{"role": "user", "content": "hi"}], stream=True))
+        self.assertEqual(chunks[0]["message"]["content"], port(healthy.host))
+        stats = {stat["host"]: stat for stat in pool.stats()}
+        self.assertTrue(stats[down]["down"])
+        self.assertTrue(stats[broken.host]["down"])
+        self.assertEqual(stats[broken.host]["errors"], 1) # then skipped during the cooldown
+        self.assertFalse(stats[healthy.host]["down"])
+        self.assertEqual(stats[healthy.host]["in_flight"], 0)
+
+    def test_missing_model_tries_the_next_host_without_marking_it_down(self):
+        missing = self.start(status=404)
+        other = self.start()
+        pool = BackendPool([missing.host, other.host])
+        self.assertEqual(self.ask(pool), port(other.host))
+        self.assertFalse(pool.stats()[0]["down"])
+
+    def test_raises_when_no_host_can_serve(self):
+        pool = BackendPool([unused_host(), unused_host()], cooldown=60)
+        with self.assertRaises(NoBackendError):
+            self.ask(pool)
+
+    def test_routes_openai_compatible_calls(self):
+        broken = self.start(loaded=["llama3.2:latest"], status=503)
+        healthy = self.start()
+        pool = BackendPool([broken.host, healthy.host], config=ClientConfig(retries=0))
+        response = pool.call("llama3.2", lambda backend: openai_client(backend.config).chat.completions.create(
+            model="llama3.2", messages=[{"role": "user", "content": "hi"}]))
+        self.assertEqual(response.choices[0].message.content, port(healthy.host))
+
+    def test_throughput_scales_with_hosts(self):
+        def run(count: int) -> float:
+            servers = [self.start(loaded=["gemma3:latest"], delay=0.2) for _ in range(count)]
+            pool = BackendPool([server.host for server in servers], parallel=1)
+            pool.refresh()
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=6) as executor:
+                list(executor.map(lambda _: self.ask(pool), range(6)))
+            elapsed = time.perf_counter() - started
+            self.assertEqual([server.chats for server in servers], [6 // count] * count)
+            return elapsed
+
+        one, three = run(1), run(3)
+        self.assertGreater(one / three, 2) # 1.2s against 0.4s
+
+    def test_batch_over_hosts(self):
+        servers = [self.start(loaded=["gemma3:latest"], delay=0.05) for _ in range(2)]
+        servers.append(self.start(loaded=["gemma3:latest"], status=500))
+        output = io.StringIO()
+        summary = asyncio.run(run_batch(
+            [{"id": i, "message": "hi"} for i in range(6)], output, concurrency=6, keep_alive=None,
+            hosts=[server.host for server in servers],
+        ))
+        self.assertEqual(summary["errors"], 0)
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual({result["response"] for result in results}, {port(servers[0].host), port(servers[1].host)})
+        self.assertGreater(sum(summary["hosts"].values()), 6) # some failed over from the broken host
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import asyncio
+import io
+import json
+import time
+import unittest
+from unittest.mock import patch
+
+from batch import read_requests, run_batch
+
+class FakeAsyncClient:
+    """Streams the message back in two chunks; prompts starting with 'slow' take longer."""
+    calls = []
+
+    def __init__(self, host=None, **kwargs):
+        pass
+
+    async def chat(self, model, messages, options=None, keep_alive=None, stream=False):
+        FakeAsyncClient.calls.append({"model": model, "keep_alive": keep_alive, "options": options})
+        content = messages[0]['content']
+        if content == "fail":
+            raise ConnectionError("model not found")
+        async def chunks():
+            await asyncio.sleep(0.3 if content.startswith("slow") else 0.05)
+            yield {'message': {'content': content.upper()}}
+            yield {'message': {'content': '!'}, 'done': True, 'eval_count': 2, 'eval_duration': 500_000_000}
+        return chunks()
+
+class TestBatch(unittest.TestCase):
+    """Tests the ochat batch mode against a fake Ollama client."""
+
+    def setUp(self):
+        FakeAsyncClient.calls = []
+
+    def test_read_requests(self):
+        requests = read_requests(['{"id": "a", "message": "hi"}', '', '"plain"'])
+        self.assertEqual(requests, [{"id": "a", "message": "hi"}, {"message": "plain"}])
+        with self.assertRaises(ValueError):
+            read_requests(['{"prompt": "hi"}'])
+
+    @patch('ollama.AsyncClient', FakeAsyncClient)
+    def test_results_are_written_in_input_order_with_stats(self):
+        requests = [{"id": "first", "message": "slow one"}, {"message": "two", "model": "llava"}, {"message": "fail"}, {"message": "slow four"}]
+        output = io.StringIO()
+
+        started = time.perf_counter()
+        summary = asyncio.run(run_batch(requests, output, model='gemma3', concurrency=4, keep_alive='5m'))
+        elapsed = time.perf_counter() - started
+
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([line["id"] for line in lines], ["first", 1, 2, 3])
+        self.assertEqual(lines[0]["response"], "SLOW ONE!")
+        self.assertEqual(lines[0]["stats"]["eval_count"], 2)
+        self.assertEqual(lines[0]["stats"]["eval_tokens_per_second"], 4)
+        self.assertIn("ttft_seconds", lines[0]["stats"])
+        self.assertEqual(lines[1]["model"], "llava")
+        self.assertEqual(lines[2]["error"], "model not found")
+        self.assertEqual(summary["errors"], 1)
+        self.assertLess(elapsed, 0.5) # the two slow prompts overlap
+        self.assertEqual({call["keep_alive"] for call in FakeAsyncClient.calls}, {'5m'})
+
+    @patch('ollama.AsyncClient', FakeAsyncClient)
+    def test_concurrency_is_limited(self):
+        requests = [{"message": f"slow {i}"} for i in range(4)]
+
+        started = time.perf_counter()
+        asyncio.run(run_batch(requests, io.StringIO(), concurrency=2))
+        elapsed = time.perf_counter() - started
+
+        self.assertGreater(elapsed, 0.55) # two rounds of 0.3s
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from llm_client import ClientConfig, async_ollama_client, async_openai_client, ollama_client, openai_client
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Answers /api/chat and /v1/chat/completions, and counts the TCP connections it accepts."""
+    protocol_version = "HTTP/1.1" # keep-alive
+    connections = set()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        FakeOllamaHandler.connections.add(self.client_address)
+        json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path == "/api/chat":
+            body = {"model": "gemma3", "message": {"role": "assistant", "content": "hi"}, "done": True}
+        else:
+            body = {
+                "id": "1", "object": "chat.completion", "created": 0, "model": "gemma3",
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "hi"}}],
+            }
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class TestLlmClient(unittest.TestCase):
+    """Tests the shared, pooled clients against a local fake Ollama server."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllamaHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.config = ClientConfig(host=f"127.0.0.1:{cls.server.server_port}", retries=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        FakeOllamaHandler.connections = set()
+
+    def test_config(self):
+        self.assertEqual(ClientConfig(host="example:1234/").base_url, "http://example:1234")
+        with patch.dict("os.environ", {"OLLAMA_HOST": "https://remote:443"}):
+            self.assertEqual(ClientConfig().base_url, "https://remote:443")
+        self.assertEqual(ClientConfig(read_timeout=7).timeout.read, 7)
+
+    def test_clients_are_shared_per_config(self):
+        self.assertIs(ollama_client(self.config), ollama_client(ClientConfig(host=self.config.host, retries=0)))
+        self.assertIsNot(ollama_client(self.config), ollama_client(ClientConfig(host=self.config.host, retries=1)))
+        self.assertIs(openai_client(self.config), openai_client(self.config))
+
+    def test_ollama_client_reuses_connections(self):
+        for _ in range(5):
+            response = ollama_client(self.config).chat(model="gemma3", messages=[{"role": "user", "content": "hello"}])
+            self.assertEqual(response["message"]["content"], "hi")
+        self.assertEqual(len(FakeOllamaHandler.connections), 1)
+
+    def test_openai_client_reuses_connections(self):
+        for _ in range(5):
+            response = openai_client(self.config).chat.completions.create(model="gemma3", messages=[{"role": "user", "content": "hello"}])
+            self.assertEqual(response.choices[0].message.content, "hi")
+        self.assertEqual(len(FakeOllamaHandler.connections), 1)
+
+    def test_async_clients_are_shared_per_event_loop(self):
+        async def run():
+            client = async_ollama_client(self.config)
+            self.assertIs(client, async_ollama_client(self.config))
+            self.assertIs(async_openai_client(self.config), async_openai_client(self.config))
+            responses = await asyncio.gather(*(
+                client.chat(model="gemma3", messages=[{"role": "user", "content": "hello"}]) for _ in range(4)
+            ))
+            for _ in range(4): # sequential requests reuse the pooled connections
+                await client.chat(model="gemma3", messages=[{"role": "user", "content": "hello"}])
+            return client, responses
+
+        first, responses = asyncio.run(run())
+        self.assertEqual([response["message"]["content"] for response in responses], ["hi"] * 4)
+        self.assertLessEqual(len(FakeOllamaHandler.connections), 4)
+        second, _ = asyncio.run(run())
+        self.assertIsNot(first, second)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from metrics import StreamMetrics, percentile, prometheus_text, write_metrics
+
+FINAL_CHUNK = {
+    'done': True, 'load_duration': 2_000_000_000, 'total_duration': 5_000_000_000,
+    'prompt_eval_count': 40, 'prompt_eval_duration': 100_000_000, 'eval_count': 30, 'eval_duration': 1_500_000_000,
+}
+
+class TestMetrics(unittest.TestCase):
+    """Tests the stream metrics of ochat and their sinks."""
+
+    def test_percentile(self):
+        self.assertEqual(percentile([5, 1, 4, 2, 3], 50), 3)
+        self.assertEqual(percentile([5, 1, 4, 2, 3], 99), 5)
+        self.assertIsNone(percentile([], 50))
+
+    def test_stream_metrics_record(self):
+        metrics = StreamMetrics()
+        metrics.started = 10.0
+        metrics.chunk_times = [10.5, 10.6, 10.8]
+
+        record = metrics.finish(FINAL_CHUNK)
+
+        self.assertAlmostEqual(record["ttft_seconds"], 0.5)
+        self.assertAlmostEqual(record["inter_token_p50_seconds"], 0.1)
+        self.assertAlmostEqual(record["inter_token_p99_seconds"], 0.2)
+        self.assertEqual(record["prompt_eval_tokens_per_second"], 400)
+        self.assertEqual(record["eval_tokens_per_second"], 20)
+        self.assertEqual(record["load_seconds"], 2)
+        self.assertNotIn("error", record)
+
+    def test_sinks(self):
+        metrics = StreamMetrics()
+        metrics.chunk()
+        records = [{"id": 1, "model": "gemma3", **metrics.finish(FINAL_CHUNK)}, {"id": 2, "model": "gemma3", "error": "boom", "wall_seconds": 0.1}]
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ("metrics.jsonl", "metrics.csv"):
+                path = os.path.join(directory, name)
+                write_metrics(records, path)
+                write_metrics(records, path) # appends
+            with open(os.path.join(directory, "metrics.jsonl")) as f:
+                self.assertEqual([json.loads(line)["id"] for line in f], [1, 2, 1, 2])
+            with open(os.path.join(directory, "metrics.csv")) as f:
+                rows = list(csv.DictReader(f))
+            self.assertEqual([row["eval_tokens_per_second"] for row in rows], ["20.0", "", "20.0", ""])
+
+            path = os.path.join(directory, "ochat.prom")
+            write_metrics(records, path)
+            with open(path) as f:
+                text = f.read()
+        self.assertIn('ochat_requests{model="gemma3"} 2', text)
+        self.assertIn('ochat_errors{model="gemma3"} 1', text)
+        self.assertIn('ochat_eval_tokens_per_second{model="gemma3",quantile="0.5"} 20', text)
+        self.assertIn('ochat_load_seconds{model="gemma3"} 2', text)
+        self.assertEqual(text, prometheus_text(records))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,5 @@
+import base64
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock
 import io
@@ -8,7 +10,7 @@ from ochat import chat_with_ollama, main
 class TestOllamaChat(unittest.TestCase):
     """Unit tests for ochat.py."""
 
-    @patch('ollama.chat')
+    @patch('ollama.Client.chat')
     @patch('sys.stdout', new_callable=io.StringIO)
     def test_chat_with_ollama_text_only(self, mock_stdout, mock_ollama_chat):
         """
@@ -24,7 +26,7 @@ class TestOllamaChat(unittest.TestCase):
         self.assertIn('Hello, this is a test response.', output)
         self.assertIn('--- End of response ---', output)
 
-    @patch('ollama.chat')
+    @patch('ollama.Client.chat')
     @patch('sys.stdout', new_callable=io.StringIO)
     def test_chat_with_ollama_with_single_image(self, mock_stdout, mock_ollama_chat):
         """
@@ -46,7 +48,7 @@ class TestOllamaChat(unittest.TestCase):
         _, called_kwargs = mock_ollama_chat.call_args
         self.assertEqual(called_kwargs['messages'][0]['images'], dummy_image_data)
 
-    @patch('ollama.chat')
+    @patch('ollama.Client.chat')
     @patch('sys.stdout', new_callable=io.StringIO)
     def test_chat_with_ollama_with_multiple_images(self, mock_stdout, mock_ollama_chat):
         """
@@ -78,7 +80,12 @@ class TestOllamaChat(unittest.TestCase):
         mock_chat_func.assert_called_with(
             model='gemma3', 
             message='Hello from command line', 
-            images=None
+            images=None,
+            verbose=False,
+            metrics_path=None,
+            options=None,
+            cache=None,
+            client=None
         )
 
     @patch('sys.argv', ['ochat.py', 'Custom', 'message', '--model', 'test_model'])
@@ -91,7 +98,12 @@ class TestOllamaChat(unittest.TestCase):
         mock_chat_func.assert_called_with(
             model='test_model', 
             message='Custom message', 
-            images=None
+            images=None,
+            verbose=False,
+            metrics_path=None,
+            options=None,
+            cache=None,
+            client=None
         )
 
     @patch('ochat.chat_with_ollama')
@@ -99,46 +111,54 @@ class TestOllamaChat(unittest.TestCase):
         """
         Tests that the main function correctly handles a single image argument.
         """
-        with patch('sys.argv', ['ochat.py', 'What', 'is', 'this?', '--image', 'dummy_image.png']), \
-             patch('os.path.exists', return_value=True), \
-             patch('builtins.open', unittest.mock.mock_open(read_data=b'dummy_image_bytes')):
-            main()
+        with tempfile.TemporaryDirectory() as directory:
+            image_path = os.path.join(directory, 'dummy_image.png')
+            with open(image_path, 'wb') as f:
+                f.write(b'dummy_image_bytes')
+            with patch('sys.argv', ['ochat.py', 'What', 'is', 'this?', '--image', image_path]):
+                main()
         
         mock_chat_func.assert_called_with(
             model='gemma3', 
             message='What is this?', 
-            images=[b'dummy_image_bytes']
+            images=[base64.b64encode(b'dummy_image_bytes').decode()],
+            verbose=False,
+            metrics_path=None,
+            options=None,
+            cache=None,
+            client=None
         )
 
     @patch('ochat.chat_with_ollama')
     def test_main_with_multiple_images_arg(self, mock_chat_func):
         """
-        Tests that the main function correctly handles multiple image arguments.
-        """
-        image_paths = ['dummy1.png', 'dummy2.jpg']
-        image_contents = {
-            'dummy1.png': b'dummy_image_bytes_1',
-            'dummy2.jpg': b'dummy_image_bytes_2'
-        }
-        
-        def mock_open_side_effect(path, mode):
-            # Use os.path.basename because the full path might be constructed differently
-            content = image_contents.get(os.path.basename(path))
-            if content is None:
-                raise FileNotFoundError(f"Mock file not found: {path}")
-            return unittest.mock.mock_open(read_data=content)()
-
-        sys_argv_mock = ['ochat.py', 'What', 'are', 'these?', '--image'] + image_paths
-
-        with patch('sys.argv', sys_argv_mock), \
-             patch('os.path.exists', return_value=True), \
-             patch('builtins.open', side_effect=mock_open_side_effect):
-            main()
+        Tests that the main function correctly handles multiple image arguments,
+        sending each distinct content once and in the given order.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            image_contents = {
+                'dummy1.png': b'dummy_image_bytes_1',
+                'dummy2.jpg': b'dummy_image_bytes_2',
+                'copy_of_dummy1.png': b'dummy_image_bytes_1',
+            }
+            for name, content in image_contents.items():
+                with open(os.path.join(directory, name), 'wb') as f:
+                    f.write(content)
+            os.symlink(os.path.join(directory, 'dummy2.jpg'), os.path.join(directory, 'link.jpg'))
+            image_paths = [os.path.join(directory, name) for name in ('dummy1.png', 'dummy2.jpg', 'copy_of_dummy1.png', 'link.jpg')]
+
+            with patch('sys.argv', ['ochat.py', 'What', 'are', 'these?', '--image'] + image_paths):
+                main()
         
         mock_chat_func.assert_called_with(
             model='gemma3', 
             message='What are these?', 
-            images=[b'dummy_image_bytes_1', b'dummy_image_bytes_2']
+            images=[base64.b64encode(b'dummy_image_bytes_1').decode(), base64.b64encode(b'dummy_image_bytes_2').decode()],
+            verbose=False,
+            metrics_path=None,
+            options=None,
+            cache=None,
+            client=None
         )
 
     @patch('sys.argv', ['ochat.py'])
@@ -151,7 +171,12 @@ class TestOllamaChat(unittest.TestCase):
         mock_chat_func.assert_called_with(
             model='gemma3', 
             message='Tell me a funny joke.', 
-            images=None
+            images=None,
+            verbose=False,
+            metrics_path=None,
+            options=None,
+            cache=None,
+            client=None
         )
 
 if __name__ == '__main__':
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import ollama
+
+import response_cache
+from response_cache import ResponseCache, pool_digest
+
+def chunks(text: str, done: bool = True):
+    words = text.split()
+    return [ollama.ChatResponse(model='gemma3', message=ollama.Message(role='assistant', content=word + ' ')) for word in words] + \
+        ([ollama.ChatResponse(model='gemma3', message=ollama.Message(role='assistant', content=''), done=True, eval_count=len(words))] if done else [])
+
+class TestResponseCache(unittest.TestCase):
+    """Tests the content-addressed response cache of ochat."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(os.path.join(self.directory.name, 'cache.sqlite'))
+        self.messages = [{'role': 'user', 'content': 'Describe this.', 'images': ['aGVsbG8=']}]
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_key_covers_digest_options_text_and_images(self):
+        key = ResponseCache.key('sha256:a', self.messages, {'seed': 1, 'temperature': 0})
+
+        self.assertEqual(key, ResponseCache.key('sha256:a', self.messages, {'temperature': 0, 'seed': 1}))
+        self.assertNotEqual(key, ResponseCache.key('sha256:b', self.messages, {'seed': 1, 'temperature': 0}))
+        self.assertNotEqual(key, ResponseCache.key('sha256:a', self.messages, {'seed': 2, 'temperature': 0}))
+        self.assertNotEqual(key, ResponseCache.key('sha256:a', [{**self.messages[0], 'images': ['d29ybGQ=']}], {'seed': 1, 'temperature': 0}))
+        self.assertNotEqual(key, ResponseCache.key('sha256:a', [{**self.messages[0], 'content': 'Describe that.'}], {'seed': 1, 'temperature': 0}))
+
+    def test_pool_digest_covers_every_host(self):
+        digests = {'http://a': 'sha256:a', 'http://b': 'sha256:b', 'http://c': 'sha256:a'}
+        with mock.patch.object(response_cache, 'model_digest', lambda model, host=None: digests[host]):
+            self.assertEqual(pool_digest('gemma3', ['http://b', 'http://a', 'http://c']), 'sha256:a+sha256:b')
+            self.assertEqual(pool_digest('gemma3', ['http://a', 'http://c']), 'sha256:a')
+
+    def test_hit_replays_the_same_stream(self):
+        calls = []
+        def chat():
+            calls.append(1)
+            return iter(chunks('a red square'))
+
+        live = list(self.cache.stream('k', chat))
+        replayed = list(self.cache.stream('k', chat))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([chunk['message']['content'] for chunk in replayed], ['a ', 'red ', 'square ', ''])
+        self.assertEqual(replayed, live)
+        self.assertEqual(replayed[-1].get('eval_count'), 3)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_incomplete_stream_is_not_stored(self):
+        list(self.cache.stream('k', lambda: iter(chunks('cut short', done=False))))
+
+        self.assertIsNone(self.cache.get('k'))
+
+    def test_least_recently_used_responses_are_evicted_over_budget(self):
+        for key in ('a', 'b'):
+            self.cache.put(key, [c.model_dump(exclude_none=True) for c in chunks(key * 1000)])
+        size = self.cache.size_bytes
+        self.cache.max_bytes = size
+        self.cache.get('a') # b is now least recently used
+        self.cache.put('c', [c.model_dump(exclude_none=True) for c in chunks('c' * 1000)])
+
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertLessEqual(self.cache.size_bytes, size)
+
+    def test_async_stream(self):
+        async def chat():
+            async def stream():
+                for chunk in chunks('async answer'):
+                    yield chunk
+            return stream()
+
+        async def collect():
+            return [chunk['message']['content'] async for chunk in self.cache.astream('k', chat)]
+
+        self.assertEqual(asyncio.run(collect()), ['async ', 'answer ', ''])
+        self.assertEqual(asyncio.run(collect()), ['async ', 'answer ', ''])
+        self.assertEqual(self.cache.hits, 1)
+
+if __name__ == '__main__':
+    unittest.main()
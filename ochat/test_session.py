@@ -0,0 +1,71 @@
+import unittest
+
+import ollama
+
+from session import ChatSession
+
+def tokens(message) -> int:
+    return max(1, len(message['content']) // 4)
+
+class FakeClient:
+    """Evaluates only the messages after the common prefix with the previous request, like Ollama's KV cache."""
+    def __init__(self, reply: str = 'x' * 40):
+        self.reply = reply
+        self.previous = []
+        self.requests = []
+
+    def chat(self, model, messages, options=None, keep_alive=None, stream=False):
+        self.requests.append(messages)
+        if not stream:
+            return ollama.ChatResponse(model=model, message=ollama.Message(role='assistant', content='They talked.'), done=True)
+        prefix = 0
+        while prefix < min(len(messages), len(self.previous)) and messages[prefix] == self.previous[prefix]:
+            prefix += 1
+        self.previous = [*messages, {'role': 'assistant', 'content': self.reply}]
+        prompt_eval_count = sum(tokens(message) for message in messages[prefix:])
+        return iter([
+            ollama.ChatResponse(model=model, message=ollama.Message(role='assistant', content=self.reply)),
+            ollama.ChatResponse(model=model, message=ollama.Message(role='assistant', content=''), done=True,
+                                prompt_eval_count=prompt_eval_count, eval_count=tokens({'content': self.reply})),
+        ])
+
+def ask(session: ChatSession, message: str) -> ollama.ChatResponse:
+    return list(session.send(message))[-1]
+
+class TestChatSession(unittest.TestCase):
+    """Tests the multi-turn ochat session against a fake client with a prefix cache."""
+
+    def test_history_is_kept_and_only_new_tokens_are_evaluated(self):
+        client = FakeClient()
+        session = ChatSession('gemma3', system='Be brief.', client=client, context_window=100_000)
+
+        counts = [ask(session, f'Question number {turn} ' + 'y' * 40).get('prompt_eval_count') for turn in range(5)]
+
+        self.assertEqual(len(client.requests[-1]), 1 + 2 * 4 + 1) # system, 4 earlier turns, the new message
+        self.assertEqual(counts[1:], [counts[1]] * 4) # flat after the first turn
+        self.assertEqual(session.context_tokens, sum(tokens(message) for message in session.messages))
+
+    def test_old_turns_are_trimmed_in_one_block(self):
+        client = FakeClient()
+        session = ChatSession('gemma3', system='Be brief.', client=client, context_window=200)
+
+        for turn in range(8):
+            ask(session, f'Question {turn} ' + 'y' * 60)
+
+        self.assertLessEqual(session.context_tokens, 200 * 0.8)
+        self.assertEqual(session.messages[0]['role'], 'system')
+        self.assertEqual(session.messages[1]['role'], 'user')
+        self.assertIn('Question 7', session.messages[-2]['content'])
+        self.assertEqual(session.context_tokens, sum(tokens(message) for message in session.messages))
+
+    def test_trimmed_turns_can_be_summarized(self):
+        client = FakeClient()
+        session = ChatSession('gemma3', client=client, context_window=200, summarize=True)
+
+        for turn in range(8):
+            ask(session, f'Question {turn} ' + 'y' * 60)
+
+        self.assertEqual(session.messages[0], {'role': 'system', 'content': 'Summary of the earlier conversation: They talked.'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,8 @@ from langchain_openai import ChatOpenAI
 from langchain.agents import tool, AgentExecutor, create_tool_calling_agent
 from langchain_core.prompts import ChatPromptTemplate
 
+from ollama_hosts import HostPicker
+
 # 1. Define Tools
 @tool
 def add(a: int, b: int) -> int:
@@ -17,23 +19,23 @@ prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
-# Use ChatOpenAI and point it to the local Ollama endpoint
-llm = ChatOpenAI(
-    model="llama3.2",
-    base_url="http://localhost:11434/v1",
-    api_key="ollama",  # required, but unused
-    temperature=0,
-)
-
 tools = [add]
-agent = create_tool_calling_agent(llm, tools, prompt)
 
-# 3. Create the Agent Executor
-agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
-
-# 4. Run the Agent
+# 3. Create the Agent Executor and 4. Run the Agent
 def main():
     """Main function to run the LangChain agent."""
+    # Use ChatOpenAI and point it to the Ollama host with the model loaded
+    # ($OLLAMA_HOSTS, default localhost); picking it probes the hosts, so it happens here, not on import.
+    # ChatOpenAI keeps one base_url
+    llm = ChatOpenAI(
+        model="llama3.2",
+        base_url=HostPicker().base_url("llama3.2"),
+        api_key="ollama",  # required, but unused
+        temperature=0,
+    )
+    agent = create_tool_calling_agent(llm, tools, prompt)
+    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
+
     print("Running LangChain agent with OpenAI-compatible endpoint...")
     try:
         response = agent_executor.invoke({"input": "What is 5 + 7?"})
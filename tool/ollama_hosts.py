@@ -0,0 +1,92 @@
+"""
+The client layer of the POCs: a pooled OpenAI client per Ollama host and the choice of host.
+
+A small, self-contained version of ../ochat/llm_client.py and ../ochat/backend_pool.py, so the
+scripts here run on their own. Hosts come from $OLLAMA_HOSTS (comma-separated), else $OLLAMA_HOST,
+else localhost. `HostPicker.hosts` lists the reachable hosts with the model loaded (`/api/ps`,
+probed at most every `refresh_seconds`) first; `HostPicker.call` runs a request on them in that
+order, going on to the next host on connection errors and 5xx statuses.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, TypeVar
+
+import httpx
+import openai
+
+DEFAULT_HOST = "http://localhost:11434"
+
+T = TypeVar("T")
+
+def base_url(host: str) -> str:
+    host = host.strip().rstrip("/")
+    return host if "://" in host else f"http://{host}"
+
+def hosts_from_env() -> List[str]:
+    hosts = [host for host in os.environ.get("OLLAMA_HOSTS", "").split(",") if host.strip()]
+    return [base_url(host) for host in hosts or [os.environ.get("OLLAMA_HOST") or DEFAULT_HOST]]
+
+def model_name(model: str) -> str:
+    """The model name with its tag, as `/api/ps` lists it."""
+    return model if ":" in model else f"{model}:latest"
+
+_lock = threading.Lock()
+_clients: Dict[str, openai.OpenAI] = {}
+
+def openai_client(host: str) -> openai.OpenAI:
+    """The shared OpenAI client of a host's OpenAI-compatible API, with keep-alive connections."""
+    with _lock:
+        if host not in _clients:
+            timeout = httpx.Timeout(connect=5, read=300, write=60, pool=60)
+            _clients[host] = openai.OpenAI(
+                base_url=f"{host}/v1",
+                api_key="ollama", # required, but unused
+                timeout=timeout,
+                http_client=httpx.Client(timeout=timeout, transport=httpx.HTTPTransport(retries=2)),
+            )
+        return _clients[host]
+
+class NoHostError(ConnectionError):
+    """Raised when no host could serve a request."""
+
+class HostPicker:
+    def __init__(self, hosts: Optional[Sequence[str]] = None, probe_timeout: float = 2, refresh_seconds: float = 10):
+        self.all_hosts = [base_url(host) for host in hosts] if hosts else hosts_from_env()
+        self.probe_timeout = probe_timeout
+        self.refresh_seconds = refresh_seconds
+        self._probed: Dict[str, Optional[List[str]]] = {}
+        self._probed_at = float("-inf")
+
+    def _loaded(self, host: str) -> Optional[List[str]]:
+        """The models loaded on the host, None when it is unreachable."""
+        try:
+            response = httpx.get(f"{host}/api/ps", timeout=self.probe_timeout)
+            response.raise_for_status()
+        except httpx.HTTPError:
+            return None
+        return [model.get("model") or model.get("name") for model in response.json().get("models", [])]
+
+    def hosts(self, model: str) -> List[str]:
+        """The hosts to try for `model`: reachable ones with the model loaded, other reachable ones, then the rest."""
+        if time.monotonic() - self._probed_at > self.refresh_seconds:
+            self._probed = {host: self._loaded(host) for host in self.all_hosts}
+            self._probed_at = time.monotonic()
+        loaded = self._probed
+        rank = {host: 2 if models is None else 0 if model_name(model) in models else 1 for host, models in loaded.items()}
+        return sorted(self.all_hosts, key=lambda host: rank[host]) # stable: ties keep the configured order
+
+    def base_url(self, model: str) -> str:
+        """The OpenAI-compatible base URL of the best host for `model`, for clients that take one fixed URL."""
+        return f"{self.hosts(model)[0]}/v1"
+
+    def call(self, model: str, request: Callable[[openai.OpenAI], T]) -> T:
+        """Runs `request` with the client of the best host for `model`, failing over to the next host on host errors."""
+        error: Optional[Exception] = None
+        for host in self.hosts(model):
+            try:
+                return request(openai_client(host))
+            except (openai.APIConnectionError, openai.InternalServerError) as e:
+                error = e
+                self._probed_at = float("-inf") # probe again on the next request
+        raise NoHostError(f"No Ollama host could serve '{model}', the last error was: {error}") from error
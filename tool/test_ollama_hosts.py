@@ -0,0 +1,88 @@
+import json
+import socket
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ollama_hosts import HostPicker, NoHostError
+
+class FakeOllama(ThreadingHTTPServer):
+    """A local Ollama host with `loaded` models; with `status`, chat completions fail with that HTTP status."""
+    def __init__(self, loaded=(), status=200):
+        super().__init__(("127.0.0.1", 0), FakeOllamaHandler)
+        self.loaded = list(loaded)
+        self.status = status
+        threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    @property
+    def host(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._send(200, {"models": [{"name": model, "model": model} for model in self.server.loaded]})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.server.status != 200:
+            self._send(self.server.status, {"error": "boom"})
+            return
+        self._send(200, {
+            "id": "1", "object": "chat.completion", "created": 0, "model": request["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": str(self.server.server_port)}}],
+        })
+
+def unused_host() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+class TestHostPicker(unittest.TestCase):
+    """Tests the choice of host and the failover of the POC client layer against local fake Ollama hosts."""
+
+    def setUp(self):
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def start(self, **kwargs) -> FakeOllama:
+        server = FakeOllama(**kwargs)
+        self.servers.append(server)
+        return server
+
+    def ask(self, hosts: HostPicker) -> str:
+        return hosts.call("llama3.2", lambda client: client.with_options(max_retries=0).chat.completions.create(
+            model="llama3.2", messages=[{"role": "user", "content": "hi"}])).choices[0].message.content
+
+    def test_prefers_a_host_with_the_model_loaded(self):
+        cold = self.start()
+        warm = self.start(loaded=["llama3.2:latest"])
+        hosts = HostPicker([unused_host(), cold.host, warm.host])
+        self.assertEqual(hosts.base_url("llama3.2"), f"{warm.host}/v1")
+        self.assertEqual(self.ask(hosts), str(warm.server_port))
+
+    def test_fails_over_on_host_errors(self):
+        broken = self.start(loaded=["llama3.2:latest"], status=500)
+        healthy = self.start()
+        self.assertEqual(self.ask(HostPicker([broken.host, healthy.host])), str(healthy.server_port))
+        with self.assertRaises(NoHostError):
+            self.ask(HostPicker([broken.host, unused_host()]))
+
+if __name__ == "__main__":
+    unittest.main()
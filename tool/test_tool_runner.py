@@ -0,0 +1,114 @@
+import json
+import threading
+import time
+import unittest
+
+from openai.types.chat import ChatCompletion
+
+from tool_runner import ToolRegistry, ToolRunner
+
+NUMBERS = {
+    "type": "object",
+    "properties": {"a": {"type": "number"}, "b": {"type": "number"}},
+    "required": ["a", "b"],
+}
+
+def completion(content=None, calls=()) -> ChatCompletion:
+    """A chat completion with the given text or tool calls (name, arguments)."""
+    tool_calls = [
+        {"id": f"call_{i}", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+        for i, (name, arguments) in enumerate(calls)
+    ]
+    return ChatCompletion.model_validate({
+        "id": "1", "object": "chat.completion", "created": 0, "model": "llama3.2",
+        "choices": [{"index": 0, "finish_reason": "tool_calls" if calls else "stop",
+                     "message": {"role": "assistant", "content": content, "tool_calls": tool_calls or None}}],
+    })
+
+class TestToolRunner(unittest.TestCase):
+    """Tests the tool registry and runner with scripted model responses."""
+
+    def setUp(self):
+        self.registry = ToolRegistry()
+        self.threads = set()
+
+        @self.registry.tool(NUMBERS)
+        def slow_add(a: float, b: float) -> float:
+            """Adds two numbers, slowly."""
+            self.threads.add(threading.get_ident())
+            time.sleep(0.3)
+            return a + b
+
+    def scripted(self, *responses):
+        sent = []
+        def create(messages, tools):
+            sent.append((list(messages), tools))
+            return responses[len(sent) - 1]
+        return create, sent
+
+    def test_registry(self):
+        self.assertEqual(self.registry.specs[0]["function"]["name"], "slow_add")
+        self.assertEqual(self.registry.specs[0]["function"]["description"], "Adds two numbers, slowly.")
+        self.assertIs(self.registry.specs, self.registry.specs) # built once
+        self.assertEqual(self.registry.validate("slow_add", '{"a": 1, "b": 2.5}'), {"a": 1, "b": 2.5})
+        with self.assertRaisesRegex(ValueError, "b: '2' is not of type 'number'"):
+            self.registry.validate("slow_add", '{"a": 1, "b": "2"}')
+        with self.assertRaisesRegex(ValueError, "'b' is a required property"):
+            self.registry.validate("slow_add", '{"a": 1}')
+        with self.assertRaisesRegex(ValueError, "Unknown tool"):
+            self.registry.validate("multiply", '{}')
+
+    def test_calls_of_a_round_run_concurrently(self):
+        create, sent = self.scripted(
+            completion(calls=[("slow_add", {"a": 1, "b": 2}), ("slow_add", {"a": 3, "b": 4}), ("slow_add", {"a": 5, "b": 6})]),
+            completion("Done."),
+        )
+        messages = [{"role": "user", "content": "Add."}]
+        started = time.perf_counter()
+        with ToolRunner(self.registry, create) as runner:
+            result = runner.run(messages)
+        self.assertLess(time.perf_counter() - started, 0.8) # 3 x 0.3s in parallel
+        self.assertEqual(len(self.threads), 3)
+        self.assertEqual(result.message.content, "Done.")
+        self.assertEqual((result.rounds, result.tool_calls, result.truncated), (2, 3, False))
+        self.assertEqual([m["content"] for m in messages if m["role"] == "tool"], ["3", "7", "11"]) # in call order
+        self.assertEqual([m["tool_call_id"] for m in messages if m["role"] == "tool"], ["call_0", "call_1", "call_2"])
+        self.assertNotIn("content", messages[1]) # None fields are not sent
+        self.assertEqual(sent[1][0][:len(sent[0][0])], sent[0][0]) # the history is only appended to
+
+    def test_errors_are_returned_to_the_model(self):
+        @self.registry.tool({"type": "object"})
+        def broken():
+            raise RuntimeError("disk full")
+
+        create, _ = self.scripted(
+            completion(calls=[("slow_add", {"a": "one", "b": 2}), ("broken", {}), ("missing", {})]),
+            completion("Sorry."),
+        )
+        messages = [{"role": "user", "content": "Add."}]
+        ToolRunner(self.registry, create).run(messages)
+        results = [m["content"] for m in messages if m["role"] == "tool"]
+        self.assertIn("Invalid arguments for 'slow_add'", results[0])
+        self.assertEqual(results[1], "Error: disk full")
+        self.assertIn("Unknown tool 'missing'", results[2])
+
+    def test_async_tools(self):
+        @self.registry.tool({"type": "object", "properties": {"name": {"type": "string"}}})
+        async def greet(name: str) -> dict:
+            return {"greeting": f"Hello {name}"}
+
+        self.assertEqual(self.registry.call("greet", '{"name": "Ada"}'), '{"greeting": "Hello Ada"}')
+
+    def test_rounds_are_capped(self):
+        loop = completion(calls=[("slow_add", {"a": 1, "b": 1})])
+        create, sent = self.scripted(*[loop] * 5)
+        messages = [{"role": "user", "content": "Add forever."}]
+        result = ToolRunner(self.registry, create, max_rounds=2).run(messages)
+        self.assertEqual((result.rounds, result.tool_calls, result.truncated), (2, 1, True))
+        self.assertEqual(len(sent), 2)
+        self.assertIsNone(result.message)
+        self.assertEqual([call.function.name for call in result.pending_calls], ["slow_add"])
+        self.assertEqual([message["role"] for message in messages], ["user", "assistant", "tool"]) # every call answered
+
+if __name__ == '__main__':
+    unittest.main()
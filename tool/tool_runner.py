@@ -0,0 +1,150 @@
+"""
+A local-LLM tool runner for OpenAI-compatible chat APIs (e.g. Ollama's /v1).
+
+The registry is built once: each tool keeps its OpenAI `tools` entry and a compiled JSON-schema
+validator of its parameters. Each round, the model's `tool_calls` run concurrently on a thread
+pool, their arguments validated against the schema instead of cast by hand; a call with invalid
+arguments, an unknown tool or a failing tool gets the error as its result, so the model can retry.
+The results are appended in call order and the loop stops at a final answer or after `max_rounds`.
+
+The chat API is stateless, so every round sends the whole conversation. The history is only ever
+appended to, which lets Ollama reuse its KV cache for the unchanged prefix, and assistant messages
+are sent without their empty fields.
+"""
+import asyncio
+import inspect
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from jsonschema import Draft202012Validator
+
+@dataclass
+class Tool:
+    name: str
+    function: Callable[..., Any]
+    description: str
+    parameters: Dict[str, Any]
+    validator: Draft202012Validator
+
+    @property
+    def spec(self) -> Dict[str, Any]:
+        return {"type": "function", "function": {"name": self.name, "description": self.description, "parameters": self.parameters}}
+
+class ToolRegistry:
+    """Tools by name, with their specs and argument validators built once."""
+    def __init__(self):
+        self.tools: Dict[str, Tool] = {}
+        self._specs: Optional[List[Dict[str, Any]]] = None
+
+    def register(self, function: Callable[..., Any], parameters: Dict[str, Any], description: Optional[str] = None, name: Optional[str] = None) -> Callable[..., Any]:
+        """Registers a function (sync or async) with the JSON schema of its keyword arguments; returns the function."""
+        Draft202012Validator.check_schema(parameters)
+        name = name or function.__name__
+        self.tools[name] = Tool(name, function, description or inspect.getdoc(function) or "", parameters, Draft202012Validator(parameters))
+        self._specs = None
+        return function
+
+    def tool(self, parameters: Dict[str, Any], description: Optional[str] = None, name: Optional[str] = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """Decorator form of `register`."""
+        return lambda function: self.register(function, parameters, description, name)
+
+    @property
+    def specs(self) -> List[Dict[str, Any]]:
+        """The `tools` argument of the chat API."""
+        if self._specs is None:
+            self._specs = [tool.spec for tool in self.tools.values()]
+        return self._specs
+
+    def validate(self, name: str, arguments: str) -> Dict[str, Any]:
+        """Parses and validates the arguments of a call; raises ValueError with a message for the model."""
+        tool = self.tools.get(name)
+        if tool is None:
+            raise ValueError(f"Unknown tool '{name}', available: {', '.join(self.tools)}.")
+        try:
+            parsed = json.loads(arguments or "{}")
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Arguments of '{name}' are not valid JSON: {e}") from None
+        errors = sorted(tool.validator.iter_errors(parsed), key=lambda error: list(error.path))
+        if errors:
+            raise ValueError(f"Invalid arguments for '{name}': " + "; ".join(
+                f"{'.'.join(map(str, error.path)) or 'arguments'}: {error.message}" for error in errors))
+        return parsed
+
+    def call(self, name: str, arguments: str) -> str:
+        """Runs one call and returns its result as text; errors are returned, not raised."""
+        try:
+            parsed = self.validate(name, arguments)
+            result = self.tools[name].function(**parsed)
+            if inspect.isawaitable(result):
+                result = asyncio.run(result) # on a worker thread, which has no event loop
+        except Exception as e:
+            return f"Error: {e}"
+        return result if isinstance(result, str) else json.dumps(result, default=str)
+
+@dataclass
+class RunResult:
+    """The final assistant message of a run and how it got there."""
+    message: Any
+    messages: List[Dict[str, Any]]
+    rounds: int
+    tool_calls: int
+    usage: List[Any] = field(default_factory=list)
+    seconds: float = 0
+    truncated: bool = False # stopped by `max_rounds` before a final answer
+    pending_calls: List[Any] = field(default_factory=list) # tool calls of the last response, left unanswered by a truncated run
+
+class ToolRunner:
+    """
+    Runs a conversation with the tools of `registry`. `create(messages, tools)` sends one chat request and
+    returns the response, e.g. `client.chat.completions.create(model=..., messages=messages, tools=tools)`.
+    """
+    def __init__(self, registry: ToolRegistry, create: Callable[[List[Dict[str, Any]], List[Dict[str, Any]]], Any], max_rounds: int = 8, max_workers: int = 8):
+        self.registry = registry
+        self.create = create
+        self.max_rounds = max_rounds
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+
+    def __enter__(self) -> "ToolRunner":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def run_calls(self, tool_calls: List[Any]) -> List[Dict[str, Any]]:
+        """Runs the calls of one round concurrently and returns their tool messages, in call order."""
+        futures = [self.executor.submit(self.registry.call, call.function.name, call.function.arguments) for call in tool_calls]
+        return [{"role": "tool", "tool_call_id": call.id, "content": future.result()} for call, future in zip(tool_calls, futures)]
+
+    def run(self, messages: List[Dict[str, Any]]) -> RunResult:
+        """
+        Appends to `messages` until the model answers without tool calls, or for at most `max_rounds` rounds.
+        A truncated run leaves out the last response, whose tool calls would have no answers in `messages`,
+        and keeps its calls in `pending_calls`; `message` is then None.
+        """
+        started = time.perf_counter()
+        result = RunResult(message=None, messages=messages, rounds=0, tool_calls=0)
+        while True:
+            response = self.create(messages, self.registry.specs)
+            result.rounds += 1
+            if getattr(response, "usage", None):
+                result.usage.append(response.usage)
+            message = response.choices[0].message
+            if message.tool_calls and result.rounds >= self.max_rounds:
+                result.truncated = True
+                result.message = None
+                result.pending_calls = list(message.tool_calls)
+                break
+            result.message = message
+            messages.append(message.model_dump(exclude_none=True))
+            if not message.tool_calls:
+                break
+            result.tool_calls += len(message.tool_calls)
+            messages.extend(self.run_calls(message.tool_calls))
+        result.seconds = time.perf_counter() - started
+        return result